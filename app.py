@@ -1,10 +1,29 @@
 from flask import Flask, jsonify, send_file, send_from_directory, request
 from flask_cors import CORS
+from werkzeug.http import is_resource_modified
 import os
-import json
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
 from title_updater import TitleUpdater
 from jav_scraper import JavMetadataScraper
+from scrape_cache import scrape_cache
+from scrape_jobs import ScrapeJobQueue, UPDATE_MISSING, SCRAPE_ARTIST
+from library_catalog import LibraryCatalog
+from library_records import VideoEncoder, encode_json, encode_object, versioned_url
+from listing_cache import ListingCache, ARTISTS
+from json_provider import OrjsonProvider, json_provider_class, dumps_bytes
+from library_scanner import folder_scanner, iter_files, file_version, VIDEO_EXTENSIONS
+from library_model import LibraryModel, SORT_KEYS, encode_cursor, decode_cursor
+from library_search import LibrarySearch
+from library_watcher import LibraryWatcher, is_network_path
+import title_metadata
+from derivative_cache import DerivativeCache
+from thumbnails import ThumbnailService, OUTPUT_FORMATS, MAX_DIMENSION, default_format
+from thumbnail_prewarm import ThumbnailPrewarmer
+from remux import RemuxService, RemuxError, SegmentPrefetcher, SEGMENT_MIMETYPE, PLAYLIST_MIMETYPE
+from media_probe import MediaProber
+from media_streaming import media_response, media_etag, ChunkReader, MEDIA_MIMETYPES, OFFLOAD_MODES, PROXY_MODES
 
 app = Flask(__name__, static_folder='static', static_url_path='')
 CORS(app)  # Enable CORS for all routes
@@ -28,6 +47,105 @@ VIDEO_SERVER_PATH = os.getenv('VIDEO_SERVER_PATH', '/volume1/Video_Server')  # D
 # For local development on Windows, uncomment and update:
 #VIDEO_SERVER_PATH = r'V:'
 
+# Writable directory for the library catalog and other caches
+# (the Video_Server share itself may be mounted read-only)
+STATE_DIR = os.getenv('STATE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state'))
+# JSON encoder of API responses: auto (orjson when installed) | orjson | stdlib
+JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'auto').lower()
+# Serialized artist/video listings kept until the catalog reports a change to that artist
+LISTING_CACHE_MAX_BYTES = int(os.getenv('LISTING_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Minimum seconds between mtime checks of the same artist's code folders
+CATALOG_REFRESH_INTERVAL = float(os.getenv('CATALOG_REFRESH_INTERVAL', '10'))
+# Code folders listed at the same time during library scans (hides round trips on SMB/NFS)
+LIBRARY_SCAN_WORKERS = int(os.getenv('LIBRARY_SCAN_WORKERS', '8'))
+# Background library watcher: off | auto | inotify | poll
+# 'auto' uses inotify on local disks and polling on SMB/NFS mounts
+LIBRARY_WATCHER = os.getenv('LIBRARY_WATCHER', 'off').lower()
+LIBRARY_POLL_INTERVAL = float(os.getenv('LIBRARY_POLL_INTERVAL', '30'))
+# Parsed title.json cache bounds
+TITLE_CACHE_MAX_ENTRIES = int(os.getenv('TITLE_CACHE_MAX_ENTRIES', '512'))
+TITLE_CACHE_MAX_BYTES = int(os.getenv('TITLE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# title.json updates are written once none arrived for this many seconds (at most TITLE_WRITE_MAX_DELAY
+# after the first), or as soon as TITLE_WRITE_BATCH entries are queued for the same file
+TITLE_WRITE_INTERVAL = float(os.getenv('TITLE_WRITE_INTERVAL', '2'))
+TITLE_WRITE_MAX_DELAY = float(os.getenv('TITLE_WRITE_MAX_DELAY', '10'))
+TITLE_WRITE_BATCH = int(os.getenv('TITLE_WRITE_BATCH', '100'))
+# Compiled code -> entry sidecars of title.json files of at least TITLE_INDEX_MIN_BYTES (off to disable)
+TITLE_INDEX = os.getenv('TITLE_INDEX', 'on').lower()
+TITLE_INDEX_DIR = os.getenv('TITLE_INDEX_DIR', os.path.join(STATE_DIR, 'title_index'))
+TITLE_INDEX_MIN_BYTES = int(os.getenv('TITLE_INDEX_MIN_BYTES', str(256 * 1024)))
+
+# Resized poster/fanart variants (?w=, ?h=, ?format=) - evicted LRU beyond the size budget
+THUMBNAIL_CACHE_DIR = os.getenv('THUMBNAIL_CACHE_DIR', os.path.join(STATE_DIR, 'thumbnails'))
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv('THUMBNAIL_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+# Worker processes rendering thumbnails of new/changed folders in the background (0 disables)
+THUMBNAIL_PREWARM_WORKERS = min(int(os.getenv('THUMBNAIL_PREWARM_WORKERS', '2')), os.cpu_count() or 1)
+# Variants rendered ahead of time - keep in sync with POSTER_THUMBNAIL_PARAMS in artist.js
+THUMBNAIL_PREWARM_VARIANTS = [(480, None, 'webp')]
+
+# Scrape outcomes are reused for this long (seconds) - codes no site knows are retried sooner
+SCRAPE_CACHE_FOUND_TTL = float(os.getenv('SCRAPE_CACHE_FOUND_TTL', str(30 * 24 * 3600)))
+SCRAPE_CACHE_NOT_FOUND_TTL = float(os.getenv('SCRAPE_CACHE_NOT_FOUND_TTL', str(24 * 3600)))
+# Media streams served at the same time by one process - keep below the server's thread
+# count (GUNICORN_THREADS) so API and image requests never wait behind long streams
+MAX_CONCURRENT_STREAMS = int(os.getenv('MAX_CONCURRENT_STREAMS', '48'))
+# How media bytes are sent: sendfile (kernel copy under gunicorn) | buffered (large aligned
+# reads with read-ahead, for SMB/NFS) | off (Python copies) | x-accel (nginx X-Accel-Redirect) |
+# x-sendfile (Apache/lighttpd X-Sendfile) | auto (buffered on network mounts, else sendfile)
+STREAM_OFFLOAD = os.getenv('STREAM_OFFLOAD', 'auto').lower()
+if STREAM_OFFLOAD not in OFFLOAD_MODES:
+    raise ValueError(f'STREAM_OFFLOAD must be one of: {", ".join(OFFLOAD_MODES)}')
+if STREAM_OFFLOAD == 'auto':
+    STREAM_OFFLOAD = 'buffered' if is_network_path(VIDEO_SERVER_PATH) else 'sendfile'
+# Buffered mode: read size (aligned), chunks read ahead per stream, shared pool of hot chunks
+# (container header/index) and reader threads - memory stays below
+# STREAM_BUFFER_POOL_BYTES + MAX_CONCURRENT_STREAMS * (STREAM_READAHEAD_CHUNKS + 1) * STREAM_CHUNK_SIZE
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', str(1024 * 1024)))
+STREAM_READAHEAD_CHUNKS = int(os.getenv('STREAM_READAHEAD_CHUNKS', '4'))
+STREAM_BUFFER_POOL_BYTES = int(os.getenv('STREAM_BUFFER_POOL_BYTES', str(64 * 1024 * 1024)))
+STREAM_READ_WORKERS = int(os.getenv('STREAM_READ_WORKERS', '8'))
+# nginx internal location mapped to VIDEO_SERVER_PATH/static/artists (x-accel mode)
+STREAM_ACCEL_PREFIX = os.getenv('STREAM_ACCEL_PREFIX', '/_media/')
+# MKV/AVI and very large videos served as HLS segments remuxed with ffmpeg (stream copy, no
+# re-encoding) - 'auto' enables it when ffmpeg/ffprobe are installed, 'off' disables it
+REMUX = os.getenv('REMUX', 'auto').lower()
+FFMPEG_PATH = os.getenv('FFMPEG_PATH', 'ffmpeg')
+FFPROBE_PATH = os.getenv('FFPROBE_PATH', 'ffprobe')
+REMUX_CACHE_DIR = os.getenv('REMUX_CACHE_DIR', os.path.join(STATE_DIR, 'remux'))
+REMUX_CACHE_MAX_BYTES = int(os.getenv('REMUX_CACHE_MAX_BYTES', str(10 * 1024 * 1024 * 1024)))
+HLS_SEGMENT_SECONDS = float(os.getenv('HLS_SEGMENT_SECONDS', '6'))
+# ffmpeg/ffprobe processes run at the same time
+REMUX_WORKERS = int(os.getenv('REMUX_WORKERS', '2'))
+# Videos at least this large are played through HLS even when the browser could open them
+HLS_MIN_BYTES = int(os.getenv('HLS_MIN_BYTES', str(4 * 1024 * 1024 * 1024)))
+# Segments generated in the background ahead of the playhead, and the threads doing it
+# (keep below REMUX_WORKERS so a segment a player waits for always gets an ffmpeg slot)
+HLS_PREFETCH_SEGMENTS = int(os.getenv('HLS_PREFETCH_SEGMENTS', '3'))
+HLS_PREFETCH_WORKERS = int(os.getenv('HLS_PREFETCH_WORKERS', '1'))
+# Media files probed at the same time for duration/codecs/resolution (0 disables probing)
+MEDIA_PROBE_WORKERS = int(os.getenv('MEDIA_PROBE_WORKERS', '2'))
+# Index keyframes of non-MP4 files with ffprobe too (reads each whole file once)
+MEDIA_PROBE_KEYFRAMES = os.getenv('MEDIA_PROBE_KEYFRAMES', 'false').lower() in ('1', 'true', 'yes')
+# Background scrape jobs run at the same time (0 leaves jobs queued - e.g. for a separate worker process)
+SCRAPE_JOB_WORKERS = int(os.getenv('SCRAPE_JOB_WORKERS', '1'))
+
+app.json = json_provider_class(JSON_PROVIDER)(app)
+title_metadata.title_cache.configure(max_entries=TITLE_CACHE_MAX_ENTRIES, max_bytes=TITLE_CACHE_MAX_BYTES)
+title_metadata.title_writer.configure(
+    flush_interval=TITLE_WRITE_INTERVAL,
+    max_delay=TITLE_WRITE_MAX_DELAY,
+    batch_size=TITLE_WRITE_BATCH,
+    lock_dir=os.path.join(STATE_DIR, 'title_locks')
+)
+if TITLE_INDEX != 'off':
+    title_metadata.title_index.configure(root=TITLE_INDEX_DIR, min_bytes=TITLE_INDEX_MIN_BYTES)
+folder_scanner.configure(workers=LIBRARY_SCAN_WORKERS)
+scrape_cache.configure(
+    path=os.path.join(STATE_DIR, 'scrape_cache.sqlite3'),
+    found_ttl=SCRAPE_CACHE_FOUND_TTL,
+    not_found_ttl=SCRAPE_CACHE_NOT_FOUND_TTL
+)
+
 @app.route('/')
 def index():
     return send_from_directory('static', 'index.html')
@@ -46,6 +164,13 @@ def player_page(artist_name, video_code):
 def manifest():
     return send_from_directory('static', 'manifest.json')
 
+def listing_response(body, etag):
+    """JSON response from cached listing bytes - 304 when the client's copy is current"""
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @app.route('/api/artists')
 def get_artists():
     """Get list of all artists"""
@@ -54,18 +179,23 @@ def get_artists():
     if not artists_path.exists():
         return jsonify({'error': 'Artists directory not found'}), 404
     
+    generation = listing_cache.generation()
+    records = library.artists()
+    cached = listing_cache.get(ARTISTS, 'artists')
+    if cached is not None:
+        return listing_response(*cached)
+    
     artists = []
-    for artist_folder in artists_path.iterdir():
-        if artist_folder.is_dir():
-            icon_path = artist_folder / 'icon.jpg'
-            artist_data = {
-                'name': artist_folder.name,
-                'icon': f'/api/artists/{artist_folder.name}/icon' if icon_path.exists() else None,
-                'path': str(artist_folder)
-            }
-            artists.append(artist_data)
+    for artist in records:
+        artist_data = {
+            'name': artist.name,
+            'icon': versioned_url(f'/api/artists/{artist.name}/icon', artist.icon_version) if artist.has_icon else None,
+            'path': str(artists_path / artist.name)
+        }
+        artists.append(artist_data)
     
-    return jsonify(artists)
+    body = dumps_bytes(app.json, artists) + b'\n'
+    return listing_response(body, listing_cache.put(ARTISTS, 'artists', body, generation))
 
 @app.route('/api/artists/<artist_name>/icon')
 def get_artist_icon(artist_name):
@@ -73,136 +203,342 @@ def get_artist_icon(artist_name):
     icon_path = Path(VIDEO_SERVER_PATH) / 'static' / 'artists' / artist_name / 'icon.jpg'
     
     if icon_path.exists():
-        return send_file(str(icon_path), mimetype='image/jpeg')
+        return send_image(icon_path, 'image/jpeg')
     return jsonify({'error': 'Icon not found'}), 404
 
 def load_title_mapping(artist_name):
     """
-    Load title mapping from title.json file
+    Load title mapping from title.json file (cached until the file changes)
     Returns dict mapping code -> {'title': str, 'year': int, 'month': int, 'day': int, 'date': dict}
-    Supports both old format (code -> title string) and new format (code -> dict)
     """
     title_file = Path(VIDEO_SERVER_PATH) / 'static' / 'artists' / artist_name / 'title.json'
-    
-    if not title_file.exists():
-        return {}
-    
+    return title_metadata.load_title_mapping(title_file, artist_name)
+
+catalog = LibraryCatalog(
+    VIDEO_SERVER_PATH,
+    STATE_DIR,
+    title_loader=load_title_mapping,
+    refresh_interval=CATALOG_REFRESH_INTERVAL
+)
+library = LibraryModel(catalog)
+listing_cache = ListingCache(LISTING_CACHE_MAX_BYTES)
+catalog.add_listener(listing_cache.on_catalog_changed)
+# Full-text index of titles and codes across all artists (re-indexed per changed artist)
+library_search = LibrarySearch(catalog)
+catalog.add_listener(library_search.on_catalog_changed)
+thumbnail_cache = DerivativeCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES)
+thumbnails = ThumbnailService(thumbnail_cache)
+# Duration, codecs, resolution and keyframes of new/changed media files, stored in the catalog
+media_prober = MediaProber(
+    catalog,
+    ffprobe=FFPROBE_PATH,
+    workers=MEDIA_PROBE_WORKERS,
+    scan_keyframes=MEDIA_PROBE_KEYFRAMES
+)
+catalog.add_folder_listener(media_prober.on_folder_indexed)
+
+def stored_keyframes(source_path, st):
+    """Keyframe index of a media file from its catalog probe (if it is of this file version)"""
     try:
-        with open(title_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            raw_mapping = data[artist_name] if artist_name in data else data
-            
-            # Convert to new format: code -> {'title': str, 'year': int, 'month': int, 'day': int, 'date': dict}
-            result = {}
-            for code, value in raw_mapping.items():
-                if isinstance(value, str):
-                    # Old format: just title string
-                    result[code] = {'title': value, 'year': None, 'month': None, 'day': None, 'date': None}
-                elif isinstance(value, dict):
-                    # New format: dict with title and date info
-                    date_info = value.get('date', {})
-                    result[code] = {
-                        'title': value.get('title', code),
-                        'year': value.get('year') or (date_info.get('year') if date_info else None),
-                        'month': value.get('month') or (date_info.get('month') if date_info else None),
-                        'day': value.get('day') or (date_info.get('day') if date_info else None),
-                        'date': value.get('date') or date_info
-                    }
-                else:
-                    result[code] = {'title': str(value), 'year': None, 'month': None, 'day': None, 'date': None}
-            
-            return result
-    except (json.JSONDecodeError, KeyError, IOError) as e:
-        print(f"Error loading title.json for {artist_name}: {e}")
-        return {}
+        artist_name, code, filename = Path(source_path).relative_to(catalog.artists_path).parts
+    except ValueError:
+        return None
+    return catalog.media_keyframes(artist_name, code, filename, st.st_size, st.st_mtime_ns)
+
+remux = RemuxService(
+    DerivativeCache(REMUX_CACHE_DIR, REMUX_CACHE_MAX_BYTES),
+    ffmpeg=FFMPEG_PATH,
+    ffprobe=FFPROBE_PATH,
+    segment_seconds=HLS_SEGMENT_SECONDS,
+    workers=REMUX_WORKERS,
+    keyframe_source=stored_keyframes
+)
+hls_prefetcher = SegmentPrefetcher(remux, ahead=HLS_PREFETCH_SEGMENTS, workers=HLS_PREFETCH_WORKERS)
+thumbnail_prewarmer = ThumbnailPrewarmer(
+    thumbnails,
+    THUMBNAIL_PREWARM_VARIANTS,
+    workers=THUMBNAIL_PREWARM_WORKERS,
+    popularity_file=os.path.join(STATE_DIR, 'artist_popularity.json')
+)
+# Every new or changed code folder found by a catalog scan (listings, the watcher,
+# TitleUpdater.scan_videos) gets its poster thumbnails rendered in the background
+catalog.add_folder_listener(thumbnail_prewarmer.on_folder_indexed)
+
+# Title scraping runs as persistent background jobs (see /api/jobs)
+scrape_jobs = ScrapeJobQueue(
+    STATE_DIR,
+    lambda: TitleUpdater(VIDEO_SERVER_PATH, catalog=catalog),
+    workers=SCRAPE_JOB_WORKERS
+)
+
+_services_started = False
+_services_lock = threading.Lock()
+
+def start_background_services():
+    """
+    Start the background threads of the serving process: called by the __main__ block and by
+    gunicorn's post_worker_init hook, never at import time - thumbnail prewarm processes
+    (forkserver/spawn) re-import the main script as __mp_main__ and must not start them again.
+    Without it (scripts, other servers) title updates are written immediately and nothing
+    runs in the background.
+    """
+    global _services_started
+    with _services_lock:
+        if _services_started:
+            return
+        _services_started = True
+    # Flushes pending updates on shutdown too (atexit)
+    title_metadata.title_writer.start()
+    media_prober.start()
+    if REMUX != 'off':
+        hls_prefetcher.start()
+    scrape_jobs.start()
+    if LIBRARY_WATCHER != 'off':
+        LibraryWatcher(catalog, library, mode=LIBRARY_WATCHER, poll_interval=LIBRARY_POLL_INTERVAL).start()
+
+def remux_enabled():
+    return REMUX != 'off' and remux.enabled
+
+def hls_url(artist_name, code, media):
+    """HLS playlist URL for videos browsers can't play directly or that are very large, else None"""
+    if not remux_enabled() or media.type != 'video':
+        return None
+    if RemuxService.supports(media.filename) or (media.size or 0) >= HLS_MIN_BYTES:
+        return f'/api/hls/{artist_name}/{code}/{media.filename}/index.m3u8'
+    return None
+
+# Video dicts/JSON straight from the catalog records (shared URL prefixes per artist)
+video_encoder = VideoEncoder(hls_url)
+
+def build_video_entry(artist_name, entry):
+    """Turn a catalog entry into the video dict returned by the API"""
+    return video_encoder.to_dict(artist_name, entry)
+
+VIDEO_FIELDS = ('code', 'title', 'year', 'month', 'day', 'date', 'media', 'fanart', 'poster')
+MAX_PAGE_SIZE = 500
 
 @app.route('/api/artists/<artist_name>/videos')
 def get_artist_videos(artist_name):
-    """Get all videos for a specific artist"""
-    artist_path = Path(VIDEO_SERVER_PATH) / 'static' / 'artists' / artist_name
+    """
+    Get videos for a specific artist
+    Query parameters (all optional):
+        sort: date (default) | code | title
+        order: asc | desc - defaults to desc for date (newest first), asc otherwise
+        limit: page size - when given, the response is {"videos": [...], "next_cursor": str|null, "total": int}
+        cursor: next_cursor from the previous page
+        fields: comma-separated subset of VIDEO_FIELDS ('code' is always included)
+    Without limit/cursor the full list is returned as a plain array
+    Videos without dates sort as oldest (missing year/month/day count as 0)
+    """
+    sort = request.args.get('sort', 'date')
+    if sort not in SORT_KEYS:
+        return jsonify({'error': f'Invalid sort: {sort}'}), 400
     
-    if not artist_path.exists():
-        return jsonify({'error': 'Artist not found'}), 404
+    order = request.args.get('order')
+    if order not in (None, 'asc', 'desc'):
+        return jsonify({'error': f'Invalid order: {order}'}), 400
+    descending = None if order is None else order == 'desc'
     
-    # Load title mappings from title.json
-    title_mapping = load_title_mapping(artist_name)
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
     
-    videos = []
+    cursor = request.args.get('cursor')
+    try:
+        cursor_key = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Scan for video code folders
-    for item in artist_path.iterdir():
-        if item.is_dir() and item.name != '__pycache__':
-            # Look for media files and metadata
-            media_files = []
-            fanart = None
-            poster = None
-            fallback_image = None  # Any image file as fallback
-            
-            # Supported image extensions
-            image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']
-            
-            for file in item.iterdir():
-                if file.is_file():
-                    ext = file.suffix.lower()
-                    if ext in ['.mp4', '.mkv', '.avi', '.mov', '.wav', '.mp3', '.flac', '.m4a', '.webm']:
-                        media_files.append({
-                            'filename': file.name,
-                            'path': f'/api/stream/{artist_name}/{item.name}/{file.name}',
-                            'type': 'video' if ext in ['.mp4', '.mkv', '.avi', '.mov', '.webm'] else 'audio'
-                        })
-                    elif file.name.lower() == 'fanart.jpg':
-                        fanart = f'/api/video/{artist_name}/{item.name}/fanart'
-                    elif file.name.lower() == 'poster.jpg':
-                        poster = f'/api/video/{artist_name}/{item.name}/poster'
-                    elif ext in image_extensions and not fallback_image:
-                        # Store first image found as fallback (skip fanart.jpg and poster.jpg)
-                        if file.name.lower() not in ['fanart.jpg', 'poster.jpg']:
-                            fallback_image = file.name
-            
-            # Use fallback image if poster.jpg not found
-            if not poster and fallback_image:
-                poster = f'/api/video/{artist_name}/{item.name}/image/{fallback_image}'
-            
-            if media_files:
-                # Get title and date info from mapping, fallback to code if not found
-                metadata = title_mapping.get(item.name)
-                if metadata:
-                    video_title = metadata.get('title', item.name)
-                    video_year = metadata.get('year')
-                    video_month = metadata.get('month')
-                    video_day = metadata.get('day')
-                    video_date = metadata.get('date')
-                else:
-                    video_title = item.name
-                    video_year = None
-                    video_month = None
-                    video_day = None
-                    video_date = None
-                
-                videos.append({
-                    'code': item.name,
-                    'title': video_title,
-                    'year': video_year,
-                    'month': video_month,
-                    'day': video_day,
-                    'date': video_date,
-                    'media': media_files,
-                    'fanart': fanart,
-                    'poster': poster
-                })
+    fields = request.args.get('fields')
+    if fields:
+        fields = {'code'} | {f.strip() for f in fields.split(',') if f.strip()}
+        unknown = fields - set(VIDEO_FIELDS)
+        if unknown:
+            return jsonify({'error': f'Unknown fields: {", ".join(sorted(unknown))}'}), 400
+    
+    # Changes on disk reach the catalog (and drop the cached bodies) before the lookup
+    library.refresh_artist(artist_name)
+    variant = (sort, descending, limit, cursor, tuple(sorted(fields)) if fields else None)
+    cached = listing_cache.get(artist_name, variant)
+    if cached is None:
+        generation = listing_cache.generation()
+        try:
+            page = library.page(artist_name, sort=sort, descending=descending, limit=limit, cursor=cursor_key,
+                                refresh=False)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if page is None:
+            return jsonify({'error': 'Artist not found'}), 404
+        entries, next_key, total = page
+        next_cursor = encode_cursor(next_key) if next_key is not None else None
+        body = encode_listing(artist_name, entries, fields, limit is not None or cursor is not None, next_cursor, total)
+        cached = body, listing_cache.put(artist_name, variant, body, generation)
+    
+    if cursor is None:
+        # First page = one visit of the artist page
+        thumbnail_prewarmer.record_view(artist_name)
+    
+    return listing_response(*cached)
+
+def encode_listing(artist_name, entries, fields, paged, next_cursor, total):
+    """Response bytes of a video listing (a plain array unless paged)"""
+    if fields or isinstance(app.json, OrjsonProvider):
+        videos = [build_video_entry(artist_name, entry) for entry in entries]
+        if fields:
+            videos = [{field: video[field] for field in VIDEO_FIELDS if field in fields} for video in videos]
+        listing = {'videos': videos, 'next_cursor': next_cursor, 'total': total} if paged else videos
+        return dumps_bytes(app.json, listing) + b'\n'
     
-    # Sort videos by full date (descending - newest first)
-    # Sort key: (year, month, day) with None values treated as 0 (oldest)
-    # This ensures newest videos appear first, with most precise dates taking priority
-    # Videos without dates will appear at the end (treated as year 0)
-    videos.sort(key=lambda v: (
-        v.get('year') if v.get('year') is not None else 0,
-        v.get('month') if v.get('month') is not None else 0,
-        v.get('day') if v.get('day') is not None else 0,
-        v['code']
-    ), reverse=True)
+    # Stdlib encoder: writing JSON straight from the records beats building dicts for it
+    body = video_encoder.encode_list(artist_name, entries)
+    if paged:
+        body = encode_object([('videos', body), ('next_cursor', encode_json(next_cursor)), ('total', encode_json(total))])
+    return (body + '\n').encode('utf-8')
+
+@app.route('/api/search')
+def search_videos():
+    """
+    Search video titles, codes and artist names across the whole library
+    Query parameters:
+        q: search text - a code (SSIS-001, ssis1) matches that code exactly,
+           otherwise every word must match (Japanese titles match on any substring)
+        limit: page size (default 50), offset: results to skip
+    Returns {"results": [video + 'artist', ...], "total": int, "next_offset": int|null}, best match first
+    """
+    query = request.args.get('q', '').strip()
+    try:
+        limit = int(request.args.get('limit', 50))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    if not 1 <= limit <= MAX_PAGE_SIZE or offset < 0:
+        return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}, offset not negative'}), 400
+    
+    # Known artists aren't re-checked here - walking every artist's folders per query is far too
+    # slow on network shares. Their changes reach the index through catalog listeners, as
+    # artists are browsed or picked up by the watcher.
+    library.list_new_artists()
+    matches, total = library_search.search(query, limit=limit, offset=offset)
+    results = [dict(build_video_entry(artist_name, entry), artist=artist_name) for artist_name, entry in matches]
+    return jsonify({
+        'results': results,
+        'total': total,
+        'next_offset': offset + len(results) if offset + len(results) < total else None
+    })
+
+@app.route('/api/artists/<artist_name>/videos/<video_code>')
+def get_artist_video(artist_name, video_code):
+    """Get a single video - only that code folder and its title.json entry are looked at"""
+    entry = library.video(artist_name, video_code)
     
-    return jsonify(videos)
+    if entry is None:
+        return jsonify({'error': 'Video not found'}), 404
+    
+    video = build_video_entry(artist_name, entry)
+    for media in video['media']:
+        if media['probe'] is not None:
+            known = catalog.media_keyframes(artist_name, video_code, media['filename'])
+            media['probe'] = dict(media['probe'], keyframes=known[1] if known else None)
+    return jsonify(video)
+
+IMAGE_MIMETYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.bmp': 'image/bmp'
+}
+
+def parse_image_variant():
+    """
+    Read the resize parameters of an image request: ?w=<px>&h=<px>&format=webp|jpeg|png
+    Returns (width, height, format) - all None means the original file
+    Raises ValueError on invalid parameters
+    """
+    dimensions = []
+    for name in ('w', 'h'):
+        value = request.args.get(name)
+        if value is None:
+            dimensions.append(None)
+            continue
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValueError(f'{name} must be an integer')
+        if not 1 <= value <= MAX_DIMENSION:
+            raise ValueError(f'{name} must be between 1 and {MAX_DIMENSION}')
+        dimensions.append(value)
+    
+    fmt = request.args.get('format')
+    if fmt is not None:
+        fmt = fmt.lower()
+        if fmt == 'jpg':
+            fmt = 'jpeg'
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f'format must be one of: {", ".join(OUTPUT_FORMATS)}')
+    
+    return dimensions[0], dimensions[1], fmt
+
+# Artwork requested with the current ?v= token never changes under that URL
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def image_etag(st, width=None, height=None, fmt=None):
+    """The source file's media_etag (plus the resize parameters of a variant)"""
+    etag = media_etag(st)
+    if width or height or fmt:
+        etag += f'-{width or 0}x{height or 0}-{fmt}'
+    return etag
+
+def send_image(image_path, mimetype):
+    """
+    Send an image, or a cached resized variant of it when ?w=/?h=/?format= are given
+    Conditional requests are answered with 304 from a single stat(), before the
+    file is opened or a variant rendered.
+    """
+    try:
+        width, height, fmt = parse_image_variant()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        st = os.stat(image_path)
+    except OSError:
+        return jsonify({'error': 'Image not found'}), 404
+    
+    resized = bool(width or height or fmt)
+    if resized:
+        fmt = fmt or default_format(str(image_path))
+    etag = image_etag(st, width, height, fmt) if resized else image_etag(st)
+    last_modified = datetime.fromtimestamp(st.st_mtime, timezone.utc)
+    
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+    else:
+        response = None
+        if resized:
+            variant = thumbnails.get_variant(str(image_path), width, height, fmt)
+            if variant:
+                variant_path, variant_mimetype = variant
+                response = send_file(variant_path, mimetype=variant_mimetype, etag=etag,
+                                     last_modified=last_modified)
+        if response is None:
+            response = send_file(str(image_path), mimetype=mimetype, etag=etag, last_modified=last_modified)
+    
+    if request.args.get('v') == file_version(st):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        # Unversioned or outdated URL - cache, but revalidate (cheap 304) on every use
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/video/<artist_name>/<video_code>/fanart')
 def get_fanart(artist_name, video_code):
@@ -210,7 +546,7 @@ def get_fanart(artist_name, video_code):
     fanart_path = Path(VIDEO_SERVER_PATH) / 'static' / 'artists' / artist_name / video_code / 'fanart.jpg'
     
     if fanart_path.exists():
-        return send_file(str(fanart_path), mimetype='image/jpeg')
+        return send_image(fanart_path, 'image/jpeg')
     return jsonify({'error': 'Fanart not found'}), 404
 
 @app.route('/api/video/<artist_name>/<video_code>/poster')
@@ -221,25 +557,17 @@ def get_poster(artist_name, video_code):
     # First try poster.jpg
     poster_path = video_folder / 'poster.jpg'
     if poster_path.exists():
-        return send_file(str(poster_path), mimetype='image/jpeg')
+        return send_image(poster_path, 'image/jpeg')
     
     # If poster.jpg not found, look for any image file
-    image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']
-    for file in video_folder.iterdir():
-        if file.is_file():
-            ext = file.suffix.lower()
-            if ext in image_extensions and file.name.lower() not in ['fanart.jpg', 'poster.jpg']:
-                # Determine mimetype based on extension
-                mimetype_map = {
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.png': 'image/png',
-                    '.gif': 'image/gif',
-                    '.webp': 'image/webp',
-                    '.bmp': 'image/bmp'
-                }
-                mimetype = mimetype_map.get(ext, 'image/jpeg')
-                return send_file(str(file), mimetype=mimetype)
+    try:
+        files = list(iter_files(str(video_folder)))
+    except OSError:
+        files = []
+    for entry in files:
+        ext = os.path.splitext(entry.name)[1].lower()
+        if ext in IMAGE_MIMETYPES and entry.name.lower() not in ['fanart.jpg', 'poster.jpg']:
+            return send_image(video_folder / entry.name, IMAGE_MIMETYPES[ext])
     
     return jsonify({'error': 'Poster not found'}), 404
 
@@ -252,55 +580,101 @@ def get_image(artist_name, video_code, filename):
         return jsonify({'error': 'Image not found'}), 404
     
     # Determine mimetype based on extension
-    ext = image_path.suffix.lower()
-    mimetype_map = {
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.webp': 'image/webp',
-        '.bmp': 'image/bmp'
-    }
-    mimetype = mimetype_map.get(ext, 'image/jpeg')
+    mimetype = IMAGE_MIMETYPES.get(image_path.suffix.lower(), 'image/jpeg')
     
-    return send_file(str(image_path), mimetype=mimetype)
+    return send_image(image_path, mimetype)
+
+stream_slots = threading.BoundedSemaphore(MAX_CONCURRENT_STREAMS)
+stream_reader = ChunkReader(
+    chunk_size=STREAM_CHUNK_SIZE,
+    readahead=STREAM_READAHEAD_CHUNKS,
+    pool_bytes=STREAM_BUFFER_POOL_BYTES,
+    workers=STREAM_READ_WORKERS
+) if STREAM_OFFLOAD == 'buffered' else None
 
 @app.route('/api/stream/<artist_name>/<video_code>/<filename>')
 def stream_media(artist_name, video_code, filename):
     """Stream media files with range request support for video seeking"""
     media_path = Path(VIDEO_SERVER_PATH) / 'static' / 'artists' / artist_name / video_code / filename
     
-    if not media_path.exists():
+    if not media_path.is_file():
         return jsonify({'error': 'Media file not found'}), 404
     
     # Determine MIME type based on file extension
-    ext = media_path.suffix.lower()
-    mime_types = {
-        '.mp4': 'video/mp4',
-        '.mkv': 'video/x-matroska',
-        '.avi': 'video/x-msvideo',
-        '.mov': 'video/quicktime',
-        '.webm': 'video/webm',
-        '.wav': 'audio/wav',
-        '.mp3': 'audio/mpeg',
-        '.flac': 'audio/flac',
-        '.m4a': 'audio/mp4'
-    }
-    mime_type = mime_types.get(ext, 'application/octet-stream')
+    mime_type = MEDIA_MIMETYPES.get(media_path.suffix.lower(), 'application/octet-stream')
     
-    # Use Flask's send_file with range request support for video seeking
-    return send_file(
-        str(media_path),
-        mimetype=mime_type,
-        conditional=True,
-        as_attachment=False
-    )
+    on_close = None
+    if STREAM_OFFLOAD not in PROXY_MODES:
+        # A stream occupies a server thread until the body is fully sent (or the player
+        # disconnects) - refuse extra streams instead of starving the rest of the app
+        if not stream_slots.acquire(blocking=False):
+            response = jsonify({'error': 'Too many concurrent streams'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '2'
+            return response
+        on_close = stream_slots.release
+    
+    # Range/conditional handling as send_file(conditional=True); the bytes themselves
+    # are copied by the kernel (sendfile), the front proxy or the read-ahead reader
+    try:
+        return media_response(
+            request.environ,
+            str(media_path),
+            mime_type,
+            mode=STREAM_OFFLOAD,
+            root=str(Path(VIDEO_SERVER_PATH) / 'static' / 'artists'),
+            accel_prefix=STREAM_ACCEL_PREFIX,
+            on_close=on_close,
+            reader=stream_reader
+        )
+    except OSError:
+        return jsonify({'error': 'Media file not found'}), 404
+
+def hls_source(artist_name, video_code, filename):
+    """Media path for an HLS request, or an error response"""
+    if not remux_enabled():
+        return None, (jsonify({'error': 'Remuxing is not available'}), 404)
+    media_path = Path(VIDEO_SERVER_PATH) / 'static' / 'artists' / artist_name / video_code / filename
+    if media_path.suffix.lower() not in VIDEO_EXTENSIONS or not media_path.is_file():
+        return None, (jsonify({'error': 'Media file not found'}), 404)
+    return media_path, None
+
+@app.route('/api/hls/<artist_name>/<video_code>/<filename>/index.m3u8')
+def hls_playlist(artist_name, video_code, filename):
+    """HLS playlist of a video (segments are remuxed on request and ahead of the playhead)"""
+    media_path, error = hls_source(artist_name, video_code, filename)
+    if error:
+        return error
+    try:
+        playlist = remux.playlist(str(media_path))
+    except RemuxError as e:
+        return jsonify({'error': f'Remux failed: {e}'}), 500
+    # Have the first segments ready before the player asks for them
+    hls_prefetcher.played(str(media_path), -1)
+    response = app.response_class(playlist, mimetype=PLAYLIST_MIMETYPE)
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/api/hls/<artist_name>/<video_code>/<filename>/<int:index>.ts')
+def hls_segment(artist_name, video_code, filename, index):
+    """One HLS segment, remuxed with ffmpeg on the first request"""
+    media_path, error = hls_source(artist_name, video_code, filename)
+    if error:
+        return error
+    try:
+        segment_path = remux.segment(str(media_path), index)
+    except RemuxError as e:
+        return jsonify({'error': f'Remux failed: {e}'}), 500
+    if segment_path is None:
+        return jsonify({'error': 'Segment not found'}), 404
+    hls_prefetcher.played(str(media_path), index)
+    return send_file(segment_path, mimetype=SEGMENT_MIMETYPE, conditional=True)
 
 @app.route('/api/titles/check', methods=['GET'])
 def check_missing_titles():
     """Check for videos missing titles in title.json"""
     try:
-        updater = TitleUpdater(VIDEO_SERVER_PATH)
+        updater = TitleUpdater(VIDEO_SERVER_PATH, catalog=catalog)
         summary = updater.get_all_missing_summary()
         
         total_missing = sum(info['missing_count'] for info in summary.values())
@@ -323,6 +697,7 @@ def update_missing_titles():
         "placeholder": "optional - placeholder title for missing entries",
         "scrape_real_titles": true/false - if true, scrapes real titles (JavSP-style)
     }
+    Scraping runs as a background job: the response is 202 with the job, poll /api/jobs/<id>
     """
     try:
         data = request.get_json() or {}
@@ -330,40 +705,28 @@ def update_missing_titles():
         placeholder = data.get('placeholder', '[Title Missing]')
         scrape_real = data.get('scrape_real_titles', False)
         
-        updater = TitleUpdater(VIDEO_SERVER_PATH)
+        if scrape_real:
+            job = scrape_jobs.submit(UPDATE_MISSING, {
+                'artist_name': artist_name,
+                'placeholder': placeholder,
+                'scrape_real_titles': True
+            })
+            return job_accepted(job)
+        
+        updater = TitleUpdater(VIDEO_SERVER_PATH, catalog=catalog)
         
         if artist_name:
-            # Update specific artist
+            # Update specific artist with placeholders
             missing = updater.find_missing_titles(artist_name)
             if missing:
-                if scrape_real:
-                    # Scrape real titles (JavSP-style)
-                    successful = updater.scrape_and_update_titles(artist_name, missing)
-                    # Fill remaining with placeholder
-                    remaining = [code for code in missing if code not in successful]
-                    if remaining and placeholder:
-                        placeholder_updates = {code: placeholder for code in remaining}
-                        updater.update_title_json(artist_name, placeholder_updates)
-                    
-                    return jsonify({
-                        'status': 'success',
-                        'artist': artist_name,
-                        'scraped': len(successful),
-                        'placeholder_added': len(remaining) if placeholder else 0,
-                        'total_updated': len(successful) + (len(remaining) if placeholder else 0),
-                        'scraped_codes': list(successful.keys()),
-                        'placeholder_codes': remaining if placeholder else []
-                    })
-                else:
-                    # Use placeholder
-                    updates = {code: placeholder for code in missing}
-                    updater.update_title_json(artist_name, updates)
-                    return jsonify({
-                        'status': 'success',
-                        'artist': artist_name,
-                        'updated': len(updates),
-                        'codes': missing
-                    })
+                updates = {code: placeholder for code in missing}
+                updater.update_title_json(artist_name, updates)
+                return jsonify({
+                    'status': 'success',
+                    'artist': artist_name,
+                    'updated': len(updates),
+                    'codes': missing
+                })
             else:
                 return jsonify({
                     'status': 'success',
@@ -373,17 +736,14 @@ def update_missing_titles():
                 })
         else:
             # Update all artists
-            results = updater.auto_update_all_artists(
-                placeholder_title=placeholder,
-                scrape_real_titles=scrape_real
-            )
+            results = updater.auto_update_all_artists(placeholder_title=placeholder)
             total_updated = sum(len(codes) for codes in results.values())
             
             return jsonify({
                 'status': 'success',
                 'artists_updated': len(results),
                 'total_updated': total_updated,
-                'scrape_mode': 'real titles' if scrape_real else 'placeholder',
+                'scrape_mode': 'placeholder',
                 'details': results
             })
     except Exception as e:
@@ -391,15 +751,19 @@ def update_missing_titles():
 
 @app.route('/api/videos/<artist_name>/<video_code>/scrape-date', methods=['POST'])
 def scrape_video_date(artist_name, video_code):
-    """Scrape release date for a specific video code using JavSP-style scraper"""
+    """
+    Scrape release date for a specific video code using JavSP-style scraper
+    Body (optional): {"refresh": true} - ignore the scrape cache and ask the sites again
+    """
     try:
+        data = request.get_json(silent=True) or {}
         scraper = JavMetadataScraper()
-        metadata = scraper.scrape_multiple_sources(video_code)
+        metadata = scraper.scrape_multiple_sources(video_code, refresh=bool(data.get('refresh')))
         
         if metadata and (metadata.get('year') or metadata.get('date')):
             # Update title.json with the date information
-            title_mapping = load_title_mapping(artist_name)
-            existing_metadata = title_mapping.get(video_code, {})
+            title_file = Path(VIDEO_SERVER_PATH) / 'static' / 'artists' / artist_name / 'title.json'
+            existing_metadata = title_metadata.load_title_entry(title_file, artist_name, video_code) or {}
             
             # Merge with existing metadata
             if isinstance(existing_metadata, str):
@@ -416,7 +780,7 @@ def scrape_video_date(artist_name, video_code):
             }
             
             # Update title.json
-            updater = TitleUpdater(VIDEO_SERVER_PATH)
+            updater = TitleUpdater(VIDEO_SERVER_PATH, catalog=catalog)
             updater.update_title_json(artist_name, {video_code: updated_metadata})
             
             return jsonify({
@@ -440,7 +804,7 @@ def scrape_video_date(artist_name, video_code):
 @app.route('/api/titles/<artist_name>/scrape', methods=['POST'])
 def scrape_titles_for_artist(artist_name):
     """
-    Scrape real titles for missing videos (JavSP-style)
+    Scrape real titles for missing videos (JavSP-style) as a background job
     Body: {
         "codes": ["CODE1", "CODE2"] - optional, scrapes all missing if not provided
     }
@@ -448,24 +812,51 @@ def scrape_titles_for_artist(artist_name):
     try:
         data = request.get_json() or {}
         codes = data.get('codes')
+        if codes is not None and not (isinstance(codes, list) and all(isinstance(c, str) for c in codes)):
+            return jsonify({'error': 'codes must be a list of strings'}), 400
         
-        updater = TitleUpdater(VIDEO_SERVER_PATH)
-        successful = updater.scrape_and_update_titles(artist_name, codes)
-        
-        return jsonify({
-            'status': 'success',
-            'artist': artist_name,
-            'scraped': len(successful),
-            'titles': successful
-        })
+        job = scrape_jobs.submit(SCRAPE_ARTIST, {'artist_name': artist_name, 'codes': codes})
+        return job_accepted(job)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def job_accepted(job):
+    """202 response pointing at the job's status endpoint"""
+    response = jsonify({'status': job['status'], 'job_id': job['id'], 'job': job})
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job["id"]}'
+    return response
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Recent scrape jobs, newest first"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify(scrape_jobs.list(limit))
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status and progress of a scrape job (with its result once finished)"""
+    job = scrape_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a scrape job - a running job stops after its current chunk of codes"""
+    job = scrape_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
 @app.route('/api/titles/<artist_name>/missing', methods=['GET'])
 def get_missing_titles_for_artist(artist_name):
     """Get list of missing titles for a specific artist"""
     try:
-        updater = TitleUpdater(VIDEO_SERVER_PATH)
+        updater = TitleUpdater(VIDEO_SERVER_PATH, catalog=catalog)
         missing = updater.find_missing_titles(artist_name)
         
         return jsonify({
@@ -476,7 +867,28 @@ def get_missing_titles_for_artist(artist_name):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Cache statistics"""
+    return jsonify({
+        'title_cache': title_metadata.title_cache.stats(),
+        'title_writer': title_metadata.title_writer.stats(),
+        'title_index': title_metadata.title_index.stats(),
+        'library_scan': folder_scanner.stats(),
+        'thumbnail_cache': thumbnail_cache.stats(),
+        'thumbnail_prewarm': thumbnail_prewarmer.stats(),
+        'scrape_cache': scrape_cache.stats(),
+        'stream_buffers': stream_reader.stats() if stream_reader is not None else None,
+        'remux': remux.stats(),
+        'hls_prefetch': hls_prefetcher.stats(),
+        'media_probe': media_prober.stats(),
+        'search': library_search.stats(),
+        'listing_cache': listing_cache.stats()
+    })
+
 if __name__ == '__main__':
+    # Development server - production runs under gunicorn (see gunicorn.conf.py)
     # use_reloader=False prevents socket errors on Windows in debug mode
-    app.run(host='0.0.0.0', port=1699, debug=True, use_reloader=False)
+    start_background_services()
+    app.run(host='0.0.0.0', port=1699, debug=True, use_reloader=False, threaded=True)
 
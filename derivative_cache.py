@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Derivative Cache - Content-addressed on-disk cache for generated files
+(resized posters, remuxed segments, ...). Entries are keyed by the source file's
+path, mtime and size plus the generation parameters, so a changed source never
+serves a stale derivative. The cache is bounded by total size and evicts the
+least recently used entries first.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+# Hits only refresh the file mtime (used to restore LRU order after a restart)
+# when it is older than this, to avoid a write per request
+TOUCH_INTERVAL = 600
+
+
+class DerivativeCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        # path -> size, least recently used first
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+
+    @staticmethod
+    def make_key(source_path: str, st: os.stat_result, *params) -> str:
+        """Content address for a derivative of source_path with the given parameters"""
+        raw = '|'.join([os.path.abspath(source_path), str(st.st_mtime_ns), str(st.st_size)] + [str(p) for p in params])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str, suffix: str = '') -> Path:
+        return self.root / key[:2] / f'{key}{suffix}'
+
+    def _load(self):
+        """Index existing entries once, oldest first"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.root.exists():
+            return
+
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, path, st.st_size))
+
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._bytes += size
+        self._evict()
+
+    def contains(self, key: str, suffix: str = '') -> bool:
+        """Check for an entry without counting a hit/miss or touching LRU order"""
+        with self._lock:
+            self._load()
+            return str(self.path_for(key, suffix)) in self._entries
+
+    def get(self, key: str, suffix: str = '') -> Optional[Path]:
+        """Returns the cached file, or None on a miss"""
+        path = self.path_for(key, suffix)
+        spath = str(path)
+        with self._lock:
+            self._load()
+            if spath not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(spath)
+            self.hits += 1
+
+        try:
+            if time.time() - os.stat(spath).st_mtime > TOUCH_INTERVAL:
+                os.utime(spath)
+        except OSError:
+            # Removed behind our back
+            with self._lock:
+                size = self._entries.pop(spath, None)
+                if size is not None:
+                    self._bytes -= size
+            return None
+        return path
+
+    def put(self, key: str, data: bytes, suffix: str = '') -> Path:
+        """Store data atomically and return its path"""
+        path = self.path_for(key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.add(path)
+        return path
+
+    def add(self, path: Path):
+        """Account for a file written into the cache directory by someone else (e.g. ffmpeg)"""
+        spath = str(path)
+        size = os.path.getsize(spath)
+        with self._lock:
+            self._load()
+            old = self._entries.pop(spath, None)
+            if old is not None:
+                self._bytes -= old
+            self._entries[spath] = size
+            self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        while self._entries and self._bytes > self.max_bytes:
+            path, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._load()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,50 @@
+"""
+Gunicorn configuration for production serving
+    gunicorn --config gunicorn.conf.py app:app
+
+Threaded workers (gthread): a video stream holds one thread for as long as the
+player keeps reading, so each worker process gets many threads, and app.py caps
+concurrent streams per process (MAX_CONCURRENT_STREAMS) below the thread count
+so API and image requests always find a free thread.
+
+Graceful reload (new code, same socket, in-flight streams finish):
+    kill -HUP <master pid>      or      docker kill -s HUP nas-player
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '1699')}"
+
+worker_class = 'gthread'
+# One process by default: caches (listings, thumbnails index, pending title.json updates)
+# and background work (probing, prewarming) are per process. Extra workers import the app
+# on their own and pick up each other's library changes through the shared catalog.
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+# Keep above MAX_CONCURRENT_STREAMS (default 48) to leave room for API/image requests
+threads = int(os.getenv('GUNICORN_THREADS', '64'))
+
+# gthread workers heartbeat from their main loop, so this is not a per-request
+# limit - multi-GB downloads and paused players are not killed by it
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+# Seconds in-flight requests get to finish on reload/shutdown before workers are killed
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+# Browsers fire many range requests while seeking; keep their connections open
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '75'))
+
+# sendfile() is on by default - don't set `sendfile` here: gunicorn treats any
+# explicit value as --no-sendfile. Media streams rely on it (STREAM_OFFLOAD=sendfile).
+
+# Listen backlog for bursts of grid image requests
+backlog = 2048
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# Trust X-Forwarded-* from a reverse proxy on the same host (Synology DSM)
+forwarded_allow_ips = os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
+def post_worker_init(worker):
+    # Background threads (title writer, prober, watcher, jobs) run in each worker, after it loaded the app
+    from app import start_background_services
+    start_background_services()
@@ -4,13 +4,18 @@ JavSP-style Scraper - Fetches video titles from multiple metadata sources
 Inspired by JavSP (https://github.com/Yuukiy/JavSP)
 """
 import re
+import threading
 import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional, Dict, List, Tuple
 from urllib.parse import quote, urljoin
 import json
 from datetime import datetime
 
+from rate_limit import HostRateLimiter, retry_after_seconds
+from scrape_cache import ScrapeCache, scrape_cache
+
 try:
     from bs4 import BeautifulSoup
     BEAUTIFULSOUP_AVAILABLE = True
@@ -18,21 +23,66 @@ except ImportError:
     BEAUTIFULSOUP_AVAILABLE = False
     print("Warning: beautifulsoup4 not installed. HTML parsing will be limited.")
 
+# Politeness per source: sustained requests/second and burst against its host,
+# and how many codes may be scraped from it at the same time
+SOURCE_LIMITS = {
+    'JavDB': {'host': 'javdb.com', 'rate': 1.0, 'burst': 2, 'concurrency': 2},
+    'JavLibrary': {'host': 'javlibrary.com', 'rate': 0.5, 'burst': 1, 'concurrency': 1},
+}
+# Back-off applied to a host that answers 429/503 without a usable Retry-After
+THROTTLED_PAUSE = 30.0
+
+# Shared by every scraper instance and thread in the process
+host_limiter = HostRateLimiter(default_rate=0.5, default_burst=1)
+for _limits in SOURCE_LIMITS.values():
+    host_limiter.configure(_limits['host'], _limits['rate'], _limits['burst'])
+_source_slots = {name: threading.BoundedSemaphore(limits['concurrency']) for name, limits in SOURCE_LIMITS.items()}
+
 class JavMetadataScraper:
     """
     Scraper that fetches video metadata from multiple sources
     Similar to JavSP's multi-site scraping approach
     """
     
-    def __init__(self, timeout: int = 10):
+    def __init__(self, timeout: int = 10, cache: Optional[ScrapeCache] = None):
         self.timeout = timeout
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.cache = cache if cache is not None else scrape_cache
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
             'Accept-Charset': 'UTF-8',
-        })
+        }
+        # requests.Session isn't thread-safe - one per worker thread
+        self._local = threading.local()
+    
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(self.headers)
+        return session
+    
+    def _get(self, url: str) -> requests.Response:
+        """
+        GET through the per-host rate limiter
+        Failed requests (network errors, 429, 5xx) are counted per thread, so a
+        source that couldn't be reached isn't mistaken for "code not found".
+        """
+        host_limiter.acquire(url)
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException:
+            self._local.request_errors = getattr(self._local, 'request_errors', 0) + 1
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            self._local.request_errors = getattr(self._local, 'request_errors', 0) + 1
+        if response.status_code in (429, 503):
+            pause = retry_after_seconds(response.headers.get('Retry-After'), THROTTLED_PAUSE)
+            print(f"{host_limiter.host_of(url)} is throttling us, pausing for {pause:.0f}s")
+            host_limiter.pause(url, pause)
+        return response
     
     def _get_text(self, response):
         """Get properly decoded text from response"""
@@ -142,7 +192,7 @@ class JavMetadataScraper:
             # JavDB search URL
             search_url = f"https://javdb.com/search?q={quote(code)}"
             
-            response = self.session.get(search_url, timeout=self.timeout)
+            response = self._get(search_url)
             if response.status_code != 200:
                 return None
             
@@ -153,7 +203,7 @@ class JavMetadataScraper:
                 detail_match = re.search(r'href="(/v/\d+)"', response_text)
                 if detail_match:
                     detail_url = urljoin('https://javdb.com', detail_match.group(1))
-                    detail_response = self.session.get(detail_url, timeout=self.timeout)
+                    detail_response = self._get(detail_url)
                     if detail_response.status_code == 200:
                         detail_response_text = self._get_text(detail_response)
                         title_match = re.search(r'<strong[^>]*>([^<]+)</strong>', detail_response_text)
@@ -183,7 +233,7 @@ class JavMetadataScraper:
                 detail_path = result_link.get('href')
                 if detail_path:
                     detail_url = urljoin('https://javdb.com', detail_path)
-                    detail_response = self.session.get(detail_url, timeout=self.timeout)
+                    detail_response = self._get(detail_url)
                     if detail_response.status_code == 200:
                         detail_response_text = self._get_text(detail_response)
                         detail_soup = BeautifulSoup(detail_response_text, 'html.parser')
@@ -276,7 +326,7 @@ class JavMetadataScraper:
             # JavLibrary search
             search_url = f"https://www.javlibrary.com/en/vl_searchbyid.php?keyword={quote(code)}"
             
-            response = self.session.get(search_url, timeout=self.timeout)
+            response = self._get(search_url)
             if response.status_code != 200:
                 return None
             
@@ -369,21 +419,36 @@ class JavMetadataScraper:
         
         return True
     
-    def scrape_multiple_sources(self, code: str, max_retries: int = 3) -> Optional[Dict[str, any]]:
+    def scrape_multiple_sources(self, code: str, max_retries: int = 3, refresh: bool = False) -> Optional[Dict[str, any]]:
         """
         Try multiple sources, similar to JavSP's aggregation approach
         Returns dict with 'title' and 'year' from first successful scrape
+        Outcomes (including "not found") are cached by normalized code; refresh=True skips the cache
         """
+        cache_key = self.normalize_code(code)
+        if not refresh:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached['metadata']
+        
         # DMM removed - it blocks scrapers and returns error pages
         sources = [
             ('JavDB', self.scrape_javdb),
             ('JavLibrary', self.scrape_javlibrary),
         ]
         
+        # source name -> {'result': last raw result, 'errors': failed requests/attempts}
+        source_results = {}
+        metadata = None
         for source_name, scraper_func in sources:
+            outcome = source_results[source_name] = {'result': None, 'errors': 0}
+            self._local.request_errors = 0
             for attempt in range(max_retries):
                 try:
-                    result = scraper_func(code)
+                    # Requests themselves are paced by the per-host token buckets
+                    with _source_slots[source_name]:
+                        result = scraper_func(code)
+                    outcome['result'] = result
                     if result and result.get('title'):
                         # Validate title is not an error message
                         if self._is_valid_title(result['title']):
@@ -397,41 +462,52 @@ class JavMetadataScraper:
                                 else:
                                     date_info = f", Year: {result['year']}"
                             print(f"Found metadata for {code} from {source_name}: {title_preview}{date_info}")
-                            return result
+                            metadata = result
+                            break
                         else:
                             print(f"Invalid title from {source_name} for {code}: {result['title']} (skipping)")
-                    
-                    # Rate limiting - be respectful
-                    if attempt < max_retries - 1:
-                        time.sleep(1)
                 
                 except Exception as e:
+                    outcome['errors'] += 1
                     print(f"Error scraping {source_name} for {code} (attempt {attempt+1}): {e}")
                     if attempt < max_retries - 1:
                         time.sleep(2)
-            
-            # Small delay between sources
-            time.sleep(0.5)
+            outcome['errors'] += self._local.request_errors
+            if metadata is not None:
+                break
         
-        return None
+        # Only remember "not found" when every source actually answered
+        if metadata is not None or not any(outcome['errors'] for outcome in source_results.values()):
+            self.cache.put(cache_key, metadata, source_results)
+        return metadata
     
-    def batch_scrape(self, codes: List[str], delay: float = 1.0) -> Dict[str, Optional[Dict[str, any]]]:
+    def batch_scrape(self, codes: List[str], max_workers: Optional[int] = None) -> Dict[str, Optional[Dict[str, any]]]:
         """
-        Scrape multiple codes with rate limiting
+        Scrape multiple codes concurrently
+        Politeness is enforced per site (SOURCE_LIMITS), so the pool only needs enough
+        workers to keep every source busy - by default the sum of their concurrency caps.
         Returns dict mapping code -> {'title': str, 'year': int, 'month': int, 'day': int, 'date': dict}
         """
+        if max_workers is None:
+            max_workers = sum(limits['concurrency'] for limits in SOURCE_LIMITS.values())
+        
         results = {}
+        if not codes:
+            return results
         
-        for i, code in enumerate(codes):
-            print(f"Scraping {code} ({i+1}/{len(codes)})...")
-            metadata = self.scrape_multiple_sources(code)
-            results[code] = metadata
-            
-            # Rate limiting between requests
-            if i < len(codes) - 1:
-                time.sleep(delay)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scrape') as pool:
+            futures = {pool.submit(self.scrape_multiple_sources, code): code for code in codes}
+            for done, future in enumerate(as_completed(futures), 1):
+                code = futures[future]
+                try:
+                    results[code] = future.result()
+                except Exception as e:
+                    print(f"Error scraping {code}: {e}")
+                    results[code] = None
+                print(f"Scraped {code} ({done}/{len(codes)})")
         
-        return results
+        # Keep the caller's order
+        return {code: results[code] for code in codes}
 
 if __name__ == '__main__':
     # Example usage
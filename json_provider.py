@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+JSON Provider - Flask JSON through orjson when it is installed
+orjson serializes lists of dicts several times faster than the stdlib encoder and
+returns bytes, which go into the response as they are. Without orjson the app keeps
+Flask's default provider.
+"""
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with orjson doing the encoding/decoding (same sort_keys/default handling)"""
+
+    def _options(self) -> int:
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=self.default, option=self._options())
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            # Options orjson doesn't have (indent, separators, ...) - use the stdlib
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def json_provider_class(name: str = 'auto'):
+    """'auto' - orjson if installed, 'orjson' (same, warns when missing), 'stdlib' - Flask's default"""
+    if name in ('auto', 'orjson') and ORJSON_AVAILABLE:
+        return OrjsonProvider
+    if name == 'orjson':
+        print("Warning: orjson not installed. Using the standard library JSON encoder.")
+    return DefaultJSONProvider
+
+
+def dumps_bytes(provider: DefaultJSONProvider, obj: Any) -> bytes:
+    """Serialize obj with the app's provider as response bytes"""
+    if isinstance(provider, OrjsonProvider):
+        return provider.dumps_bytes(obj)
+    return provider.dumps(obj).encode('utf-8')
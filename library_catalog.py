@@ -0,0 +1,812 @@
+#!/usr/bin/env python3
+"""
+Library Catalog - Persistent SQLite index of the Video_Server library
+Records artists, video code folders, media files, artwork and title.json metadata
+so listings no longer walk the share on every request.
+Folders are re-scanned incrementally, only when their mtime changes.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from library_records import ArtistRecord, MediaRecord, TitleRecord, VideoRecord, intern_name
+from library_scanner import FolderScanner, file_version, folder_scanner, scan_code_folder
+
+# Bump when the schema changes - the catalog is a cache, so it is simply rebuilt
+SCHEMA_VERSION = 5
+# Older versions that only need their probes with keyframes redone (keyframe times are
+# presentation times since 5) - the rest of the catalog is kept
+PROBE_KEYFRAMES_VERSIONS = (4,)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artists (
+    name TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    has_icon INTEGER NOT NULL DEFAULT 0,
+    icon_version TEXT,
+    title_mtime_ns INTEGER,
+    title_size INTEGER
+);
+CREATE TABLE IF NOT EXISTS videos (
+    artist TEXT NOT NULL,
+    code TEXT NOT NULL,
+    mtime_ns INTEGER,
+    has_poster INTEGER NOT NULL DEFAULT 0,
+    has_fanart INTEGER NOT NULL DEFAULT 0,
+    fallback_image TEXT,
+    poster_version TEXT,
+    fanart_version TEXT,
+    fallback_version TEXT,
+    PRIMARY KEY (artist, code)
+);
+CREATE TABLE IF NOT EXISTS media (
+    artist TEXT NOT NULL,
+    code TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    type TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    PRIMARY KEY (artist, code, filename)
+);
+CREATE TABLE IF NOT EXISTS probes (
+    artist TEXT NOT NULL,
+    code TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    duration REAL,
+    bitrate INTEGER,
+    video_codec TEXT,
+    audio_codec TEXT,
+    width INTEGER,
+    height INTEGER,
+    keyframes TEXT,
+    error TEXT,
+    PRIMARY KEY (artist, code, filename)
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    artist TEXT
+);
+CREATE TABLE IF NOT EXISTS titles (
+    artist TEXT NOT NULL,
+    code TEXT NOT NULL,
+    title TEXT,
+    year INTEGER,
+    month INTEGER,
+    day INTEGER,
+    date TEXT,
+    PRIMARY KEY (artist, code)
+);
+"""
+
+
+# Notifications kept in the changes table for other processes sharing the catalog file -
+# one that falls further behind treats everything as changed
+CHANGE_LOG_ROWS = 10000
+
+# Media columns plus the probe of the same file version (see _media_from_row)
+MEDIA_COLUMNS = (
+    'm.filename, m.type, m.size, m.mtime_ns, p.artist IS NOT NULL AS probed, p.error AS probe_error, '
+    'p.duration, p.bitrate, p.video_codec, p.audio_codec, p.width, p.height'
+)
+PROBE_JOIN = (
+    'LEFT JOIN probes p ON p.artist = m.artist AND p.code = m.code AND p.filename = m.filename '
+    'AND p.size IS m.size AND p.mtime_ns IS m.mtime_ns'
+)
+
+
+def _icon_version(icon_path: str) -> Optional[str]:
+    try:
+        return file_version(os.stat(icon_path))
+    except OSError:
+        return None
+
+
+class LibraryCatalog:
+    """
+    SQLite-backed index of artists, video code folders and their metadata
+
+    refresh_artists() / refresh_artist() bring the index up to date with the disk:
+    - an artist folder is only re-listed when its mtime changed
+    - a code folder is only re-scanned when its mtime changed
+    - title.json is only re-parsed when its mtime or size changed
+    Folder checks are throttled by refresh_interval seconds per artist.
+    Code folders are stat'ed and listed through scanner (concurrently on network mounts).
+
+    Several processes (gunicorn workers) may share the catalog file. The first one to see a
+    change on disk updates the rows, after which the others find nothing changed, so every
+    notification is also logged in the changes table and sync_shared() replays the ones of
+    other processes to this process's listeners.
+    """
+
+    def __init__(self, video_server_path: str, state_dir: str,
+                 title_loader: Callable[[str], Dict[str, Dict]],
+                 refresh_interval: float = 10.0,
+                 scanner: Optional[FolderScanner] = None):
+        self.video_server_path = Path(video_server_path)
+        self.artists_path = self.video_server_path / 'static' / 'artists'
+        self.state_dir = Path(state_dir)
+        self.db_path = self.state_dir / 'catalog.sqlite3'
+        self.title_loader = title_loader
+        self.refresh_interval = refresh_interval
+        self.scanner = scanner if scanner is not None else folder_scanner
+
+        self._lock = threading.RLock()
+        self._root_mtime_ns = None
+        self._root_checked = 0.0
+        self._artist_checked: Dict[str, float] = {}
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+        self._folder_listeners: List[Callable[[str, str, Dict[str, any]], None]] = []
+        self._video_listeners: List[Callable[[Optional[str], Optional[Set[str]]], None]] = []
+        # (artist, code, folder info) indexed during the current refresh, fired after the lock is released
+        self._indexed_folders: List[Tuple[str, str, Dict[str, any]]] = []
+        # artist -> codes whose entry changed since the last notification (None - any of them)
+        self._changed_codes: Dict[str, Optional[Set[str]]] = {}
+        # Tags this process's rows in the changes table
+        self._origin = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._conn = self._connect()
+        self._data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        self._change_seq = self._conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+
+        if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self._migrate(conn)
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """
+        Bring the file to SCHEMA_VERSION in one write transaction - workers starting together
+        queue on BEGIN IMMEDIATE and the later ones find the version already current
+        (executescript() would commit on its own, so the schema runs statement by statement)
+        """
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version in PROBE_KEYFRAMES_VERSIONS:
+                # Re-probed by the startup sweep (unprobed_media)
+                conn.execute('DELETE FROM probes WHERE keyframes IS NOT NULL')
+            elif version != SCHEMA_VERSION:
+                # Stale cache from an older layout - drop it and rebuild from disk
+                for table in ('artists', 'videos', 'media', 'probes', 'titles', 'changes'):
+                    conn.execute(f'DROP TABLE IF EXISTS {table}')
+            if version != SCHEMA_VERSION:
+                for statement in SCHEMA.split(';'):
+                    if statement.strip():
+                        conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def add_listener(self, callback: Callable[[Optional[str]], None]):
+        """
+        Register a callback fired after a refresh changed the catalog
+        Called with the artist name, or None when the set of artists changed
+        """
+        self._listeners.append(callback)
+
+    def add_folder_listener(self, callback: Callable[[str, str, Dict[str, any]], None]):
+        """
+        Register a callback fired for every new or changed code folder
+        Called with (artist_name, code, info) where info is scan_code_folder()'s result plus 'path'
+        """
+        self._folder_listeners.append(callback)
+
+    def add_video_listener(self, callback: Callable[[Optional[str], Optional[Set[str]]], None]):
+        """
+        Register a callback fired with the codes whose list_videos() entry changed
+        Called with (artist_name, codes) - codes is None when any entry may have changed
+        (artist removed); artist_name is None when the set of artists changed
+        """
+        self._video_listeners.append(callback)
+
+    def _mark_changed(self, artist_name: str, code: Optional[str] = None):
+        """Record a changed entry for the next notification (code None - the whole artist)"""
+        if code is None:
+            self._changed_codes[artist_name] = None
+            return
+        codes = self._changed_codes.setdefault(artist_name, set())
+        if codes is not None:
+            codes.add(code)
+
+    def _notify(self, artist_name: Optional[str]):
+        with self._lock:
+            self._log_change(artist_name)
+            indexed, self._indexed_folders = self._indexed_folders, []
+            if artist_name is None:
+                codes = None
+                self._changed_codes.clear()
+            else:
+                codes = self._changed_codes.pop(artist_name, set())
+        for artist, code, info in indexed:
+            for callback in self._folder_listeners:
+                try:
+                    callback(artist, code, info)
+                except Exception as e:
+                    print(f"Catalog folder listener failed for {artist}/{code}: {e}")
+        for callback in self._video_listeners:
+            callback(artist_name, codes)
+        for callback in self._listeners:
+            callback(artist_name)
+
+    def _log_change(self, artist_name: Optional[str]):
+        """Record a notification for the other processes (caller holds the lock, outside a transaction)"""
+        try:
+            with self._conn:
+                seq = self._conn.execute(
+                    'INSERT INTO changes (origin, artist) VALUES (?, ?)', (self._origin, artist_name)
+                ).lastrowid
+                self._conn.execute('DELETE FROM changes WHERE seq <= ?', (seq - CHANGE_LOG_ROWS,))
+        except sqlite3.Error as e:
+            print(f"Error logging catalog change: {e}")
+
+    def sync_shared(self):
+        """
+        Fire the listeners for changes other processes made to the catalog file since the last call
+        Costs one PRAGMA when no other connection committed anything
+        """
+        with self._lock:
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._data_version = data_version
+            oldest = self._conn.execute('SELECT MIN(seq) FROM changes').fetchone()[0]
+            rows = self._conn.execute(
+                'SELECT seq, origin, artist FROM changes WHERE seq > ? ORDER BY seq', (self._change_seq,)
+            ).fetchall()
+            # Rows this process hasn't seen were pruned already - assume anything changed
+            everything = oldest is not None and oldest > self._change_seq + 1
+            if rows:
+                self._change_seq = rows[-1]['seq']
+            artists: Set[Optional[str]] = set()
+            for r in rows:
+                if r['origin'] != self._origin:
+                    artists.add(r['artist'])
+            if everything or None in artists:
+                artists = {None}
+        # Which codes changed isn't logged - listeners reload the whole artist
+        for artist_name in artists:
+            for callback in self._video_listeners:
+                callback(artist_name, None)
+            for callback in self._listeners:
+                callback(artist_name)
+
+    def _is_valid_name(self, name: str) -> bool:
+        """Only direct children of the artists folder are indexed"""
+        return bool(name) and name not in ('.', '..') and '/' not in name and '\\' not in name
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def refresh_artists(self, force: bool = False) -> bool:
+        """
+        Sync the list of artist folders with the disk
+        Only lists the artists folder when its mtime changed
+        Returns True if any artist was added or removed
+        """
+        changed = self._refresh_artists(force)
+        if changed:
+            self._notify(None)
+        return changed
+
+    def _refresh_artists(self, force: bool) -> bool:
+        with self._lock:
+            now = time.time()
+            if not force and now - self._root_checked < self.refresh_interval:
+                return False
+            self._root_checked = now
+
+            try:
+                root_mtime_ns = os.stat(self.artists_path).st_mtime_ns
+            except OSError:
+                changed = bool(self.artist_names())
+                self._clear()
+                self._root_mtime_ns = None
+                return changed
+
+            if not force and root_mtime_ns == self._root_mtime_ns:
+                return False
+
+            on_disk = set()
+            with os.scandir(self.artists_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        on_disk.add(entry.name)
+
+            known = set(self.artist_names())
+            with self._conn:
+                for name in known - on_disk:
+                    self._delete_artist(name)
+                for name in on_disk - known:
+                    icon_version = _icon_version(str(self.artists_path / name / 'icon.jpg'))
+                    self._conn.execute(
+                        'INSERT INTO artists (name, has_icon, icon_version) VALUES (?, ?, ?)',
+                        (name, int(icon_version is not None), icon_version)
+                    )
+
+            self._root_mtime_ns = root_mtime_ns
+            return known != on_disk
+
+    def refresh_artist(self, artist_name: str, force: bool = False, shallow: bool = False) -> bool:
+        """
+        Bring one artist up to date with the disk
+        title.json is checked on every call (a single stat); code folders are
+        checked at most once per refresh_interval unless force is set
+        shallow: only re-list the folders when the artist folder's mtime changed - no stat
+        per code folder, so media added inside an existing folder is left to the next full refresh
+        Returns True if anything in the catalog changed
+        """
+        if not self._is_valid_name(artist_name):
+            return False
+
+        changed = self._refresh_artist(artist_name, force, shallow)
+        if changed:
+            self._notify(artist_name)
+        return changed
+
+    def _refresh_artist(self, artist_name: str, force: bool, shallow: bool = False) -> bool:
+        with self._lock:
+            artist_path = self.artists_path / artist_name
+            try:
+                artist_mtime_ns = os.stat(artist_path).st_mtime_ns
+            except OSError:
+                if self.has_artist(artist_name):
+                    with self._conn:
+                        self._delete_artist(artist_name)
+                    return True
+                return False
+
+            row = self._conn.execute(
+                'SELECT mtime_ns, has_icon, title_mtime_ns, title_size FROM artists WHERE name = ?',
+                (artist_name,)
+            ).fetchone()
+
+            changed = False
+            with self._conn:
+                if row is None:
+                    self._conn.execute('INSERT INTO artists (name) VALUES (?)', (artist_name,))
+
+                now = time.time()
+                checked = self._artist_checked.get(artist_name, 0.0)
+                if shallow:
+                    due = row is None or artist_mtime_ns != row['mtime_ns']
+                else:
+                    due = row is None or row['mtime_ns'] is None or now - checked >= self.refresh_interval
+                if force or due:
+                    self._artist_checked[artist_name] = now
+                    changed |= self._refresh_folders(artist_name, artist_path, artist_mtime_ns,
+                                                     row['mtime_ns'] if row else None)
+
+                changed |= self._refresh_titles(artist_name, artist_path, row)
+
+            return changed
+
+    def refresh_video(self, artist_name: str, code: str) -> bool:
+        """
+        Bring a single code folder up to date without listing the rest of the artist
+        Returns True if anything in the catalog changed
+        """
+        if not self._is_valid_name(artist_name) or not self._is_valid_name(code):
+            return False
+
+        with self._lock:
+            artist_path = self.artists_path / artist_name
+            row = self._conn.execute(
+                'SELECT mtime_ns, has_icon, title_mtime_ns, title_size FROM artists WHERE name = ?',
+                (artist_name,)
+            ).fetchone()
+            if row is None and not artist_path.is_dir():
+                return False
+
+            known = self._conn.execute(
+                'SELECT mtime_ns FROM videos WHERE artist = ? AND code = ?', (artist_name, code)
+            ).fetchone()
+
+            changed = False
+            with self._conn:
+                if row is None:
+                    # Folder list stays unknown (mtime_ns NULL) until refresh_artist lists it
+                    self._conn.execute('INSERT INTO artists (name) VALUES (?)', (artist_name,))
+
+                try:
+                    mtime_ns = os.stat(artist_path / code).st_mtime_ns
+                except OSError:
+                    mtime_ns = None
+
+                if mtime_ns is None:
+                    if known is not None:
+                        self._delete_video(artist_name, code)
+                        changed = True
+                elif known is None or known['mtime_ns'] != mtime_ns:
+                    self._index_code_folder(artist_name, code, artist_path / code, mtime_ns)
+                    changed = True
+
+                changed |= self._refresh_titles(artist_name, artist_path, row)
+
+        if changed:
+            self._notify(artist_name)
+        return changed
+
+    def _refresh_folders(self, artist_name: str, artist_path: Path,
+                         artist_mtime_ns: int, known_mtime_ns: Optional[int]) -> bool:
+        known = {
+            r['code']: r['mtime_ns'] for r in self._conn.execute(
+                'SELECT code, mtime_ns FROM videos WHERE artist = ?', (artist_name,)
+            )
+        }
+        current: Dict[str, int] = {}
+
+        if artist_mtime_ns != known_mtime_ns:
+            # Folders were added/removed - list the artist folder
+            icon_version = None
+            with os.scandir(artist_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if entry.name != '__pycache__':
+                            current[entry.name] = entry.stat().st_mtime_ns
+                    elif entry.name == 'icon.jpg':
+                        icon_version = file_version(entry.stat())
+            self._conn.execute(
+                'UPDATE artists SET mtime_ns = ?, has_icon = ?, icon_version = ? WHERE name = ?',
+                (artist_mtime_ns, int(icon_version is not None), icon_version, artist_name)
+            )
+        else:
+            # Same set of folders - only their contents may have changed
+            for code, mtime_ns, error in self.scanner.folder_mtimes(
+                    (code, str(artist_path / code)) for code in known):
+                if error is None:
+                    current[code] = mtime_ns
+
+        changed = False
+        for code in set(known) - set(current):
+            self._delete_video(artist_name, code)
+            changed = True
+
+        stale = [
+            ((code, mtime_ns), str(artist_path / code))
+            for code, mtime_ns in current.items() if known.get(code) != mtime_ns
+        ]
+        for (code, mtime_ns), info, _ in self.scanner.scan_code_folders(stale):
+            self._store_code_folder(artist_name, code, artist_path / code, mtime_ns, info)
+            changed = True
+
+        return changed
+
+    def _index_code_folder(self, artist_name: str, code: str, folder_path: Path, mtime_ns: int):
+        try:
+            info = scan_code_folder(str(folder_path))
+        except OSError:
+            info = None
+        self._store_code_folder(artist_name, code, folder_path, mtime_ns, info)
+
+    def _store_code_folder(self, artist_name: str, code: str, folder_path: Path, mtime_ns: int,
+                           info: Optional[Dict[str, any]]):
+        """Record a scan_code_folder() result (None - the folder couldn't be listed)"""
+        if info is None:
+            self._delete_video(artist_name, code)
+            return
+        self._mark_changed(artist_name, code)
+
+        self._conn.execute('DELETE FROM media WHERE artist = ? AND code = ?', (artist_name, code))
+        self._conn.execute(
+            'INSERT OR REPLACE INTO videos (artist, code, mtime_ns, has_poster, has_fanart, fallback_image, '
+            'poster_version, fanart_version, fallback_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (artist_name, code, mtime_ns, int(info['has_poster']), int(info['has_fanart']), info['fallback_image'],
+             info['poster_version'], info['fanart_version'], info['fallback_version'])
+        )
+        self._conn.executemany(
+            'INSERT INTO media (artist, code, filename, type, size, mtime_ns) VALUES (?, ?, ?, ?, ?, ?)',
+            [(artist_name, code, m['filename'], m['type'], m['size'], m['mtime_ns']) for m in info['media']]
+        )
+        # Probes of files that are gone (changed files keep theirs until re-probed)
+        self._conn.execute(
+            'DELETE FROM probes WHERE artist = ? AND code = ? AND filename NOT IN '
+            '(SELECT filename FROM media WHERE artist = ? AND code = ?)',
+            (artist_name, code, artist_name, code)
+        )
+        if self._folder_listeners:
+            info['path'] = str(folder_path)
+            self._indexed_folders.append((artist_name, code, info))
+
+    def reload_titles(self, artist_name: str) -> bool:
+        """
+        Re-read an artist's titles even though title.json looks unchanged
+        (updates queued in the title writer are visible before the file is written)
+        """
+        if not self._is_valid_name(artist_name):
+            return False
+        with self._lock, self._conn:
+            # A signature no file has - the next refresh re-parses
+            self._conn.execute(
+                'UPDATE artists SET title_mtime_ns = -1, title_size = -1 WHERE name = ?', (artist_name,)
+            )
+        return self.refresh_artist(artist_name)
+
+    def _refresh_titles(self, artist_name: str, artist_path: Path, row: Optional[sqlite3.Row]) -> bool:
+        try:
+            st = os.stat(artist_path / 'title.json')
+            signature = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            signature = (None, None)
+
+        known = (row['title_mtime_ns'], row['title_size']) if row else (None, None)
+        if row is not None and signature == known:
+            return False
+
+        mapping = self.title_loader(artist_name) if signature[0] is not None else {}
+        rows = {
+            code: (meta.get('title'), meta.get('year'), meta.get('month'), meta.get('day'),
+                   json.dumps(meta['date']) if meta.get('date') is not None else None)
+            for code, meta in mapping.items()
+        }
+        known_rows = {
+            r['code']: (r['title'], r['year'], r['month'], r['day'], r['date'])
+            for r in self._conn.execute(
+                'SELECT code, title, year, month, day, date FROM titles WHERE artist = ?', (artist_name,)
+            )
+        }
+        # Only the entries that differ are rewritten (and reported as changed)
+        removed = [code for code in known_rows if code not in rows]
+        changed = {code: row for code, row in rows.items() if known_rows.get(code) != row}
+        self._conn.executemany(
+            'DELETE FROM titles WHERE artist = ? AND code = ?', [(artist_name, code) for code in removed]
+        )
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO titles (artist, code, title, year, month, day, date) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(artist_name, code, *row) for code, row in changed.items()]
+        )
+        for code in removed:
+            self._mark_changed(artist_name, code)
+        for code in changed:
+            self._mark_changed(artist_name, code)
+        self._conn.execute(
+            'UPDATE artists SET title_mtime_ns = ?, title_size = ? WHERE name = ?',
+            (signature[0], signature[1], artist_name)
+        )
+        return True
+
+    def _delete_video(self, artist_name: str, code: str):
+        self._mark_changed(artist_name, code)
+        self._conn.execute('DELETE FROM videos WHERE artist = ? AND code = ?', (artist_name, code))
+        self._conn.execute('DELETE FROM media WHERE artist = ? AND code = ?', (artist_name, code))
+        self._conn.execute('DELETE FROM probes WHERE artist = ? AND code = ?', (artist_name, code))
+
+    def _delete_artist(self, artist_name: str):
+        self._mark_changed(artist_name)
+        for table in ('videos', 'media', 'probes', 'titles'):
+            self._conn.execute(f'DELETE FROM {table} WHERE artist = ?', (artist_name,))
+        self._conn.execute('DELETE FROM artists WHERE name = ?', (artist_name,))
+        self._artist_checked.pop(artist_name, None)
+
+    def _clear(self):
+        with self._conn:
+            for table in ('artists', 'videos', 'media', 'probes', 'titles'):
+                self._conn.execute(f'DELETE FROM {table}')
+        self._artist_checked.clear()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def has_artist(self, artist_name: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT 1 FROM artists WHERE name = ?', (artist_name,)
+            ).fetchone() is not None
+
+    def artist_names(self) -> List[str]:
+        with self._lock:
+            return [r['name'] for r in self._conn.execute('SELECT name FROM artists ORDER BY name')]
+
+    def unlisted_artists(self) -> List[str]:
+        """Artists whose folder has never been listed (no videos known yet)"""
+        with self._lock:
+            return [r['name'] for r in self._conn.execute('SELECT name FROM artists WHERE mtime_ns IS NULL ORDER BY name')]
+
+    def list_artists(self) -> List[ArtistRecord]:
+        with self._lock:
+            return [
+                ArtistRecord(intern_name(r['name']), bool(r['has_icon']), r['icon_version'])
+                for r in self._conn.execute('SELECT name, has_icon, icon_version FROM artists ORDER BY name')
+            ]
+
+    def video_codes(self, artist_name: str) -> List[str]:
+        """Codes of folders that contain at least one media file"""
+        with self._lock:
+            return [
+                r['code'] for r in self._conn.execute(
+                    'SELECT DISTINCT code FROM media WHERE artist = ? ORDER BY code', (artist_name,)
+                )
+            ]
+
+    def missing_titles(self, artist_name: str) -> Tuple[List[str], int, int]:
+        """
+        Returns (codes with media but no title.json entry, number of such codes with media,
+        number of title.json entries) - a diff of the indexed folders against the indexed titles
+        """
+        with self._lock:
+            missing = [
+                r['code'] for r in self._conn.execute(
+                    'SELECT DISTINCT m.code FROM media m '
+                    'LEFT JOIN titles t ON t.artist = m.artist AND t.code = m.code '
+                    'WHERE m.artist = ? AND t.code IS NULL ORDER BY m.code', (artist_name,)
+                )
+            ]
+            total = self._conn.execute(
+                'SELECT COUNT(DISTINCT code) FROM media WHERE artist = ?', (artist_name,)
+            ).fetchone()[0]
+            titled = self._conn.execute(
+                'SELECT COUNT(*) FROM titles WHERE artist = ?', (artist_name,)
+            ).fetchone()[0]
+            return missing, total, titled
+
+    def _metadata_from_row(self, row: sqlite3.Row) -> TitleRecord:
+        return TitleRecord(
+            row['title'], row['year'], row['month'], row['day'],
+            json.loads(row['date']) if row['date'] is not None else None
+        )
+
+    def _video_from_row(self, code: str, row: sqlite3.Row, media: List[MediaRecord],
+                        metadata: Optional[TitleRecord]) -> VideoRecord:
+        return VideoRecord(
+            intern_name(code), tuple(media), bool(row['has_poster']), bool(row['has_fanart']), row['fallback_image'],
+            row['poster_version'], row['fanart_version'], row['fallback_version'], metadata
+        )
+
+    def _media_from_row(self, row: sqlite3.Row) -> MediaRecord:
+        """Media row LEFT JOINed with its probe (probe columns are NULL when missing or stale)"""
+        if row['probed'] and row['probe_error'] is None:
+            probe = {
+                'duration': row['duration'],
+                'bitrate': row['bitrate'],
+                'video_codec': row['video_codec'],
+                'audio_codec': row['audio_codec'],
+                'width': row['width'],
+                'height': row['height']
+            }
+        else:
+            probe = None
+        # 'video'/'audio' - one shared string each
+        return MediaRecord(row['filename'], intern_name(row['type']), row['size'], row['mtime_ns'], probe)
+
+    def list_videos(self, artist_name: str) -> List[VideoRecord]:
+        """
+        Returns one VideoRecord per code folder with media
+        'metadata' is the normalized title.json entry or None when the code has no title
+        """
+        with self._lock:
+            media: Dict[str, List[MediaRecord]] = {}
+            for r in self._conn.execute(
+                f'SELECT m.code, {MEDIA_COLUMNS} FROM media m {PROBE_JOIN} WHERE m.artist = ? ORDER BY m.code, m.filename',
+                (artist_name,)
+            ):
+                media.setdefault(r['code'], []).append(self._media_from_row(r))
+
+            titles = {
+                r['code']: self._metadata_from_row(r)
+                for r in self._conn.execute(
+                    'SELECT code, title, year, month, day, date FROM titles WHERE artist = ?', (artist_name,)
+                )
+            }
+
+            videos = []
+            for r in self._conn.execute(
+                'SELECT code, has_poster, has_fanart, fallback_image, poster_version, fanart_version, fallback_version '
+                'FROM videos WHERE artist = ?',
+                (artist_name,)
+            ):
+                if r['code'] not in media:
+                    continue
+                videos.append(self._video_from_row(r['code'], r, media[r['code']], titles.get(r['code'])))
+            return videos
+
+    def get_video(self, artist_name: str, code: str) -> Optional[VideoRecord]:
+        """Same entry as list_videos() for a single code, or None if it has no media"""
+        with self._lock:
+            r = self._conn.execute(
+                'SELECT has_poster, has_fanart, fallback_image, poster_version, fanart_version, fallback_version '
+                'FROM videos WHERE artist = ? AND code = ?',
+                (artist_name, code)
+            ).fetchone()
+            if r is None:
+                return None
+
+            media = [
+                self._media_from_row(m)
+                for m in self._conn.execute(
+                    f'SELECT {MEDIA_COLUMNS} FROM media m {PROBE_JOIN} WHERE m.artist = ? AND m.code = ? ORDER BY m.filename',
+                    (artist_name, code)
+                )
+            ]
+            if not media:
+                return None
+
+            title = self._conn.execute(
+                'SELECT title, year, month, day, date FROM titles WHERE artist = ? AND code = ?',
+                (artist_name, code)
+            ).fetchone()
+
+            return self._video_from_row(code, r, media, self._metadata_from_row(title) if title else None)
+
+    # ------------------------------------------------------------------
+    # Media probes
+    # ------------------------------------------------------------------
+
+    def unprobed_media(self) -> List[Dict[str, any]]:
+        """Media files without a probe of their current version: {'artist', 'code', 'filename', 'size', 'mtime_ns'}"""
+        with self._lock:
+            return [
+                {'artist': r['artist'], 'code': r['code'], 'filename': r['filename'],
+                 'size': r['size'], 'mtime_ns': r['mtime_ns']}
+                for r in self._conn.execute(
+                    f'SELECT m.artist, m.code, m.filename, m.size, m.mtime_ns FROM media m {PROBE_JOIN} '
+                    'WHERE p.artist IS NULL ORDER BY m.artist, m.code, m.filename'
+                )
+            ]
+
+    def store_probe(self, artist_name: str, code: str, filename: str, size: int, mtime_ns: int,
+                    info: Optional[Dict[str, any]], error: Optional[str] = None, notify: bool = True):
+        """
+        Record what probing a media file version found
+        info: {'duration', 'bitrate', 'video_codec', 'audio_codec', 'width', 'height', 'keyframes'}
+              - None with error set when the file couldn't be parsed (not retried until it changes)
+        notify: False leaves notifying listeners to notify_changed(), so many probes of one
+                artist cost one notification
+        """
+        info = info or {}
+        keyframes = info.get('keyframes')
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO probes (artist, code, filename, size, mtime_ns, duration, bitrate, '
+                'video_codec, audio_codec, width, height, keyframes, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (artist_name, code, filename, size, mtime_ns, info.get('duration'), info.get('bitrate'),
+                 info.get('video_codec'), info.get('audio_codec'), info.get('width'), info.get('height'),
+                 json.dumps(keyframes) if keyframes is not None else None, error)
+            )
+            self._mark_changed(artist_name, code)
+        if notify:
+            self._notify(artist_name)
+
+    def notify_changed(self, artist_name: str):
+        """Notify listeners of an artist's changes stored with notify=False (no-op if there are none)"""
+        with self._lock:
+            if artist_name not in self._changed_codes:
+                return
+        self._notify(artist_name)
+
+    def media_keyframes(self, artist_name: str, code: str, filename: str,
+                        size: Optional[int] = None, mtime_ns: Optional[int] = None) -> Optional[Tuple[float, List[float]]]:
+        """
+        (duration, keyframe timestamps) from the stored probe, None if unknown
+        size/mtime_ns: only accept a probe of that file version
+        """
+        with self._lock:
+            r = self._conn.execute(
+                'SELECT size, mtime_ns, duration, keyframes FROM probes '
+                'WHERE artist = ? AND code = ? AND filename = ? AND error IS NULL',
+                (artist_name, code, filename)
+            ).fetchone()
+        if r is None or r['keyframes'] is None or r['duration'] is None:
+            return None
+        if (size is not None and r['size'] != size) or (mtime_ns is not None and r['mtime_ns'] != mtime_ns):
+            return None
+        return r['duration'], json.loads(r['keyframes'])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
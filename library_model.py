@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Library Model - In-memory view of the library catalog
+Keeps artist and video listings hot in memory, each sort order kept as a sorted
+list with its keys. When the catalog reports a few changed videos (a scraped date,
+a new folder), only those entries are moved with bisect; larger changes drop the
+artist and it is re-sorted on the next request. When a LibraryWatcher is running,
+listings are served from memory without touching the disk.
+"""
+import base64
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from library_catalog import LibraryCatalog
+from library_records import ArtistRecord, VideoRecord
+
+
+def _date_key(entry: VideoRecord) -> tuple:
+    # Missing date parts count as 0, so undated videos sort as oldest
+    metadata = entry.metadata
+    if metadata is None:
+        return (0, 0, 0, entry.code)
+    return (metadata.year or 0, metadata.month or 0, metadata.day or 0, entry.code)
+
+
+def _title_key(entry: VideoRecord) -> tuple:
+    metadata = entry.metadata
+    title = metadata.title if metadata is not None else None
+    return ((title or entry.code).lower(), entry.code)
+
+
+# sort name -> (key function, default direction is descending)
+SORT_KEYS: Dict[str, Tuple[Callable[[VideoRecord], tuple], bool]] = {
+    'date': (_date_key, True),
+    'code': (lambda entry: (entry.code,), False),
+    'title': (_title_key, False),
+}
+
+
+# Changes to more videos than this (or to over a quarter of an artist) re-sort instead of patching
+MAX_PATCH_CODES = 256
+
+
+def encode_cursor(key: tuple) -> str:
+    """Opaque pagination cursor holding the sort key of the last returned video"""
+    return base64.urlsafe_b64encode(json.dumps(list(key), ensure_ascii=False).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Inverse of encode_cursor - raises ValueError on malformed cursors"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f'Invalid cursor: {e}')
+    if not isinstance(key, list):
+        raise ValueError('Invalid cursor')
+    return tuple(key)
+
+
+class LibraryModel:
+    def __init__(self, catalog: LibraryCatalog):
+        self.catalog = catalog
+        # Set by LibraryWatcher - the catalog is kept fresh in the background,
+        # so request handlers skip their own mtime checks
+        self.watching = False
+
+        self._lock = threading.Lock()
+        self._artists: Optional[List[ArtistRecord]] = None
+        self._videos: Dict[str, List[VideoRecord]] = {}
+        # artist -> code -> entry (the same dicts as in _videos)
+        self._by_code: Dict[str, Dict[str, VideoRecord]] = {}
+        # (artist, sort) -> (entries sorted ascending, their sort keys)
+        self._sorted: Dict[Tuple[str, str], Tuple[List[VideoRecord], List[tuple]]] = {}
+        # Bumped on every invalidation so a load racing with it isn't cached
+        self._generation = 0
+
+        catalog.add_video_listener(self.videos_changed)
+
+    def invalidate(self, artist_name: Optional[str] = None):
+        """
+        Drop cached listings
+        artist_name: only that artist's videos (and the artist list); None drops everything
+        """
+        with self._lock:
+            self._generation += 1
+            self._artists = None
+            if artist_name is None:
+                self._videos.clear()
+                self._by_code.clear()
+                self._sorted.clear()
+            else:
+                self._drop_artist(artist_name)
+
+    def _drop_artist(self, artist_name: str):
+        self._videos.pop(artist_name, None)
+        self._by_code.pop(artist_name, None)
+        for sort in SORT_KEYS:
+            self._sorted.pop((artist_name, sort), None)
+
+    def videos_changed(self, artist_name: Optional[str], codes: Optional[Set[str]]):
+        """
+        Catalog video listener - move only the changed entries in the cached orders
+        Lists handed out earlier are never modified (new lists replace them)
+        """
+        if artist_name is None or codes is None:
+            self.invalidate(artist_name)
+            return
+
+        with self._lock:
+            self._generation += 1
+            self._artists = None
+            videos = self._videos.get(artist_name)
+            if videos is None or not codes:
+                return
+            if len(codes) > MAX_PATCH_CODES or len(codes) * 4 > len(videos):
+                self._drop_artist(artist_name)
+                return
+
+            # Read under the model lock so concurrent patches apply in order
+            fresh = {code: self.catalog.get_video(artist_name, code) for code in codes}
+            by_code = dict(self._by_code[artist_name])
+            sorted_orders = {}
+            for sort, (key_func, _) in SORT_KEYS.items():
+                cached = self._sorted.get((artist_name, sort))
+                if cached is None:
+                    continue
+                entries, keys = list(cached[0]), list(cached[1])
+                for code in codes:
+                    old = by_code.get(code)
+                    if old is not None:
+                        old_key = key_func(old)
+                        i = bisect_left(keys, old_key)
+                        if i == len(keys) or keys[i] != old_key:
+                            # Out of step with the catalog - rebuild on the next request
+                            self._drop_artist(artist_name)
+                            return
+                        del entries[i]
+                        del keys[i]
+                    new = fresh[code]
+                    if new is not None:
+                        new_key = key_func(new)
+                        i = bisect_left(keys, new_key)
+                        entries.insert(i, new)
+                        keys.insert(i, new_key)
+                sorted_orders[sort] = (entries, keys)
+
+            for code, entry in fresh.items():
+                if entry is None:
+                    by_code.pop(code, None)
+                else:
+                    by_code[code] = entry
+            patched = [by_code[v.code] for v in videos if v.code in by_code]
+            patched.extend(entry for code, entry in fresh.items()
+                           if entry is not None and code not in self._by_code[artist_name])
+
+            self._videos[artist_name] = patched
+            self._by_code[artist_name] = by_code
+            for sort, order in sorted_orders.items():
+                self._sorted[(artist_name, sort)] = order
+
+    def artists(self) -> List[ArtistRecord]:
+        """Returns the artists (name, has_icon, icon_version)"""
+        self.catalog.sync_shared()
+        if not self.watching:
+            self.catalog.refresh_artists()
+
+        with self._lock:
+            if self._artists is not None:
+                return self._artists
+            generation = self._generation
+
+        artists = self.catalog.list_artists()
+        with self._lock:
+            if generation == self._generation:
+                self._artists = artists
+        return artists
+
+    def videos(self, artist_name: str, refresh: bool = True) -> Optional[List[VideoRecord]]:
+        """
+        Returns the catalog entries of an artist's videos, or None if the artist doesn't exist
+        refresh: False when the caller just called refresh_artist() itself
+        """
+        if refresh:
+            self.refresh_artist(artist_name)
+
+        with self._lock:
+            if artist_name in self._videos:
+                return self._videos[artist_name]
+            generation = self._generation
+
+        if not self.catalog.has_artist(artist_name):
+            return None
+
+        videos = self.catalog.list_videos(artist_name)
+        with self._lock:
+            if generation == self._generation:
+                self._videos[artist_name] = videos
+                self._by_code[artist_name] = {entry.code: entry for entry in videos}
+        return videos
+
+    def refresh_artist(self, artist_name: str):
+        """Bring one artist up to date with the disk (only changes of other processes while the watcher keeps it fresh)"""
+        self.catalog.sync_shared()
+        if not self.watching:
+            self.catalog.refresh_artist(artist_name)
+
+    def sorted_videos(self, artist_name: str, sort: str = 'date',
+                      refresh: bool = True) -> Optional[Tuple[List[VideoRecord], List[tuple]]]:
+        """
+        Returns (entries sorted ascending by sort, their keys), or None if the artist doesn't exist
+        The order is computed once per catalog change and reused for every page
+        """
+        videos = self.videos(artist_name, refresh)
+        if videos is None:
+            return None
+
+        with self._lock:
+            cached = self._sorted.get((artist_name, sort))
+            if cached is not None and self._videos.get(artist_name) is videos:
+                return cached
+            generation = self._generation
+
+        key_func = SORT_KEYS[sort][0]
+        ordered = sorted(videos, key=key_func)
+        result = (ordered, [key_func(entry) for entry in ordered])
+
+        with self._lock:
+            if generation == self._generation:
+                self._sorted[(artist_name, sort)] = result
+        return result
+
+    def page(self, artist_name: str, sort: str = 'date', descending: Optional[bool] = None,
+             limit: Optional[int] = None, cursor: Optional[tuple] = None, refresh: bool = True
+             ) -> Optional[Tuple[List[VideoRecord], Optional[tuple], int]]:
+        """
+        Slice one page out of the pre-sorted order
+        cursor: sort key of the last video of the previous page (see encode_cursor)
+        refresh: see videos()
+        Returns (entries, key for the next cursor or None on the last page, total count),
+        or None if the artist doesn't exist
+        """
+        result = self.sorted_videos(artist_name, sort, refresh)
+        if result is None:
+            return None
+        entries, keys = result
+        if descending is None:
+            descending = SORT_KEYS[sort][1]
+
+        try:
+            if descending:
+                end = bisect_left(keys, cursor) if cursor is not None else len(entries)
+                start = max(0, end - limit) if limit is not None else 0
+                page = entries[start:end][::-1]
+                has_more = start > 0
+            else:
+                start = bisect_right(keys, cursor) if cursor is not None else 0
+                end = start + limit if limit is not None else len(entries)
+                page = entries[start:end]
+                has_more = end < len(entries)
+        except TypeError:
+            # Cursor key doesn't match the shape of this sort's keys
+            raise ValueError('Cursor does not match sort order')
+
+        next_key = SORT_KEYS[sort][0](page[-1]) if page and has_more else None
+        return page, next_key, len(entries)
+
+    def video(self, artist_name: str, code: str) -> Optional[VideoRecord]:
+        """
+        Returns the catalog entry of a single video, or None if it doesn't exist
+        Only that code folder is checked on disk - the rest of the artist isn't listed
+        """
+        self.catalog.sync_shared()
+        if self.watching:
+            with self._lock:
+                by_code = self._by_code.get(artist_name)
+            if by_code is not None:
+                return by_code.get(code)
+        else:
+            self.catalog.refresh_video(artist_name, code)
+
+        return self.catalog.get_video(artist_name, code)
+
+    def list_new_artists(self):
+        """
+        Sync the artist list and list the folders of artists never seen before
+        Artists already in the catalog are left to refresh_artist/the watcher, so this stays
+        one query once the library is known
+        """
+        self.artists()
+        if self.watching:
+            return
+        for artist_name in self.catalog.unlisted_artists():
+            self.catalog.refresh_artist(artist_name)
+
+    def preload(self):
+        """Load every artist into memory (used when the watcher starts)"""
+        for artist in self.artists():
+            self.videos(artist.name)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Library Records - Compact record types for the in-memory library and their JSON encoder
+Catalog entries are slotted dataclasses instead of nested dicts (no per-object
+__dict__), artist names and codes are interned, and the URL prefixes of an artist
+are built once and shared by all its videos. VideoEncoder writes the API's video
+JSON straight from the records, without building the intermediate dicts.
+"""
+import json
+import sys
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_encode_str = json.encoder.encode_basestring_ascii
+_encode_compact = json.JSONEncoder(separators=(',', ':')).encode
+
+
+@dataclass(slots=True, frozen=True)
+class ArtistRecord:
+    name: str
+    has_icon: bool
+    icon_version: Optional[str]
+
+
+@dataclass(slots=True, frozen=True)
+class TitleRecord:
+    """Normalized title.json entry"""
+    title: Optional[str]
+    year: Optional[int]
+    month: Optional[int]
+    day: Optional[int]
+    date: Optional[Dict[str, any]]
+
+
+@dataclass(slots=True, frozen=True)
+class MediaRecord:
+    filename: str
+    type: str
+    size: Optional[int]
+    mtime_ns: Optional[int]
+    # duration, bitrate, video_codec, audio_codec, width, height - None until probed
+    probe: Optional[Dict[str, any]]
+
+
+@dataclass(slots=True, frozen=True)
+class VideoRecord:
+    """One code folder with media; *_version are file_version() tokens of the artwork"""
+    code: str
+    media: Tuple[MediaRecord, ...]
+    has_poster: bool
+    has_fanart: bool
+    fallback_image: Optional[str]
+    poster_version: Optional[str]
+    fanart_version: Optional[str]
+    fallback_version: Optional[str]
+    metadata: Optional[TitleRecord]
+
+
+def intern_name(name: Optional[str]) -> Optional[str]:
+    """One shared string per artist name/code, however many records refer to it"""
+    return sys.intern(name) if name is not None else None
+
+
+def versioned_url(url: str, version: Optional[str]) -> str:
+    """Append the file version token (?v=) that lets browsers cache artwork as immutable"""
+    return f'{url}?v={version}' if version else url
+
+
+class ArtistUrls:
+    """URL prefixes of one artist, built once"""
+
+    __slots__ = ('stream', 'video')
+
+    def __init__(self, artist_name: str):
+        self.stream = f'/api/stream/{artist_name}/'
+        self.video = f'/api/video/{artist_name}/'
+
+
+def _encode_value(value: any) -> str:
+    if value is None:
+        return 'null'
+    if isinstance(value, str):
+        return _encode_str(value)
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, int):
+        return int.__repr__(value)
+    return _encode_compact(value)
+
+
+class VideoEncoder:
+    """
+    Video dicts/JSON of the API from VideoRecords
+    hls_url: (artist_name, code, media) -> HLS playlist URL or None
+    """
+
+    def __init__(self, hls_url: Callable[[str, str, MediaRecord], Optional[str]]):
+        self.hls_url = hls_url
+        self._urls: Dict[str, ArtistUrls] = {}
+
+    def urls(self, artist_name: str) -> ArtistUrls:
+        urls = self._urls.get(artist_name)
+        if urls is None:
+            # Artists are few - racing threads at worst build the same prefixes twice
+            urls = self._urls[artist_name] = ArtistUrls(artist_name)
+        return urls
+
+    def _artwork(self, urls: ArtistUrls, record: VideoRecord) -> Tuple[Optional[str], Optional[str]]:
+        code = record.code
+        fanart = versioned_url(f'{urls.video}{code}/fanart', record.fanart_version) if record.has_fanart else None
+        if record.has_poster:
+            poster = versioned_url(f'{urls.video}{code}/poster', record.poster_version)
+        elif record.fallback_image:
+            # Use fallback image if poster.jpg not found
+            poster = versioned_url(f'{urls.video}{code}/image/{record.fallback_image}', record.fallback_version)
+        else:
+            poster = None
+        return fanart, poster
+
+    def to_dict(self, artist_name: str, record: VideoRecord) -> Dict[str, any]:
+        """The video dict returned by the API"""
+        urls = self.urls(artist_name)
+        code = record.code
+        fanart, poster = self._artwork(urls, record)
+        metadata = record.metadata
+        return {
+            'code': code,
+            # Fallback to code if there is no title.json entry
+            'title': metadata.title if metadata is not None else code,
+            'year': metadata.year if metadata is not None else None,
+            'month': metadata.month if metadata is not None else None,
+            'day': metadata.day if metadata is not None else None,
+            'date': metadata.date if metadata is not None else None,
+            'media': [
+                {
+                    'filename': media.filename,
+                    'path': f'{urls.stream}{code}/{media.filename}',
+                    'type': media.type,
+                    'hls': self.hls_url(artist_name, code, media),
+                    'probe': media.probe
+                }
+                for media in record.media
+            ],
+            'fanart': fanart,
+            'poster': poster
+        }
+
+    def encode(self, artist_name: str, record: VideoRecord) -> str:
+        """to_dict() as JSON, written directly from the record"""
+        urls = self.urls(artist_name)
+        code = record.code
+        fanart, poster = self._artwork(urls, record)
+        metadata = record.metadata
+        media = ','.join([
+            '{"filename":' + _encode_str(m.filename) +
+            ',"path":' + _encode_str(f'{urls.stream}{code}/{m.filename}') +
+            ',"type":' + _encode_str(m.type) +
+            ',"hls":' + _encode_value(self.hls_url(artist_name, code, m)) +
+            ',"probe":' + _encode_value(m.probe) + '}'
+            for m in record.media
+        ])
+        if metadata is not None:
+            title = (',"title":' + _encode_value(metadata.title) +
+                     ',"year":' + _encode_value(metadata.year) +
+                     ',"month":' + _encode_value(metadata.month) +
+                     ',"day":' + _encode_value(metadata.day) +
+                     ',"date":' + _encode_value(metadata.date))
+        else:
+            title = ',"title":' + _encode_str(code) + ',"year":null,"month":null,"day":null,"date":null'
+        return ('{"code":' + _encode_str(code) + title +
+                ',"media":[' + media + ']' +
+                ',"fanart":' + _encode_value(fanart) +
+                ',"poster":' + _encode_value(poster) + '}')
+
+    def encode_list(self, artist_name: str, records: Iterable[VideoRecord]) -> str:
+        """JSON array of videos"""
+        return '[' + ','.join([self.encode(artist_name, record) for record in records]) + ']'
+
+
+def encode_json(value: any) -> str:
+    """Compact JSON of plain values (fragments around encoded videos)"""
+    return _encode_value(value)
+
+
+def encode_object(pairs: List[Tuple[str, str]]) -> str:
+    """JSON object from (key, already encoded value) pairs"""
+    return '{' + ','.join(_encode_str(key) + ':' + value for key, value in pairs) + '}'
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Library Scanner - Directory listing shared by the catalog, the title updater and the image routes
+os.scandir returns the entry type with the listing, so telling files from folders
+costs no stat per entry (only media and artwork are stat'ed, for size/mtime).
+On network mounts every folder listing is a round trip, so code folders are listed
+on a thread pool and results stream back as each folder finishes.
+"""
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+MEDIA_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wav', '.mp3', '.flac', '.m4a', '.webm')
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+
+
+def file_version(st: os.stat_result) -> str:
+    """Short token that changes whenever a file's mtime or size changes (used in artwork URLs)"""
+    return f'{st.st_mtime_ns:x}{st.st_size:x}'
+
+
+def iter_files(folder_path: str) -> Iterator[os.DirEntry]:
+    """Regular files of a folder, in directory order - raises OSError if it can't be listed"""
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                yield entry
+
+
+def has_media(folder_path: str) -> bool:
+    """True if the folder holds at least one media file"""
+    return any(os.path.splitext(entry.name)[1].lower() in MEDIA_EXTENSIONS for entry in iter_files(folder_path))
+
+
+def scan_code_folder(folder_path: str) -> Dict[str, any]:
+    """
+    Classify the files of one video code folder
+    Returns dict with 'media' (list of {'filename', 'type', 'size', 'mtime_ns'}), 'has_poster', 'has_fanart'
+    and 'fallback_image' (first other image, used when poster.jpg is missing),
+    plus 'poster_version', 'fanart_version' and 'fallback_version' (see file_version)
+    """
+    media = []
+    has_poster = False
+    has_fanart = False
+    fallback_image = None
+    versions = {'poster_version': None, 'fanart_version': None, 'fallback_version': None}
+
+    for entry in iter_files(folder_path):
+        name_lower = entry.name.lower()
+        ext = os.path.splitext(name_lower)[1]
+        if ext in MEDIA_EXTENSIONS:
+            st = entry.stat()
+            media.append({
+                'filename': entry.name,
+                'type': 'video' if ext in VIDEO_EXTENSIONS else 'audio',
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns
+            })
+        elif name_lower == 'fanart.jpg':
+            has_fanart = True
+            versions['fanart_version'] = file_version(entry.stat())
+        elif name_lower == 'poster.jpg':
+            has_poster = True
+            versions['poster_version'] = file_version(entry.stat())
+        elif ext in IMAGE_EXTENSIONS and not fallback_image:
+            fallback_image = entry.name
+            versions['fallback_version'] = file_version(entry.stat())
+
+    media.sort(key=lambda m: m['filename'])
+    return {
+        'media': media,
+        'has_poster': has_poster,
+        'has_fanart': has_fanart,
+        'fallback_image': fallback_image,
+        **versions
+    }
+
+
+def folder_mtime_ns(folder_path: str) -> int:
+    return os.stat(folder_path).st_mtime_ns
+
+
+class FolderScanner:
+    """
+    Runs a per-folder function (listing, stat) over many folders on a thread pool
+
+    workers: folders listed at the same time (1 runs them in the calling thread)
+    map() yields (key, result, error) as folders finish - error is the OSError raised
+    for that folder (result None) - and keeps at most 2 * workers folders in flight,
+    so a huge library is never queued all at once.
+    """
+
+    def __init__(self, workers: int = 8):
+        self.workers = workers
+        self.folders_scanned = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def configure(self, workers: Optional[int] = None):
+        with self._lock:
+            if workers is not None and workers != self.workers:
+                self.workers = workers
+                if self._executor is not None:
+                    # Running scans keep the old pool until they finish
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+
+    def _pool(self) -> Optional[ThreadPoolExecutor]:
+        with self._lock:
+            if self.workers <= 1:
+                return None
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='library-scan')
+            return self._executor
+
+    def _count(self, error: Optional[OSError]):
+        with self._lock:
+            self.folders_scanned += 1
+            if error is not None:
+                self.errors += 1
+
+    def map(self, func: Callable[[str], any], folders: Iterable[Tuple[any, str]]) -> Iterator[Tuple[any, any, Optional[OSError]]]:
+        """func(path) for every (key, path), in completion order"""
+        pool = self._pool()
+        if pool is None:
+            for key, path in folders:
+                try:
+                    result, error = func(path), None
+                except OSError as e:
+                    result, error = None, e
+                self._count(error)
+                yield key, result, error
+            return
+
+        limit = 2 * self.workers
+        pending = {}
+        folders = iter(folders)
+        try:
+            while True:
+                for key, path in folders:
+                    pending[pool.submit(func, path)] = key
+                    if len(pending) >= limit:
+                        break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    try:
+                        result, error = future.result(), None
+                    except OSError as e:
+                        result, error = None, e
+                    self._count(error)
+                    yield key, result, error
+        finally:
+            # Consumer stopped early - drop what hasn't started
+            for future in pending:
+                future.cancel()
+
+    def scan_code_folders(self, folders: Iterable[Tuple[any, str]]) -> Iterator[Tuple[any, Optional[Dict[str, any]], Optional[OSError]]]:
+        """scan_code_folder() of every (key, path)"""
+        return self.map(scan_code_folder, folders)
+
+    def folder_mtimes(self, folders: Iterable[Tuple[any, str]]) -> Iterator[Tuple[any, Optional[int], Optional[OSError]]]:
+        """mtime_ns of every (key, path) - missing folders come back with an error"""
+        return self.map(folder_mtime_ns, folders)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'folders_scanned': self.folders_scanned,
+                'errors': self.errors
+            }
+
+
+# Process-wide scanner shared by the catalog, TitleUpdater and app.py
+folder_scanner = FolderScanner()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Library Search - Full-text index over every artist's video titles and codes
+An in-memory SQLite FTS5 table fed from the catalog; only the artists the catalog
+reports as changed are re-indexed. Japanese/Chinese text has no spaces, so CJK runs
+are indexed as single characters plus overlapping bigrams, which lets any substring
+of a title match without a dictionary. Codes are indexed normalized through
+extract_code_pattern, so SSIS-001, ssis001 and "SSIS 1" find the same video.
+"""
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+from jav_scraper import JavMetadataScraper
+from library_catalog import LibraryCatalog
+from library_records import VideoRecord
+
+# Hiragana, katakana, CJK ideographs (+ extension A and compatibility) and hangul
+CJK_CHARS = '぀-ヿ㐀-䶿一-鿿豈-﫿가-힯'
+_CHUNK_RE = re.compile(rf'([{CJK_CHARS}]+)|([^{CJK_CHARS}]+)')
+_SEPARATOR_RE = re.compile(r'[\W_]+')
+
+# bm25 weights of the title, code and artist columns
+RANK_WEIGHTS = (1.0, 4.0, 2.0)
+
+# extract_code_pattern only uses normalize_code - no session is created
+_code_parser = JavMetadataScraper()
+
+
+def _normalize_word(word: str) -> str:
+    # "001" and "1" are the same number in codes and titles alike
+    return (word.lstrip('0') or '0') if word.isdigit() else word
+
+
+def _chunks(text: str):
+    """(cjk run, other word) pairs of NFKC-normalized, lowercased text"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    for part in _SEPARATOR_RE.split(text):
+        if part:
+            yield from _CHUNK_RE.findall(part)
+
+
+def index_tokens(text: str) -> List[str]:
+    """Tokens stored for text: words, and CJK runs as characters plus bigrams"""
+    tokens = []
+    for cjk, word in _chunks(text):
+        if cjk:
+            tokens.extend(cjk)
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            tokens.append(_normalize_word(word))
+    return tokens
+
+
+def query_tokens(text: str) -> List[str]:
+    """Tokens a query must match: CJK runs as bigrams (a lone character as itself)"""
+    tokens = []
+    for cjk, word in _chunks(text):
+        if cjk:
+            tokens.extend([cjk] if len(cjk) == 1 else [cjk[i:i + 2] for i in range(len(cjk) - 1)])
+        else:
+            tokens.append(_normalize_word(word))
+    return tokens
+
+
+def code_key(code: str) -> Optional[str]:
+    """Normalized code ('SSIS-001' -> 'ssis1'), None if it isn't a series-number code"""
+    pattern = _code_parser.extract_code_pattern(code)
+    if pattern is None:
+        return None
+    return f"{pattern['series']}{_normalize_word(pattern['number'])}{pattern['suffix']}".lower()
+
+
+def _code_tokens(code: str) -> List[str]:
+    tokens = index_tokens(code)
+    key = code_key(code)
+    if key is not None:
+        tokens.append(key)
+    return tokens
+
+
+def _quote(token: str) -> str:
+    return '"' + token.replace('"', '""') + '"'
+
+
+class LibrarySearch:
+    """
+    Ranked search over (artist, code) documents built from catalog entries
+    Register on_catalog_changed as a catalog listener; stale artists are re-indexed
+    on the next search.
+    """
+
+    def __init__(self, catalog: LibraryCatalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self._conn.execute(
+            'CREATE VIRTUAL TABLE docs USING fts5('
+            'title, code, artist, artist_name UNINDEXED, code_value UNINDEXED, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        # (artist, code) -> catalog entry of every indexed video
+        self._entries: Dict[Tuple[str, str], VideoRecord] = {}
+        self._indexed: Set[str] = set()
+        self._dirty: Set[str] = set()
+        self._all_dirty = True
+
+    def on_catalog_changed(self, artist_name: Optional[str]):
+        with self._lock:
+            if artist_name is None:
+                self._all_dirty = True
+            else:
+                self._dirty.add(artist_name)
+
+    def _sync(self):
+        """Bring stale artists up to date (caller holds the lock)"""
+        if self._all_dirty:
+            current = set(self.catalog.artist_names())
+            for gone in self._indexed - current:
+                self._remove_artist(gone)
+            self._dirty |= current
+            self._all_dirty = False
+        if not self._dirty:
+            return
+
+        with self._conn:
+            for artist_name in self._dirty:
+                self._remove_artist(artist_name)
+                entries = self.catalog.list_videos(artist_name)
+                if not entries and not self.catalog.has_artist(artist_name):
+                    continue
+                artist_tokens = ' '.join(index_tokens(artist_name))
+                rows = []
+                for entry in entries:
+                    title = entry.metadata.title if entry.metadata is not None else None
+                    rows.append((
+                        ' '.join(index_tokens(title or '')),
+                        ' '.join(_code_tokens(entry.code)),
+                        artist_tokens,
+                        artist_name,
+                        entry.code
+                    ))
+                    self._entries[(artist_name, entry.code)] = entry
+                self._conn.executemany(
+                    'INSERT INTO docs (title, code, artist, artist_name, code_value) VALUES (?, ?, ?, ?, ?)', rows
+                )
+                self._indexed.add(artist_name)
+        self._dirty.clear()
+
+    def _remove_artist(self, artist_name: str):
+        self._conn.execute('DELETE FROM docs WHERE artist_name = ?', (artist_name,))
+        for key in [k for k in self._entries if k[0] == artist_name]:
+            del self._entries[key]
+        self._indexed.discard(artist_name)
+
+    def _match(self, expression: str, limit: int, offset: int) -> Tuple[List[Tuple[str, str]], int]:
+        total = self._conn.execute('SELECT COUNT(*) FROM docs WHERE docs MATCH ?', (expression,)).fetchone()[0]
+        rows = self._conn.execute(
+            'SELECT artist_name, code_value FROM docs WHERE docs MATCH ? '
+            'ORDER BY bm25(docs, ?, ?, ?), artist_name, code_value LIMIT ? OFFSET ?',
+            (expression, *RANK_WEIGHTS, limit, offset)
+        ).fetchall()
+        return rows, total
+
+    def search(self, query: str, limit: int = 50, offset: int = 0) -> Tuple[List[Tuple[str, VideoRecord]], int]:
+        """
+        Returns ([(artist, catalog entry), ...] best match first, total number of matches)
+        A query that is a code matches that code exactly; otherwise every token must match
+        (the last word as a prefix, so results follow typing)
+        """
+        tokens = query_tokens(query)
+        if not tokens:
+            return [], 0
+
+        with self._lock:
+            self._sync()
+            rows, total = [], 0
+            key = code_key(query)
+            if key is not None:
+                rows, total = self._match(f'code : {_quote(key)}', limit, offset)
+            if total == 0:
+                terms = [_quote(t) for t in tokens]
+                if tokens[-1].isascii():
+                    terms[-1] += '*'
+                rows, total = self._match(' '.join(terms), limit, offset)
+            return [(artist, self._entries[(artist, code)]) for artist, code in rows], total
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'documents': len(self._entries),
+                'artists': len(self._indexed),
+                'stale_artists': len(self._dirty) if not self._all_dirty else None
+            }
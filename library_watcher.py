@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Library Watcher - Keeps the library catalog and in-memory model up to date
+Uses inotify (through watchdog) where available, and falls back to polling the
+catalog's folder mtimes on network mounts (SMB/NFS) that don't deliver events.
+Only the artist whose folders or title.json changed is refreshed.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Set
+
+from library_catalog import LibraryCatalog
+from library_model import LibraryModel
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+    FileSystemEventHandler = object
+
+# Filesystem types where inotify only sees local changes
+NETWORK_FS_TYPES = {'cifs', 'smb3', 'smbfs', 'nfs', 'nfs4', 'fuse.sshfs', '9p'}
+
+
+def is_network_path(path: str) -> bool:
+    """Best-effort check whether path lives on a network mount"""
+    path = os.path.abspath(path)
+    if path.startswith('\\\\'):
+        # Windows UNC path, e.g. \\DS1621+\Video_Server
+        return True
+
+    try:
+        with open('/proc/mounts', 'r') as f:
+            mounts = [line.split()[:3] for line in f]
+    except OSError:
+        return False
+
+    # Longest mount point that contains path wins
+    best_fs_type, best_len = None, -1
+    for _, mount_point, fs_type in mounts:
+        mount_point = mount_point.replace('\\040', ' ')
+        if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) > best_len:
+            best_fs_type, best_len = fs_type, len(mount_point)
+    return best_fs_type in NETWORK_FS_TYPES
+
+
+class _ArtistEventHandler(FileSystemEventHandler):
+    """Maps filesystem events under the artists folder to dirty artist names"""
+
+    def __init__(self, watcher: 'LibraryWatcher'):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        for path in (getattr(event, 'src_path', None), getattr(event, 'dest_path', None)):
+            if path:
+                self.watcher.mark_path(os.fsdecode(path))
+
+
+class LibraryWatcher:
+    """
+    Background refresher for the library catalog
+
+    mode:
+    - 'auto': inotify when watchdog is installed and the library is on a local filesystem, else polling
+    - 'inotify': always use watchdog's native observer
+    - 'poll': periodically compare folder mtimes against the catalog
+    """
+
+    def __init__(self, catalog: LibraryCatalog, model: LibraryModel,
+                 mode: str = 'auto', poll_interval: float = 30.0, debounce: float = 1.0):
+        self.catalog = catalog
+        self.model = model
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+
+        self.backend: Optional[str] = None
+        self._dirty: Set[Optional[str]] = set()
+        self._dirty_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._observer = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _choose_backend(self) -> str:
+        if self.mode == 'poll':
+            return 'poll'
+        if not WATCHDOG_AVAILABLE:
+            if self.mode == 'inotify':
+                print("Warning: watchdog not installed, library watcher falls back to polling")
+            return 'poll'
+        if self.mode == 'auto' and is_network_path(str(self.catalog.artists_path)):
+            return 'poll'
+        return 'inotify'
+
+    def start(self):
+        """Index the whole library, load it into memory and start watching"""
+        if self._thread is not None:
+            return
+
+        self.refresh_all()
+        self.model.preload()
+        self.model.watching = True
+
+        self.backend = self._choose_backend()
+        if self.backend == 'inotify':
+            self._observer = Observer()
+            self._observer.schedule(_ArtistEventHandler(self), str(self.catalog.artists_path), recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+            target = self._process_events
+        else:
+            target = self._poll
+
+        self._thread = threading.Thread(target=target, name='library-watcher', daemon=True)
+        self._thread.start()
+        print(f"Library watcher started ({self.backend})")
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.model.watching = False
+
+    def refresh_all(self):
+        """Refresh every artist - only folders whose mtime changed are re-scanned"""
+        self.catalog.refresh_artists(force=True)
+        for artist_name in self.catalog.artist_names():
+            self.catalog.refresh_artist(artist_name, force=True)
+
+    def mark_path(self, path: str):
+        """Queue the artist owning path for a refresh"""
+        try:
+            relative = Path(path).relative_to(self.catalog.artists_path)
+        except ValueError:
+            return
+
+        parts = relative.parts
+        with self._dirty_lock:
+            if len(parts) <= 1:
+                # Artist folder itself created/removed/renamed
+                self._dirty.add(None)
+            if parts:
+                self._dirty.add(parts[0])
+        self._wakeup.set()
+
+    def _process_events(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            if self._stop.is_set():
+                break
+            # Let bursts (e.g. copying a whole code folder) settle before rescanning
+            time.sleep(self.debounce)
+            self._wakeup.clear()
+
+            with self._dirty_lock:
+                dirty, self._dirty = self._dirty, set()
+
+            try:
+                if None in dirty:
+                    self.catalog.refresh_artists(force=True)
+                for artist_name in dirty:
+                    if artist_name is not None:
+                        self.catalog.refresh_artist(artist_name, force=True)
+            except Exception as e:
+                print(f"Library watcher refresh failed: {e}")
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh_all()
+            except Exception as e:
+                print(f"Library watcher poll failed: {e}")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Listing Cache - Serialized listing responses per artist
+Listing bodies are kept as the bytes that were sent, with a strong ETag, until the
+catalog reports a change to that artist. Serving an unchanged listing is then a
+lookup (plus a 304 when the client already has it) instead of re-encoding.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+# Key of the artist list (changes with any artist)
+ARTISTS = None
+
+
+class ListingCache:
+    """
+    LRU of (artist, variant) -> (body, etag), bounded by max_bytes
+    Register on_catalog_changed as a catalog listener. A body built from data read
+    before a change is not stored: pass the generation() taken before reading to put().
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[Optional[str], Hashable], Tuple[bytes, str]]' = OrderedDict()
+        self._bytes = 0
+        self._generation = 0
+        # artist (ARTISTS - any) -> generation of its last change
+        self._changed: Dict[Optional[str], int] = {}
+        # Generation of the last change to the set of artists (everything is stale)
+        self._all_changed = 0
+
+    def on_catalog_changed(self, artist_name: Optional[str]):
+        with self._lock:
+            self._generation += 1
+            if artist_name is None:
+                self._entries.clear()
+                self._bytes = 0
+                self._changed.clear()
+                self._all_changed = self._generation
+                return
+            self._changed[artist_name] = self._generation
+            self._changed[ARTISTS] = self._generation
+            for key in [k for k in self._entries if k[0] in (artist_name, ARTISTS)]:
+                body, _ = self._entries.pop(key)
+                self._bytes -= len(body)
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def get(self, artist_name: Optional[str], variant: Hashable) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            key = (artist_name, variant)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, artist_name: Optional[str], variant: Hashable, body: bytes, generation: int) -> str:
+        """Store body (unless the artist changed after generation); returns its ETag"""
+        etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        if len(body) > self.max_bytes:
+            return etag
+        with self._lock:
+            if max(self._all_changed, self._changed.get(artist_name, 0)) > generation:
+                return etag
+            key = (artist_name, variant)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (body, etag)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes and self._entries:
+                _, (old_body, _) = self._entries.popitem(last=False)
+                self._bytes -= len(old_body)
+        return etag
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
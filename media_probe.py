@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Media Probe - Duration, codecs, bitrate, resolution and keyframe index of media files
+MP4/MOV/M4A headers are parsed in pure Python (only the moov box is read, wherever it
+sits in the file); other containers go through ffprobe when it is installed.
+Probing runs on a bounded thread pool fed by catalog folder scans, and the results
+are stored in the catalog keyed by path, mtime and size, so listings never open
+media files.
+"""
+import json
+import math
+import os
+import shutil
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from library_catalog import LibraryCatalog
+
+MP4_EXTENSIONS = ('.mp4', '.m4v', '.mov', '.m4a')
+# moov boxes larger than this are left to ffprobe
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+# Seconds between catalog notifications for an artist whose files are being probed - its
+# listings and search entries are rebuilt per notification, not per file (the last file
+# of an artist always notifies)
+NOTIFY_INTERVAL = 10.0
+
+# Sample entry fourcc -> codec name as reported by ffprobe
+MP4_CODECS = {
+    b'avc1': 'h264', b'avc3': 'h264', b'hvc1': 'hevc', b'hev1': 'hevc', b'av01': 'av1',
+    b'vp09': 'vp9', b'mp4v': 'mpeg4', b'mp4a': 'aac', b'ac-3': 'ac3', b'ec-3': 'eac3',
+    b'Opus': 'opus', b'fLaC': 'flac', b'.mp3': 'mp3', b'alac': 'alac'
+}
+
+
+class ProbeError(Exception):
+    """The file couldn't be parsed"""
+
+
+# ----------------------------------------------------------------------
+# MP4 header parser
+# ----------------------------------------------------------------------
+
+def _boxes(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """(type, payload start, payload end) of the boxes in data[start:end]"""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _find(data: bytes, start: int, end: int, *path: bytes) -> Optional[Tuple[int, int]]:
+    """Payload range of the first box at path below data[start:end]"""
+    for name in path:
+        for box_type, box_start, box_end in _boxes(data, start, end):
+            if box_type == name:
+                start, end = box_start, box_end
+                break
+        else:
+            return None
+    return start, end
+
+
+def _read_moov(f, file_size: int) -> bytes:
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack_from('>I4s', header)
+        header_size = 8
+        if size == 1 and len(header) == 16:
+            size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            break
+        if box_type == b'moov':
+            if size > MAX_MOOV_BYTES:
+                raise ProbeError('moov box too large')
+            f.seek(pos + header_size)
+            return f.read(size - header_size)
+        pos += size
+    raise ProbeError('No moov box')
+
+
+def _timescale_duration(data: bytes, start: int) -> Tuple[int, int]:
+    """(timescale, duration) of an mvhd/mdhd payload"""
+    if data[start] == 1:
+        return struct.unpack_from('>IQ', data, start + 20)
+    return struct.unpack_from('>II', data, start + 12)
+
+
+def seek_time(seconds: Fraction) -> float:
+    """
+    A keyframe time rounded up to the microsecond
+    Used as an ffmpeg input seek (-ss) with stream copy, a time even slightly before the
+    keyframe's pts starts at the previous keyframe instead, so it is never rounded down.
+    """
+    return math.ceil(seconds * 1_000_000) / 1_000_000
+
+
+def _edit_offset(data: bytes, trak: Tuple[int, int], timescale: int, movie_timescale: int) -> Fraction:
+    """Seconds the edit list shifts the track's media times by (leading empty edits, start of the first edit)"""
+    elst = _find(data, trak[0], trak[1], b'edts', b'elst')
+    if elst is None:
+        return Fraction(0)
+    entry_format, entry_size = ('>Qq', 20) if data[elst[0]] == 1 else ('>Ii', 12)
+    count = struct.unpack_from('>I', data, elst[0] + 4)[0]
+    offset = Fraction(0)
+    for i in range(count):
+        duration, media_time = struct.unpack_from(entry_format, data, elst[0] + 8 + i * entry_size)
+        if media_time != -1:
+            return offset - Fraction(media_time, timescale)
+        # Empty edit - the track starts that much later (movie timescale)
+        if movie_timescale:
+            offset += Fraction(duration, movie_timescale)
+    return offset
+
+
+def _keyframe_times(data: bytes, trak: Tuple[int, int], stbl: Tuple[int, int], timescale: int,
+                    movie_timescale: int) -> Optional[List[float]]:
+    """
+    Presentation times (seconds, see seek_time) of the sync samples, None when every sample is
+    a sync sample - decode time (stts) plus composition offset (ctts), shifted by the edit list,
+    which is the pts ffmpeg reports for the keyframe
+    """
+    stss = _find(data, stbl[0], stbl[1], b'stss')
+    stts = _find(data, stbl[0], stbl[1], b'stts')
+    if stss is None or stts is None or not timescale:
+        return None
+
+    count = struct.unpack_from('>I', data, stss[0] + 4)[0]
+    sync_samples = struct.unpack_from(f'>{count}I', data, stss[0] + 8)
+    runs = struct.unpack_from('>I', data, stts[0] + 4)[0]
+    deltas = struct.unpack_from(f'>{runs * 2}I', data, stts[0] + 8)
+
+    # (sample number, timestamp in the track timescale) of every sync sample
+    keyframes = []
+    k = 0
+    sample = 1
+    t = 0
+    for i in range(runs):
+        run_count, delta = deltas[2 * i], deltas[2 * i + 1]
+        while k < count and sync_samples[k] < sample + run_count:
+            keyframes.append((sync_samples[k], t + (sync_samples[k] - sample) * delta))
+            k += 1
+        sample += run_count
+        t += run_count * delta
+
+    ctts = _find(data, stbl[0], stbl[1], b'ctts')
+    if ctts is not None:
+        ctts_runs = struct.unpack_from('>I', data, ctts[0] + 4)[0]
+        # Offsets are signed in version 1 - and in practice in version 0 too (ffmpeg reads them so)
+        offsets = struct.unpack_from('>' + 'Ii' * ctts_runs, data, ctts[0] + 8)
+        run = 0
+        first = 1
+        for i, (sample, t) in enumerate(keyframes):
+            while run < ctts_runs and sample >= first + offsets[2 * run]:
+                first += offsets[2 * run]
+                run += 1
+            if run < ctts_runs:
+                keyframes[i] = (sample, t + offsets[2 * run + 1])
+
+    offset = _edit_offset(data, trak, timescale, movie_timescale)
+    return sorted(seek_time(Fraction(t, timescale) + offset) for _, t in keyframes)
+
+
+def parse_mp4(path: str) -> Dict[str, any]:
+    """Probe an MP4/MOV/M4A file from its moov box - raises ProbeError"""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        moov = _read_moov(f, file_size)
+
+    try:
+        mvhd = _find(moov, 0, len(moov), b'mvhd')
+        if mvhd is None:
+            raise ProbeError('No mvhd box')
+        timescale, duration = _timescale_duration(moov, mvhd[0])
+        info = {
+            'duration': round(duration / timescale, 3) if timescale and duration else None,
+            'bitrate': None, 'video_codec': None, 'audio_codec': None,
+            'width': None, 'height': None, 'keyframes': None
+        }
+
+        for box_type, trak_start, trak_end in _boxes(moov, 0, len(moov)):
+            if box_type != b'trak':
+                continue
+            hdlr = _find(moov, trak_start, trak_end, b'mdia', b'hdlr')
+            mdhd = _find(moov, trak_start, trak_end, b'mdia', b'mdhd')
+            stbl = _find(moov, trak_start, trak_end, b'mdia', b'minf', b'stbl')
+            if hdlr is None or stbl is None:
+                continue
+            handler = moov[hdlr[0] + 8:hdlr[0] + 12]
+            stsd = _find(moov, stbl[0], stbl[1], b'stsd')
+            # stsd: version/flags, entry count, then the first sample entry (size, format, ...)
+            entry = stsd[0] + 8 if stsd is not None else None
+            fourcc = moov[entry + 4:entry + 8] if entry is not None else b''
+            codec = MP4_CODECS.get(fourcc, fourcc.decode('ascii', 'replace').strip() or None)
+
+            if handler == b'vide' and info['video_codec'] is None:
+                info['video_codec'] = codec
+                if entry is not None:
+                    info['width'], info['height'] = struct.unpack_from('>HH', moov, entry + 32)
+                track_timescale = _timescale_duration(moov, mdhd[0])[0] if mdhd is not None else 0
+                info['keyframes'] = _keyframe_times(moov, (trak_start, trak_end), stbl, track_timescale, timescale)
+            elif handler == b'soun' and info['audio_codec'] is None:
+                info['audio_codec'] = codec
+    except struct.error as e:
+        raise ProbeError(f'Truncated box: {e}')
+
+    if info['duration'] is None:
+        # Fragmented MP4 - samples live in moof boxes
+        raise ProbeError('No duration in moov')
+    info['bitrate'] = int(file_size * 8 / info['duration'])
+    return info
+
+
+# ----------------------------------------------------------------------
+# Prober
+# ----------------------------------------------------------------------
+
+class MediaProber:
+    """
+    Probes new or changed media files in the background and stores the results in the catalog
+
+    ffprobe: used for non-MP4 containers (and MP4s the parser can't handle); without it
+             those files are left unprobed and retried on the next start
+    workers: files probed at the same time
+    scan_keyframes: also index keyframes with ffprobe - reads the whole file, so off by
+                    default (MP4 keyframes come from the headers either way)
+    """
+
+    def __init__(self, catalog: LibraryCatalog, ffprobe: str = 'ffprobe', workers: int = 2,
+                 scan_keyframes: bool = False, timeout: float = 120):
+        self.catalog = catalog
+        self.ffprobe = shutil.which(ffprobe)
+        self.workers = workers
+        self.scan_keyframes = scan_keyframes
+        self.timeout = timeout
+        self.probed = 0
+        self.failed = 0
+        self.skipped = 0
+
+        self._lock = threading.Lock()
+        # (artist, code, filename, size, mtime_ns) queued or running
+        self._pending = set()
+        # artist -> [jobs queued or running, monotonic time of the last notification]
+        self._artists: Dict[str, list] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def start(self):
+        """Queue every media file without a current probe (in the background)"""
+        if not self.enabled:
+            return
+        threading.Thread(target=self._sweep, name='media-probe-sweep', daemon=True).start()
+
+    def _sweep(self):
+        for media in self.catalog.unprobed_media():
+            self.schedule(media['artist'], media['code'], media['filename'], media['size'], media['mtime_ns'])
+
+    def on_folder_indexed(self, artist_name: str, code: str, folder: Dict[str, any]):
+        """LibraryCatalog folder listener - probe the media of a new or changed folder"""
+        for media in folder['media']:
+            self.schedule(artist_name, code, media['filename'], media['size'], media['mtime_ns'])
+
+    def schedule(self, artist_name: str, code: str, filename: str, size: int, mtime_ns: int):
+        if not self.enabled:
+            return
+        job = (artist_name, code, filename, size, mtime_ns)
+        with self._lock:
+            if job in self._pending:
+                return
+            self._pending.add(job)
+            artist = self._artists.setdefault(artist_name, [0, time.monotonic()])
+            artist[0] += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='media-probe')
+            self._executor.submit(self._probe_job, job)
+
+    def _probe_job(self, job: Tuple[str, str, str, int, int]):
+        artist_name, code, filename, size, mtime_ns = job
+        path = str(self.catalog.artists_path / artist_name / code / filename)
+        try:
+            try:
+                info = self.probe_file(path)
+            except OSError as e:
+                # Couldn't be read right now (e.g. a network share hiccup) - nothing is stored,
+                # so the next sweep or change of the folder probes it again
+                self.failed += 1
+                print(f"Error reading {path} for probing: {e}")
+                return
+            except ProbeError as e:
+                self.failed += 1
+                self.catalog.store_probe(artist_name, code, filename, size, mtime_ns, None,
+                                         error=str(e), notify=False)
+                return
+            if info is None:
+                self.skipped += 1
+                return
+            self.catalog.store_probe(artist_name, code, filename, size, mtime_ns, info, notify=False)
+            self.probed += 1
+        except Exception as e:
+            print(f"Error probing {path}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(job)
+                artist = self._artists[artist_name]
+                artist[0] -= 1
+                now = time.monotonic()
+                notify = artist[0] == 0 or now - artist[1] >= NOTIFY_INTERVAL
+                if artist[0] == 0:
+                    del self._artists[artist_name]
+                elif notify:
+                    artist[1] = now
+            if notify:
+                try:
+                    self.catalog.notify_changed(artist_name)
+                except Exception as e:
+                    print(f"Error notifying probes of {artist_name}: {e}")
+
+    def probe_file(self, path: str) -> Optional[Dict[str, any]]:
+        """
+        {'duration', 'bitrate', 'video_codec', 'audio_codec', 'width', 'height', 'keyframes'}
+        None when no prober handles the file (no ffprobe); raises ProbeError/OSError on bad files
+        """
+        if os.path.splitext(path)[1].lower() in MP4_EXTENSIONS:
+            try:
+                return parse_mp4(path)
+            except ProbeError:
+                if self.ffprobe is None:
+                    raise
+        if self.ffprobe is None:
+            return None
+        return self._ffprobe(path)
+
+    def _run(self, args: List[str]) -> bytes:
+        try:
+            result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    stdin=subprocess.DEVNULL, timeout=self.timeout)
+        except subprocess.TimeoutExpired as e:
+            raise ProbeError(str(e))
+        if result.returncode != 0:
+            raise ProbeError(result.stderr.decode('utf-8', 'replace').strip()[-500:])
+        return result.stdout
+
+    def _ffprobe(self, path: str) -> Dict[str, any]:
+        try:
+            data = json.loads(self._run([
+                self.ffprobe, '-v', 'error',
+                '-show_entries', 'format=duration,bit_rate,start_time:stream=codec_type,codec_name,width,height',
+                '-of', 'json', path
+            ]) or b'{}')
+        except ValueError as e:
+            raise ProbeError(f'Bad ffprobe output: {e}')
+
+        fmt = data.get('format', {})
+        info = {
+            'duration': _float(fmt.get('duration')),
+            'bitrate': _int(fmt.get('bit_rate')),
+            'video_codec': None, 'audio_codec': None,
+            'width': None, 'height': None, 'keyframes': None
+        }
+        for stream in data.get('streams', []):
+            if stream.get('codec_type') == 'video' and info['video_codec'] is None:
+                info['video_codec'] = stream.get('codec_name')
+                info['width'] = _int(stream.get('width'))
+                info['height'] = _int(stream.get('height'))
+            elif stream.get('codec_type') == 'audio' and info['audio_codec'] is None:
+                info['audio_codec'] = stream.get('codec_name')
+        if info['duration'] is None:
+            raise ProbeError('No duration')
+        if info['bitrate'] is None:
+            info['bitrate'] = int(os.path.getsize(path) * 8 / info['duration']) if info['duration'] else None
+
+        if self.scan_keyframes and info['video_codec'] is not None:
+            info['keyframes'] = self.scan_keyframe_times(path, fmt.get('start_time'))
+        return info
+
+    def scan_keyframe_times(self, path: str, start_time: Optional[str]) -> List[float]:
+        """Keyframe times (see seek_time) of the first video stream from its packet headers - reads the whole file"""
+        start = _fraction(start_time) or Fraction(0)
+        output = self._run([
+            self.ffprobe, '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', path
+        ])
+        keyframes = []
+        for line in output.decode('ascii', 'replace').splitlines():
+            pts, _, flags = line.partition(',')
+            pts = _fraction(pts)
+            if 'K' in flags and pts is not None:
+                keyframes.append(seek_time(pts - start))
+        return sorted(keyframes)
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'enabled': self.enabled,
+            'ffprobe': self.ffprobe is not None,
+            'pending': pending,
+            'probed': self.probed,
+            'failed': self.failed,
+            'skipped': self.skipped
+        }
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _fraction(value) -> Optional[Fraction]:
+    """Exact value of a decimal string from ffprobe"""
+    try:
+        return Fraction(value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
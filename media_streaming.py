@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Media Streaming - Range-aware responses for large media files
+Python only resolves the path and the requested byte range; the bytes are moved
+by the kernel (os.sendfile through the server's wsgi.file_wrapper) or by a front
+proxy (X-Accel-Redirect for nginx, X-Sendfile for Apache/lighttpd).
+Conditional and Range handling is Werkzeug's (Response.make_conditional), the
+same as send_file(conditional=True).
+
+On network mounts (SMB/NFS), where every small read pays a round trip, the
+'buffered' mode reads large aligned chunks, keeps a few chunks read ahead of the
+player, and keeps repeatedly requested chunks (container header, index) in a
+bounded buffer pool.
+"""
+import io
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from flask import Response
+
+MEDIA_MIMETYPES = {
+    '.mp4': 'video/mp4',
+    '.mkv': 'video/x-matroska',
+    '.avi': 'video/x-msvideo',
+    '.mov': 'video/quicktime',
+    '.webm': 'video/webm',
+    '.wav': 'audio/wav',
+    '.mp3': 'audio/mpeg',
+    '.flac': 'audio/flac',
+    '.m4a': 'audio/mp4'
+}
+
+# Transfer modes ('auto' resolves to 'buffered' on network mounts, else 'sendfile')
+OFFLOAD_MODES = ('auto', 'sendfile', 'buffered', 'off', 'x-accel', 'x-sendfile')
+# Modes where the front proxy reads the file - no server thread is held while it streams
+PROXY_MODES = ('x-accel', 'x-sendfile')
+
+# Read size when Python copies the bytes itself (no sendfile available)
+COPY_CHUNK_SIZE = 256 * 1024
+
+
+class _ClosingFile(io.FileIO):
+    """File that runs a callback once closed (the server closes the body when done or on disconnect)"""
+
+    def __init__(self, path: str, on_close: Optional[Callable[[], None]]):
+        super().__init__(path, 'rb')
+        self._on_close = on_close
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                on_close()
+
+
+class _FileRange:
+    """Iterates length bytes from the file's current position in chunks, closes the file when closed"""
+
+    def __init__(self, file: io.FileIO, length: int, chunk_size: int = COPY_CHUNK_SIZE):
+        self.file = file
+        self.remaining = length
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        while self.remaining > 0:
+            data = self.file.read(min(self.chunk_size, self.remaining))
+            if not data:
+                break
+            self.remaining -= len(data)
+            yield data
+
+    def close(self):
+        self.file.close()
+
+
+class ChunkReader:
+    """
+    Aligned chunk reads with read-ahead, shared by all buffered streams
+
+    chunk_size: bytes per read, reads start at multiples of it
+    readahead: chunks read in the background ahead of the one being sent
+    pool_bytes: budget of the pool of hot chunks; a chunk is only pooled on its second
+                request, so sequential playback doesn't flush the header/index chunks
+    workers: threads doing the reads (bounds concurrent I/O against the share)
+    Memory: pool_bytes + (readahead + 1) * chunk_size per active stream
+    """
+
+    def __init__(self, chunk_size: int = 1024 * 1024, readahead: int = 4,
+                 pool_bytes: int = 64 * 1024 * 1024, workers: int = 4):
+        self.chunk_size = chunk_size
+        self.readahead = readahead
+        self.pool_bytes = pool_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # (path, mtime_ns, size, chunk index) -> data, least recently used first
+        self._pool: 'OrderedDict[Tuple, bytes]' = OrderedDict()
+        self._bytes = 0
+        # Chunks requested once - admitted to the pool on the next request
+        self._seen: 'OrderedDict[Tuple, None]' = OrderedDict()
+        self._max_seen = max(1024, 4 * pool_bytes // chunk_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stream-read')
+
+    def _read(self, fd: int, index: int) -> bytes:
+        offset = index * self.chunk_size
+        parts = []
+        remaining = self.chunk_size
+        while remaining > 0:
+            data = os.pread(fd, remaining, offset)
+            if not data:
+                break
+            parts.append(data)
+            offset += len(data)
+            remaining -= len(data)
+        return b''.join(parts)
+
+    def _lookup(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            data = self._pool.get(key)
+            if data is not None:
+                self._pool.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return data
+
+    def _offer(self, key: Tuple, data: bytes):
+        """Pool a chunk that was requested before, otherwise just remember it"""
+        with self._lock:
+            if key in self._pool:
+                return
+            if key not in self._seen:
+                self._seen[key] = None
+                if len(self._seen) > self._max_seen:
+                    self._seen.popitem(last=False)
+                return
+            del self._seen[key]
+            self._pool[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.pool_bytes and self._pool:
+                _, old = self._pool.popitem(last=False)
+                self._bytes -= len(old)
+
+    def iter_range(self, file: io.FileIO, st: os.stat_result, start: int, length: int) -> Iterator[bytes]:
+        """Yield bytes [start, start + length) of file"""
+        if length <= 0:
+            return
+        fd = file.fileno()
+        file_key = (file.name, st.st_mtime_ns, st.st_size)
+        first = start // self.chunk_size
+        last = (start + length - 1) // self.chunk_size
+        # (index, pooled data or pending read), in order
+        window: Deque[Tuple[int, object]] = deque()
+        next_index = first
+
+        def fill():
+            nonlocal next_index
+            while next_index <= last and len(window) <= self.readahead:
+                key = file_key + (next_index,)
+                data = self._lookup(key)
+                window.append((next_index, data if data is not None else self._executor.submit(self._read, fd, next_index)))
+                next_index += 1
+
+        try:
+            while True:
+                fill()
+                if not window:
+                    break
+                index, item = window.popleft()
+                if isinstance(item, Future):
+                    data = item.result()
+                    self._offer(file_key + (index,), data)
+                else:
+                    data = item
+                chunk_start = index * self.chunk_size
+                lo = max(start, chunk_start) - chunk_start
+                hi = min(start + length, chunk_start + len(data)) - chunk_start
+                if hi <= lo:
+                    break
+                yield data[lo:hi]
+        finally:
+            # The caller closes the file after this - reads still running must not outlive the fd
+            pending = [item for _, item in window if isinstance(item, Future) and not item.cancel()]
+            wait(pending)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'pooled_chunks': len(self._pool),
+                'pool_bytes': self._bytes,
+                'max_pool_bytes': self.pool_bytes,
+                'chunk_size': self.chunk_size,
+                'readahead': self.readahead
+            }
+
+
+class _BufferedRange:
+    """Response body reading through a ChunkReader, closes the file when closed"""
+
+    def __init__(self, reader: ChunkReader, file: io.FileIO, st: os.stat_result, start: int, length: int):
+        self.file = file
+        self._chunks = reader.iter_range(file, st, start, length)
+
+    def __iter__(self):
+        return self._chunks
+
+    def close(self):
+        try:
+            self._chunks.close()
+        finally:
+            self.file.close()
+
+
+def media_etag(st: os.stat_result) -> str:
+    """Strong ETag from inode, mtime and size"""
+    return f'{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}'
+
+
+def media_response(environ: dict, path: str, mimetype: str, mode: str = 'sendfile',
+                   root: Optional[str] = None, accel_prefix: str = '/_media/',
+                   on_close: Optional[Callable[[], None]] = None,
+                   reader: Optional[ChunkReader] = None) -> Response:
+    """
+    Build a (possibly partial) response for a media file
+
+    mode: 'sendfile' - kernel copy via wsgi.file_wrapper when the server offers it (gunicorn)
+          'buffered' - aligned chunks with read-ahead through reader (network mounts)
+          'off' - Python reads and yields the bytes
+          'x-accel' - nginx serves accel_prefix + the path relative to root (internal location)
+          'x-sendfile' - Apache/lighttpd serve the absolute path
+    on_close: called exactly once, when the response body is released (immediately if there is none)
+    Raises OSError if the file can't be opened, RequestedRangeNotSatisfiable for a bad Range
+    """
+    try:
+        st = os.stat(path)
+        response = Response(mimetype=mimetype, direct_passthrough=True)
+        response.set_etag(media_etag(st))
+        response.last_modified = st.st_mtime
+        response.cache_control.no_cache = True
+
+        if mode in PROXY_MODES:
+            # The proxy answers Range/conditional requests from the file itself
+            if mode == 'x-accel':
+                relative = os.path.relpath(path, root).replace(os.sep, '/')
+                response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(relative)
+            else:
+                response.headers['X-Sendfile'] = os.path.abspath(path)
+            response.response = []
+            if on_close is not None:
+                on_close()
+            return response
+
+        response.content_length = st.st_size
+        response.accept_ranges = 'bytes'
+        response.make_conditional(environ, accept_ranges=True, complete_length=st.st_size)
+    except BaseException:
+        if on_close is not None:
+            on_close()
+        raise
+
+    if response.status_code not in (200, 206) or environ.get('REQUEST_METHOD') == 'HEAD':
+        response.response = []
+        if on_close is not None:
+            on_close()
+        return response
+
+    if response.status_code == 206:
+        start, length = response.content_range.start, response.content_range.stop - response.content_range.start
+    else:
+        start, length = 0, st.st_size
+
+    try:
+        file = _ClosingFile(path, on_close)
+    except BaseException:
+        if on_close is not None:
+            on_close()
+        raise
+    try:
+        file.seek(start)
+    except BaseException:
+        file.close()
+        raise
+
+    file_wrapper = environ.get('wsgi.file_wrapper')
+    if mode == 'buffered' and reader is not None:
+        response.response = _BufferedRange(reader, file, st, start, length)
+    elif mode == 'sendfile' and file_wrapper is not None:
+        # gunicorn sends Content-Length bytes from the current offset with os.sendfile
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(file.fileno(), start, length, os.POSIX_FADV_SEQUENTIAL)
+        response.response = file_wrapper(file, COPY_CHUNK_SIZE)
+    else:
+        response.response = _FileRange(file, length)
+    return response
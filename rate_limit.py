@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Rate Limit - Per-host token buckets shared by all scraper threads
+Each host gets its own bucket, so politeness towards one site never slows down
+requests to another. Buckets are process-wide: every JavMetadataScraper instance
+(one per API request) draws from the same budget.
+"""
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """
+    rate: tokens added per second (sustained requests/second)
+    burst: bucket capacity (requests allowed back to back after an idle period)
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for a while (site answered 429/503)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class HostRateLimiter:
+    """Token bucket per host; hosts without explicit limits share the default rate"""
+
+    def __init__(self, default_rate: float = 1.0, default_burst: int = 1):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self._limits: Dict[str, Tuple[float, int]] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        host = urlsplit(url).hostname or ''
+        return host[4:] if host.startswith('www.') else host
+
+    def configure(self, host: str, rate: float, burst: int = 1):
+        """Set the limit of one host (replaces its bucket)"""
+        with self._lock:
+            self._limits[host] = (rate, burst)
+            self._buckets.pop(host, None)
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = self.host_of(url)
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self._limits.get(host, (self.default_rate, self.default_burst))
+                bucket = self._buckets[host] = TokenBucket(rate, burst)
+            return bucket
+
+    def acquire(self, url: str):
+        self.bucket(url).acquire()
+
+    def pause(self, url: str, seconds: float):
+        self.bucket(url).pause(seconds)
+
+
+def retry_after_seconds(value: Optional[str], default: float) -> float:
+    """Parse a Retry-After header given in seconds (HTTP dates fall back to default)"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Remux - HLS segments for containers browsers can't open (MKV/AVI) and for very
+large files, which seek poorly over single-URL range requests
+ffmpeg copies the audio/video streams into MPEG-TS segments without re-encoding.
+Segments are cut at keyframes found by ffprobe, so each one is generated on its
+own: a seek only remuxes the segment it lands in, never the file from the start.
+Finding the cuts seeks to each segment boundary through the container's index
+rather than reading every packet, so a first play doesn't wait for a full read.
+A background prefetcher keeps the next segments after the playhead ready.
+The segment plan and the segments live in a DerivativeCache (size-capped, LRU).
+"""
+import json
+import math
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict, deque
+from fractions import Fraction
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from derivative_cache import DerivativeCache
+from media_probe import seek_time
+
+REMUX_EXTENSIONS = ('.mkv', '.avi')
+SEGMENT_MIMETYPE = 'video/mp2t'
+PLAYLIST_MIMETYPE = 'application/vnd.apple.mpegurl'
+
+# Bump when the plan/segment format changes (cache keys include it)
+REMUX_VERSION = 2
+
+# Sources whose playhead the prefetcher remembers
+MAX_TRACKED_SOURCES = 64
+
+
+class RemuxError(Exception):
+    """ffmpeg/ffprobe failed or the source has nothing to remux"""
+
+
+class RemuxService:
+    """
+    cache: where plans (.json) and segments (.ts) are stored
+    segment_seconds: target segment length - segments end on the first keyframe after it
+    workers: ffmpeg/ffprobe processes run at the same time
+    timeout: seconds one ffmpeg/ffprobe run may take
+    keyframe_source: (path, stat) -> (duration, keyframe timestamps) already known for
+                     that file version (media probes), or None to find cuts with ffprobe
+    """
+
+    def __init__(self, cache: DerivativeCache, ffmpeg: str = 'ffmpeg', ffprobe: str = 'ffprobe',
+                 segment_seconds: float = 6.0, workers: int = 2, timeout: float = 300,
+                 keyframe_source: Optional[Callable[[str, os.stat_result], Optional[Tuple[float, List[float]]]]] = None):
+        self.cache = cache
+        self.keyframe_source = keyframe_source
+        self.ffmpeg = shutil.which(ffmpeg)
+        self.ffprobe = shutil.which(ffprobe)
+        self.segment_seconds = segment_seconds
+        self.timeout = timeout
+        self.generated = 0
+        self.failed = 0
+
+        self._slots = threading.BoundedSemaphore(max(1, workers))
+        self._lock = threading.Lock()
+        # cache key -> [lock, users] - one generation per plan/segment at a time
+        self._key_locks: Dict[str, list] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ffmpeg is not None and self.ffprobe is not None
+
+    @staticmethod
+    def supports(filename: str) -> bool:
+        return os.path.splitext(filename)[1].lower() in REMUX_EXTENSIONS
+
+    # ------------------------------------------------------------------
+    # Single flight per cache key
+    # ------------------------------------------------------------------
+
+    def _acquire_key(self, key: str) -> threading.Lock:
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        return entry[0]
+
+    def _release_key(self, key: str):
+        with self._lock:
+            entry = self._key_locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._key_locks[key]
+
+    def _run(self, args: List[str]) -> bytes:
+        with self._slots:
+            try:
+                result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                        stdin=subprocess.DEVNULL, timeout=self.timeout)
+            except (OSError, subprocess.TimeoutExpired) as e:
+                raise RemuxError(str(e)) from e
+        if result.returncode != 0:
+            raise RemuxError(result.stderr.decode('utf-8', 'replace').strip()[-500:])
+        return result.stdout
+
+    # ------------------------------------------------------------------
+    # Segment plan
+    # ------------------------------------------------------------------
+
+    def _probe(self, source_path: str) -> List[Tuple[float, float]]:
+        """
+        Segments of a file without stored keyframes
+        ffprobe seeks to every segment_seconds step (through the container's index) and reports
+        the first video packet there - a keyframe, since seeks land on one - so this costs one
+        seek per segment instead of reading every packet of the file
+        """
+        info = json.loads(self._run([
+            self.ffprobe, '-v', 'error', '-show_entries', 'format=start_time,duration',
+            '-of', 'json', source_path
+        ]) or b'{}').get('format', {})
+        try:
+            start_time = Fraction(info.get('start_time') or 0)
+            duration = float(info['duration'])
+        except (KeyError, TypeError, ValueError, ZeroDivisionError):
+            raise RemuxError(f'No duration for {source_path}')
+
+        steps = math.ceil(duration / self.segment_seconds)
+        if steps <= 1:
+            return self._segments([0.0], duration)
+        # Interval start times are stream timestamps, not offsets from start_time
+        intervals = ','.join(
+            f'{float(start_time) + i * self.segment_seconds:.6f}%+#1' for i in range(1, steps)
+        )
+        output = self._run([
+            self.ffprobe, '-v', 'error', '-select_streams', 'v:0', '-read_intervals', intervals,
+            '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', source_path
+        ])
+        keyframes = set()
+        for line in output.decode('ascii', 'replace').splitlines():
+            pts, _, flags = line.partition(',')
+            if 'K' in flags:
+                try:
+                    keyframes.add(seek_time(Fraction(pts) - start_time))
+                except (ValueError, ZeroDivisionError):
+                    continue
+        if not keyframes:
+            # Audio only
+            return self._build_plan(duration, [])
+        # One keyframe per boundary already - every one is a cut
+        return self._segments([0.0] + sorted(t for t in keyframes if 0 < t < duration), duration)
+
+    def _build_plan(self, duration: float, keyframes: List[float]) -> List[Tuple[float, float]]:
+        """(start, duration) of every segment - each starts on a keyframe (or fixed steps for audio only)"""
+        if not keyframes:
+            count = max(1, math.ceil(duration / self.segment_seconds))
+            cuts = [i * self.segment_seconds for i in range(count)]
+        else:
+            cuts = [0.0]
+            for t in keyframes:
+                if t >= cuts[-1] + self.segment_seconds and t < duration:
+                    cuts.append(t)
+        return self._segments(cuts, duration)
+
+    @staticmethod
+    def _segments(cuts: List[float], duration: float) -> List[Tuple[float, float]]:
+        ends = cuts[1:] + [duration]
+        return [(round(start, 6), round(end - start, 6)) for start, end in zip(cuts, ends) if end > start]
+
+    def plan(self, source_path: str) -> List[Tuple[float, float]]:
+        """Segments of source_path, probing it on the first request - raises RemuxError"""
+        st = os.stat(source_path)
+        key = DerivativeCache.make_key(source_path, st, 'remux-plan', REMUX_VERSION, self.segment_seconds)
+        self._acquire_key(key)
+        try:
+            cached = self.cache.get(key, '.json')
+            if cached is not None:
+                try:
+                    with open(cached, 'r', encoding='utf-8') as f:
+                        return [tuple(s) for s in json.load(f)['segments']]
+                except (OSError, ValueError, KeyError):
+                    pass
+            known = self.keyframe_source(source_path, st) if self.keyframe_source is not None else None
+            if known is not None:
+                segments = self._build_plan(*known)
+            else:
+                segments = self._probe(source_path)
+            self.cache.put(key, json.dumps({'segments': segments}).encode('utf-8'), '.json')
+            return segments
+        finally:
+            self._release_key(key)
+
+    def playlist(self, source_path: str) -> str:
+        """VOD playlist; segment URIs are relative ('<index>.ts')"""
+        segments = self.plan(source_path)
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            f'#EXT-X-TARGETDURATION:{max(1, math.ceil(max(d for _, d in segments)))}',
+            '#EXT-X-MEDIA-SEQUENCE:0',
+            '#EXT-X-PLAYLIST-TYPE:VOD'
+        ]
+        for index, (_, duration) in enumerate(segments):
+            lines.append(f'#EXTINF:{duration:.6f},')
+            lines.append(f'{index}.ts')
+        lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines) + '\n'
+
+    # ------------------------------------------------------------------
+    # Segments
+    # ------------------------------------------------------------------
+
+    def segment(self, source_path: str, index: int) -> Optional[str]:
+        """
+        Path of segment index (generated on a miss), None if index is out of range
+        Raises RemuxError if ffmpeg fails
+        """
+        segments = self.plan(source_path)
+        if not 0 <= index < len(segments):
+            return None
+        start, duration = segments[index]
+
+        st = os.stat(source_path)
+        key = DerivativeCache.make_key(source_path, st, 'remux-ts', REMUX_VERSION, self.segment_seconds, index)
+        self._acquire_key(key)
+        try:
+            cached = self.cache.get(key, '.ts')
+            if cached is not None:
+                return str(cached)
+
+            path = self.cache.path_for(key, '.ts')
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+            args = [
+                self.ffmpeg, '-v', 'error', '-nostdin', '-y',
+                '-ss', f'{start:.6f}', '-i', source_path, '-t', f'{duration:.6f}',
+                '-map', '0:v:0?', '-map', '0:a:0?', '-sn', '-dn',
+                '-c', 'copy',
+                # Keep the segment on the playlist's timeline so players stitch them seamlessly
+                '-output_ts_offset', f'{start:.6f}', '-muxdelay', '0',
+                '-f', 'mpegts', str(tmp_path)
+            ]
+            try:
+                self._run(args)
+                os.replace(tmp_path, path)
+            except (RemuxError, OSError):
+                self.failed += 1
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self.cache.add(path)
+            self.generated += 1
+            return str(path)
+        finally:
+            self._release_key(key)
+
+    def stats(self) -> Dict[str, any]:
+        return {
+            'enabled': self.enabled,
+            'generated': self.generated,
+            'failed': self.failed,
+            'segment_seconds': self.segment_seconds,
+            'cache': self.cache.stats()
+        }
+
+
+class SegmentPrefetcher:
+    """
+    Generates the segments following the last one a player requested, in the background
+
+    ahead: segments kept ready after the playhead
+    workers: prefetch threads - keep below RemuxService workers so a segment a player
+             is waiting for always finds a free ffmpeg slot
+    After a seek, queued segments outside the new window are dropped.
+    """
+
+    def __init__(self, remux: RemuxService, ahead: int = 3, workers: int = 1):
+        self.remux = remux
+        self.ahead = ahead
+        self.workers = workers
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+
+        self._cond = threading.Condition()
+        self._queue: Deque[Tuple[str, int]] = deque()
+        self._queued = set()
+        # source path -> last requested segment index, least recently played first
+        self._playheads: 'OrderedDict[str, int]' = OrderedDict()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.ahead > 0 and self.workers > 0 and self.remux.enabled
+
+    def start(self):
+        if not self.enabled or self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'hls-prefetch-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def played(self, source_path: str, index: int):
+        """A player requested segment index (-1 for the playlist) - queue the ones after it"""
+        if not self.enabled:
+            return
+        with self._cond:
+            self._playheads[source_path] = index
+            self._playheads.move_to_end(source_path)
+            while len(self._playheads) > MAX_TRACKED_SOURCES:
+                self._playheads.popitem(last=False)
+            for ahead_index in range(index + 1, index + 1 + self.ahead):
+                item = (source_path, ahead_index)
+                if item not in self._queued:
+                    self._queued.add(item)
+                    self._queue.append(item)
+            self._cond.notify_all()
+
+    def _wanted(self, source_path: str, index: int) -> bool:
+        playhead = self._playheads.get(source_path)
+        return playhead is not None and playhead < index <= playhead + self.ahead
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                source_path, index = self._queue.popleft()
+                self._queued.discard((source_path, index))
+                if not self._wanted(source_path, index):
+                    self.skipped += 1
+                    continue
+
+            try:
+                # None past the last segment
+                if self.remux.segment(source_path, index) is not None:
+                    self.completed += 1
+            except (RemuxError, OSError) as e:
+                self.failed += 1
+                print(f"Error prefetching segment {index} of {source_path}: {e}")
+
+    def stats(self) -> Dict[str, any]:
+        with self._cond:
+            return {
+                'enabled': self.enabled,
+                'queued': len(self._queue),
+                'completed': self.completed,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'ahead': self.ahead
+            }
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Scrape Cache - Persistent record of scrape outcomes, keyed by normalized code
+Stores the metadata chosen by scrape_multiple_sources together with the raw
+result of every source. Codes that no source knows are cached too (with a
+shorter TTL), so repeated updates stop hitting the sites for them.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_results (
+    code TEXT PRIMARY KEY,
+    found INTEGER NOT NULL,
+    metadata TEXT,
+    sources TEXT NOT NULL,
+    scraped_at REAL NOT NULL
+);
+"""
+
+DEFAULT_FOUND_TTL = 30 * 24 * 3600
+DEFAULT_NOT_FOUND_TTL = 24 * 3600
+
+
+class ScrapeCache:
+    """
+    found_ttl: seconds a successful scrape is reused
+    not_found_ttl: seconds a code no source knew is left alone
+    Disabled (every lookup misses, nothing is stored) until configured with a path.
+    """
+
+    def __init__(self, path: Optional[str] = None, found_ttl: float = DEFAULT_FOUND_TTL,
+                 not_found_ttl: float = DEFAULT_NOT_FOUND_TTL):
+        self.path: Optional[Path] = None
+        self.found_ttl = found_ttl
+        self.not_found_ttl = not_found_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self.configure(path=path)
+
+    def configure(self, path: Optional[str] = None, found_ttl: Optional[float] = None,
+                  not_found_ttl: Optional[float] = None):
+        with self._lock:
+            if found_ttl is not None:
+                self.found_ttl = found_ttl
+            if not_found_ttl is not None:
+                self.not_found_ttl = not_found_ttl
+            if path is not None and Path(path) != self.path:
+                if self._conn is not None:
+                    self._conn.close()
+                self.path = Path(path)
+                self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        return conn
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def _ttl(self, found: bool) -> float:
+        return self.found_ttl if found else self.not_found_ttl
+
+    def get(self, code: str) -> Optional[Dict[str, any]]:
+        """
+        Returns {'found', 'metadata', 'sources', 'scraped_at'} for a fresh entry, else None
+        'metadata' is None for a cached not-found result
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT found, metadata, sources, scraped_at FROM scrape_results WHERE code = ?', (code,)
+            ).fetchone()
+            if row is None or time.time() - row['scraped_at'] > self._ttl(bool(row['found'])):
+                self.misses += 1
+                return None
+            if row['found']:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+        return {
+            'found': bool(row['found']),
+            'metadata': json.loads(row['metadata']) if row['metadata'] is not None else None,
+            'sources': json.loads(row['sources']),
+            'scraped_at': row['scraped_at']
+        }
+
+    def put(self, code: str, metadata: Optional[Dict[str, any]], sources: Dict[str, any]):
+        """Record an outcome - metadata None means no source found the code"""
+        if not self.enabled:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO scrape_results (code, found, metadata, sources, scraped_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (code, int(metadata is not None),
+                 json.dumps(metadata, ensure_ascii=False) if metadata is not None else None,
+                 json.dumps(sources, ensure_ascii=False), time.time())
+            )
+
+    def invalidate(self, code: str):
+        if not self.enabled:
+            return
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM scrape_results WHERE code = ?', (code,))
+
+    def purge_expired(self) -> int:
+        """Drop entries past their TTL, returns how many were removed"""
+        if not self.enabled:
+            return 0
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'DELETE FROM scrape_results WHERE (found = 1 AND scraped_at < ?) OR (found = 0 AND scraped_at < ?)',
+                (now - self.found_ttl, now - self.not_found_ttl)
+            )
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            stats = {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'found_ttl': self.found_ttl,
+                'not_found_ttl': self.not_found_ttl
+            }
+            if self.enabled:
+                row = self._conn.execute(
+                    'SELECT COUNT(*) AS entries, COALESCE(SUM(found), 0) AS found FROM scrape_results'
+                ).fetchone()
+                stats['entries'] = row['entries']
+                stats['not_found_entries'] = row['entries'] - row['found']
+            return stats
+
+
+# Process-wide cache shared by every JavMetadataScraper (configured by app.py)
+scrape_cache = ScrapeCache()
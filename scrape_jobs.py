@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Scrape Jobs - Persistent background queue for title scraping
+Long scrapes (a whole artist or library) run on worker threads instead of inside
+the HTTP request. Jobs and their per-code progress live in SQLite, so a restart
+resumes unfinished jobs where they stopped, and titles are written to title.json
+chunk by chunk rather than at the very end.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from jav_scraper import JavMetadataScraper
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    planned INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat REAL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    code TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    PRIMARY KEY (job_id, artist, code)
+);
+"""
+
+# Job kinds
+UPDATE_MISSING = 'update_missing'  # params: artist_name (None = all), placeholder, scrape_real_titles
+SCRAPE_ARTIST = 'scrape_artist'    # params: artist_name, codes (None = all missing)
+
+ACTIVE_STATUSES = ('queued', 'running')
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+# Codes scraped (and written to title.json) per step - cancellation is checked between steps
+CHUNK_SIZE = 8
+# A running job without a heartbeat for this long belongs to a dead process and is picked up again
+STALE_AFTER = 600.0
+# Finished jobs are forgotten after this many seconds
+KEEP_FINISHED = 7 * 24 * 3600
+
+
+def _process_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but belongs to someone else
+        return True
+    return True
+
+
+class ScrapeJobQueue:
+    """
+    updater_factory: returns a TitleUpdater (called on the worker thread)
+    workers: number of jobs run at the same time (each job scrapes concurrently on its own)
+    """
+
+    def __init__(self, state_dir: str, updater_factory: Callable[[], 'TitleUpdater'],
+                 workers: int = 1, poll_interval: float = 5.0):
+        self.db_path = Path(state_dir) / 'scrape_jobs.sqlite3'
+        self.updater_factory = updater_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.worker_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        return conn
+
+    def start(self):
+        """Start the worker threads - unfinished jobs from a previous run are resumed"""
+        if self._threads or self.workers <= 0:
+            return
+        self._purge_finished()
+        self._recover_orphans()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'scrape-job-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    # ------------------------------------------------------------------
+    # Submitting and inspecting jobs
+    # ------------------------------------------------------------------
+
+    def submit(self, kind: str, params: Dict[str, any]) -> Dict[str, any]:
+        """
+        Queue a job and return its status
+        An identical job that is still queued or running is returned instead of a duplicate
+        (artist pages request an update on every visit).
+        """
+        encoded = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f'SELECT id FROM jobs WHERE kind = ? AND params = ? AND cancel_requested = 0 '
+                f'AND status IN {ACTIVE_STATUSES}',
+                (kind, encoded)
+            ).fetchone()
+            if row is not None:
+                job_id = row['id']
+            else:
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    'INSERT INTO jobs (id, kind, params, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                    (job_id, kind, encoded, 'queued', time.time())
+                )
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, any]]:
+        """Job status with progress; finished jobs include their result"""
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            counts = dict(self._conn.execute(
+                'SELECT state, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY state', (job_id,)
+            ).fetchall())
+        return self._describe(row, counts, with_result=row['status'] in FINISHED_STATUSES)
+
+    def list(self, limit: int = 50) -> List[Dict[str, any]]:
+        """Most recent jobs first (without results)"""
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+            counts: Dict[str, Dict[str, int]] = {}
+            for job_id, state, count in self._conn.execute(
+                'SELECT job_id, state, COUNT(*) FROM job_items WHERE job_id IN '
+                f'(SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?) GROUP BY job_id, state', (limit,)
+            ):
+                counts.setdefault(job_id, {})[state] = count
+        return [self._describe(row, counts.get(row['id'], {}), with_result=False) for row in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, any]]:
+        """
+        Cancel a job - queued jobs stop immediately, running jobs after the current chunk
+        Titles already written stay in title.json
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row['status'] == 'queued':
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished_at = ? WHERE id = ?",
+                    (time.time(), job_id)
+                )
+            elif row['status'] == 'running':
+                self._conn.execute('UPDATE jobs SET cancel_requested = 1 WHERE id = ?', (job_id,))
+        return self.get(job_id)
+
+    def _describe(self, row: sqlite3.Row, counts: Dict[str, int], with_result: bool) -> Dict[str, any]:
+        total = sum(counts.values())
+        pending = counts.get('pending', 0)
+        job = {
+            'id': row['id'],
+            'kind': row['kind'],
+            'params': json.loads(row['params']),
+            'status': row['status'],
+            'cancel_requested': bool(row['cancel_requested']),
+            'progress': {
+                'done': total - pending,
+                'total': total if row['planned'] else None,
+                'scraped': counts.get('scraped', 0),
+                'placeholder': counts.get('placeholder', 0),
+                'not_found': counts.get('not_found', 0)
+            },
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at']
+        }
+        if with_result:
+            job['result'] = self._result(row['id'])
+        return job
+
+    def _result(self, job_id: str) -> Dict[str, any]:
+        """Per-artist lists of scraped and placeholder codes"""
+        artists: Dict[str, Dict[str, List[str]]] = {}
+        with self._lock:
+            for r in self._conn.execute(
+                "SELECT artist, code, state FROM job_items WHERE job_id = ? AND state IN ('scraped', 'placeholder') "
+                'ORDER BY artist, code', (job_id,)
+            ):
+                entry = artists.setdefault(r['artist'], {'scraped_codes': [], 'placeholder_codes': []})
+                entry['scraped_codes' if r['state'] == 'scraped' else 'placeholder_codes'].append(r['code'])
+        return {
+            'scraped': sum(len(a['scraped_codes']) for a in artists.values()),
+            'placeholder_added': sum(len(a['placeholder_codes']) for a in artists.values()),
+            'artists': artists
+        }
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Take the oldest queued job, or a running job whose worker stopped sending heartbeats"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND heartbeat < ?) "
+                'ORDER BY created_at LIMIT 1',
+                (now - STALE_AFTER,)
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?, started_at = COALESCE(started_at, ?) "
+                'WHERE id = ? AND status = ? AND COALESCE(heartbeat, 0) = COALESCE(?, 0)',
+                (self.worker_id, now, now, row['id'], row['status'], row['heartbeat'])
+            ).rowcount
+            if not claimed:
+                # Another process got there first
+                return None
+            if row['status'] == 'running':
+                print(f"Resuming scrape job {row['id']}")
+            return self._conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"Scrape job queue error: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            try:
+                self._run(job)
+            except Exception as e:
+                print(f"Scrape job {job['id']} failed: {e}")
+                self._finish(job['id'], 'failed', str(e))
+
+    def _heartbeat(self, job_id: str) -> bool:
+        """Refresh the heartbeat, returns False when the job was cancelled"""
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE jobs SET heartbeat = ? WHERE id = ?', (time.time(), job_id))
+            row = self._conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return not row['cancel_requested']
+
+    def _finish(self, job_id: str, status: str, error: Optional[str] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+                (status, error, time.time(), job_id)
+            )
+
+    def _plan(self, job: sqlite3.Row, updater) -> None:
+        """Record the (artist, code) pairs the job will work through"""
+        params = json.loads(job['params'])
+        artist_name = params.get('artist_name')
+        items: List[Tuple[str, str]] = []
+        if job['kind'] == SCRAPE_ARTIST and params.get('codes') is not None:
+            items = [(artist_name, code) for code in params['codes']]
+        else:
+            artists = [artist_name] if artist_name else updater.list_artists()
+            for name in artists:
+                items.extend((name, code) for code in updater.find_missing_titles(name))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO job_items (job_id, artist, code) VALUES (?, ?, ?)',
+                [(job['id'], artist, code) for artist, code in items]
+            )
+            self._conn.execute('UPDATE jobs SET planned = 1 WHERE id = ?', (job['id'],))
+
+    def _pending_items(self, job_id: str) -> List[Tuple[str, str]]:
+        with self._lock:
+            return [
+                (r['artist'], r['code'])
+                for r in self._conn.execute(
+                    "SELECT artist, code FROM job_items WHERE job_id = ? AND state = 'pending' ORDER BY artist, code",
+                    (job_id,)
+                )
+            ]
+
+    def _run(self, job: sqlite3.Row):
+        job_id = job['id']
+        params = json.loads(job['params'])
+        updater = self.updater_factory()
+        if not job['planned']:
+            self._plan(job, updater)
+
+        scrape = job['kind'] == SCRAPE_ARTIST or params.get('scrape_real_titles')
+        placeholder = params.get('placeholder') if job['kind'] == UPDATE_MISSING else None
+        scraper = JavMetadataScraper() if scrape else None
+
+        pending = self._pending_items(job_id)
+        # Group by artist so each chunk is a single title.json write
+        by_artist: Dict[str, List[str]] = {}
+        for artist, code in pending:
+            by_artist.setdefault(artist, []).append(code)
+
+        for artist, codes in by_artist.items():
+            for i in range(0, len(codes), CHUNK_SIZE):
+                if not self._heartbeat(job_id):
+                    self._finish(job_id, 'cancelled')
+                    return
+                self._run_chunk(job_id, updater, scraper, artist, codes[i:i + CHUNK_SIZE], placeholder)
+
+        self._finish(job_id, 'completed')
+
+    def _run_chunk(self, job_id: str, updater, scraper: Optional[JavMetadataScraper],
+                   artist: str, codes: List[str], placeholder: Optional[str]):
+        scraped = scraper.batch_scrape(codes) if scraper is not None else {}
+        updates = {}
+        states = {}
+        for code in codes:
+            metadata = scraped.get(code)
+            if metadata and metadata.get('title'):
+                updates[code] = metadata
+                states[code] = 'scraped'
+            elif placeholder:
+                updates[code] = {'title': placeholder, 'year': None, 'month': None, 'day': None, 'date': None}
+                states[code] = 'placeholder'
+            else:
+                states[code] = 'not_found'
+
+        # Written before the items are marked done, so a restart never skips unwritten titles
+        if updates and not updater.update_title_json(artist, updates, flush=True):
+            raise IOError(f'could not write title.json for {artist}')
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'UPDATE job_items SET state = ? WHERE job_id = ? AND artist = ? AND code = ?',
+                [(state, job_id, artist, code) for code, state in states.items()]
+            )
+
+    def _recover_orphans(self):
+        """Requeue running jobs whose process is gone (e.g. the server was restarted)"""
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT id, worker FROM jobs WHERE status = 'running'").fetchall()
+            for row in rows:
+                pid = int((row['worker'] or '0').split('-')[0])
+                if pid == os.getpid() or not _process_alive(pid):
+                    print(f"Resuming scrape job {row['id']} after restart")
+                    self._conn.execute("UPDATE jobs SET status = 'queued' WHERE id = ?", (row['id'],))
+
+    def _purge_finished(self):
+        cutoff = time.time() - KEEP_FINISHED
+        with self._lock, self._conn:
+            old = f'SELECT id FROM jobs WHERE status IN {FINISHED_STATUSES} AND finished_at < ?'
+            self._conn.execute(f'DELETE FROM job_items WHERE job_id IN ({old})', (cutoff,))
+            self._conn.execute(f'DELETE FROM jobs WHERE id IN ({old})', (cutoff,))
@@ -1,9 +1,24 @@
 const API_BASE = '/api';
 
+// Grid cards are ~250px wide - ask the server for a resized poster (2x for high-DPI screens)
+const POSTER_THUMBNAIL_PARAMS = 'w=480&format=webp';
+
+function thumbnailUrl(url) {
+    return url + (url.includes('?') ? '&' : '?') + POSTER_THUMBNAIL_PARAMS;
+}
+
+// Video search: results are fetched page by page, a short pause after typing
+const SEARCH_PAGE_SIZE = 40;
+const SEARCH_DEBOUNCE = 250;
+
 // State management
 let currentArtist = null;
 let allArtists = [];
 let allVideos = [];
+let searchQuery = '';
+let searchTimer = null;
+let searchNextOffset = null;
+let searchRequest = null;
 
 // DOM Elements
 const artistsSection = document.getElementById('artistsSection');
@@ -15,6 +30,9 @@ const audioPlayer = document.getElementById('audioPlayer');
 const playerInfo = document.getElementById('playerInfo');
 const loadingSpinner = document.getElementById('loadingSpinner');
 const closeModal = document.querySelector('.close-modal');
+const searchSection = document.getElementById('searchSection');
+const searchResultsGrid = document.getElementById('searchResultsGrid');
+const searchSentinel = document.getElementById('searchSentinel');
 
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
@@ -72,6 +90,113 @@ function setupEventListeners() {
             filtered.sort((a, b) => a.name.localeCompare(b.name));
             renderArtists(filtered);
         }
+        
+        // Titles and codes of every artist are searched on the server
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => startVideoSearch(e.target.value.trim()), SEARCH_DEBOUNCE);
+    });
+    
+    // Load more search results when the sentinel below them comes into view
+    if ('IntersectionObserver' in window) {
+        const observer = new IntersectionObserver((entries) => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadMoreSearchResults();
+            }
+        }, { rootMargin: '800px 0px' });
+        observer.observe(searchSentinel);
+    }
+}
+
+function startVideoSearch(query) {
+    searchQuery = query;
+    searchNextOffset = null;
+    searchResultsGrid.innerHTML = '';
+    if (query === '') {
+        searchSection.style.display = 'none';
+        return;
+    }
+    searchSection.style.display = 'block';
+    fetchSearchPage(query, 0);
+}
+
+function loadMoreSearchResults() {
+    if (searchQuery && searchNextOffset !== null && !searchRequest) {
+        fetchSearchPage(searchQuery, searchNextOffset);
+    }
+}
+
+function fetchSearchPage(query, offset) {
+    const url = `${API_BASE}/search?q=${encodeURIComponent(query)}&limit=${SEARCH_PAGE_SIZE}&offset=${offset}`;
+    const request = fetch(url)
+        .then(response => {
+            if (!response.ok) throw new Error('Search failed');
+            return response.json();
+        })
+        .then(data => {
+            // Ignore answers to a query the user has already changed
+            if (query !== searchQuery) return;
+            searchNextOffset = data.next_offset;
+            renderSearchResults(data.results);
+        })
+        .catch(error => {
+            console.error('Error searching videos:', error);
+        })
+        .finally(() => {
+            if (searchRequest === request) {
+                searchRequest = null;
+            }
+        });
+    searchRequest = request;
+}
+
+function renderSearchResults(results) {
+    results.forEach(video => {
+        const poster = video.poster || video.fanart;
+        const displayTitle = video.title || video.code;
+        
+        const card = document.createElement('div');
+        card.className = 'video-card';
+        card.setAttribute('data-artist', video.artist);
+        card.setAttribute('data-code', video.code);
+        
+        const placeholder = document.createElement('div');
+        placeholder.className = 'card-placeholder';
+        placeholder.textContent = '🎬';
+        placeholder.style.display = poster ? 'none' : 'flex';
+        
+        if (poster) {
+            const img = document.createElement('img');
+            img.className = 'video-poster';
+            img.src = thumbnailUrl(poster);
+            img.loading = 'lazy';
+            img.alt = displayTitle;
+            img.addEventListener('error', function() {
+                this.style.display = 'none';
+                placeholder.style.display = 'flex';
+            });
+            card.appendChild(img);
+        }
+        card.appendChild(placeholder);
+        
+        const cardInfo = document.createElement('div');
+        cardInfo.className = 'card-info';
+        
+        const h3 = document.createElement('h3');
+        h3.textContent = displayTitle;
+        cardInfo.appendChild(h3);
+        
+        const codeP = document.createElement('p');
+        codeP.className = 'video-code';
+        codeP.textContent = `${video.artist} · ${video.code}`;
+        cardInfo.appendChild(codeP);
+        
+        card.appendChild(cardInfo);
+        
+        card.addEventListener('click', () => {
+            window.location.href = `/player/${encodeURIComponent(video.artist)}/${encodeURIComponent(video.code)}`;
+        });
+        
+        searchResultsGrid.appendChild(card);
     });
 }
 
@@ -161,6 +286,29 @@ async function selectArtist(artistName) {
     window.location.href = artistUrl;
 }
 
+const JOB_POLL_INTERVAL = 2000;
+
+// Poll a scrape job until it finishes, returns the final job (null if it disappeared)
+async function waitForJob(jobId) {
+    let lastDone = -1;
+    while (true) {
+        const response = await fetch(`${API_BASE}/jobs/${encodeURIComponent(jobId)}`);
+        if (!response.ok) return null;
+        const job = await response.json();
+        if (['completed', 'failed', 'cancelled'].includes(job.status)) {
+            if (job.status !== 'completed') {
+                console.warn(`Title scrape job ${job.status}${job.error ? ': ' + job.error : ''}`);
+            }
+            return job;
+        }
+        if (job.progress.total !== null && job.progress.done !== lastDone) {
+            lastDone = job.progress.done;
+            console.log(`Scraping titles: ${job.progress.done}/${job.progress.total}`);
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+    }
+}
+
 async function autoUpdateMissingTitles(artistName, scrapeReal = false) {
     try {
         // Check for missing titles
@@ -190,14 +338,20 @@ async function autoUpdateMissingTitles(artistName, scrapeReal = false) {
             });
             
             if (updateResponse.ok) {
-                const updateData = await updateResponse.json();
+                let updateData = await updateResponse.json();
+                if (updateResponse.status === 202) {
+                    // Scraping runs as a background job - wait for it without holding a request open
+                    const job = await waitForJob(updateData.job_id);
+                    if (!job || job.status !== 'completed') return;
+                    updateData = job.result;
+                }
                 if (scrapeReal && updateData.scraped > 0) {
                     console.log(`Successfully scraped ${updateData.scraped} real titles (JavSP-style)`);
                     if (updateData.placeholder_added > 0) {
                         console.log(`Added ${updateData.placeholder_added} placeholders for failed scrapes`);
                     }
                 } else {
-                    console.log(`Auto-updated ${updateData.updated || updateData.total_updated} missing titles`);
+                    console.log(`Auto-updated ${updateData.updated || updateData.total_updated || updateData.placeholder_added} missing titles`);
                 }
                 
                 // Reload videos to show updated titles
@@ -236,7 +390,8 @@ function renderVideos(videos) {
         if (poster) {
             const img = document.createElement('img');
             img.className = 'video-poster';
-            img.src = poster;
+            img.src = thumbnailUrl(poster);
+            img.loading = 'lazy';
             img.alt = displayTitle;
             img.addEventListener('error', function() {
                 this.style.display = 'none';
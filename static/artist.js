@@ -1,14 +1,31 @@
 const API_BASE = '/api';
 
+// Grid cards are ~250px wide - ask the server for a resized poster (2x for high-DPI screens)
+const POSTER_THUMBNAIL_PARAMS = 'w=480&format=webp';
+
+function thumbnailUrl(url) {
+    return url + (url.includes('?') ? '&' : '?') + POSTER_THUMBNAIL_PARAMS;
+}
+
+// Videos are loaded page by page as the user scrolls
+const PAGE_SIZE = 60;
+const VIDEO_FIELDS = 'code,title,year,month,day,media,poster,fanart';
+
 // State management
 let currentArtist = null;
 let allVideos = [];
+let nextCursor = null;
+let allPagesLoaded = false;
+let pageRequest = null;
+let listGeneration = 0;  // bumped by reloadVideos - pages of an older list are dropped
+let searchQuery = '';
 
 // DOM Elements
 const videosGrid = document.getElementById('videosGrid');
 const searchInput = document.getElementById('searchInput');
 const artistNameHeader = document.getElementById('artistNameHeader');
 const loadingSpinner = document.getElementById('loadingSpinner');
+const videosSentinel = document.getElementById('videosSentinel');
 
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
@@ -34,19 +51,109 @@ function setupPWA() {
 
 function setupEventListeners() {
     // Search functionality
-    searchInput.addEventListener('input', (e) => {
-        const query = e.target.value.toLowerCase();
-        if (query === '') {
+    searchInput.addEventListener('input', async (e) => {
+        searchQuery = e.target.value.toLowerCase();
+        if (searchQuery === '') {
             renderVideos(allVideos);
         } else {
-            const filtered = allVideos.filter(video => {
-                const title = (video.title || video.code).toLowerCase();
-                const code = video.code.toLowerCase();
-                return title.includes(query) || code.includes(query);
-            });
-            renderVideos(filtered);
+            // Search needs the whole list, not just the pages loaded so far
+            await loadAllPages();
+            renderVideos(filterVideos(allVideos));
         }
     });
+    
+    // Infinite scroll: load the next page when the sentinel below the grid comes into view
+    if ('IntersectionObserver' in window) {
+        const observer = new IntersectionObserver((entries) => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadNextPage();
+            }
+        }, { rootMargin: '800px 0px' });
+        observer.observe(videosSentinel);
+    } else {
+        window.addEventListener('scroll', () => {
+            if (window.innerHeight + window.scrollY >= document.body.offsetHeight - 800) {
+                loadNextPage();
+            }
+        });
+    }
+}
+
+function filterVideos(videos) {
+    return videos.filter(video => {
+        const title = (video.title || video.code).toLowerCase();
+        const code = video.code.toLowerCase();
+        return title.includes(searchQuery) || code.includes(searchQuery);
+    });
+}
+
+async function fetchVideosPage(artistName, cursor) {
+    let url = `${API_BASE}/artists/${encodeURIComponent(artistName)}/videos?limit=${PAGE_SIZE}&fields=${VIDEO_FIELDS}`;
+    if (cursor) {
+        url += `&cursor=${encodeURIComponent(cursor)}`;
+    }
+    const response = await fetch(url);
+    if (!response.ok) throw new Error('Failed to load videos');
+    return response.json();
+}
+
+function loadNextPage() {
+    if (!currentArtist || allPagesLoaded) {
+        return Promise.resolve();
+    }
+    // Only one page request in flight at a time
+    if (!pageRequest) {
+        pageRequest = requestPage(listGeneration).catch(error => {
+            console.error('Error loading videos page:', error);
+        });
+    }
+    return pageRequest;
+}
+
+// Fetch the page after nextCursor and append it, unless the list was reloaded meanwhile
+function requestPage(generation) {
+    return fetchVideosPage(currentArtist, nextCursor)
+        .then(data => {
+            if (generation !== listGeneration) {
+                return;
+            }
+            allVideos = allVideos.concat(data.videos);
+            nextCursor = data.next_cursor;
+            allPagesLoaded = !nextCursor;
+            
+            const visible = searchQuery ? filterVideos(data.videos) : data.videos;
+            appendVideos(visible);
+        })
+        .finally(() => {
+            if (generation === listGeneration) {
+                pageRequest = null;
+            }
+        });
+}
+
+async function loadAllPages() {
+    while (currentArtist && !allPagesLoaded) {
+        const before = allVideos.length;
+        await loadNextPage();
+        if (allVideos.length === before && !allPagesLoaded) {
+            break;  // request failed - don't spin
+        }
+    }
+}
+
+async function reloadVideos() {
+    // Start over - a page of the old list still in flight is dropped when it arrives
+    listGeneration++;
+    allVideos = [];
+    nextCursor = null;
+    allPagesLoaded = false;
+    videosGrid.innerHTML = '';
+    
+    // The first page takes the pageRequest slot, so the scroll observer waits for it
+    // instead of fetching page 1 again
+    const request = requestPage(listGeneration);
+    pageRequest = request.catch(() => {});
+    await request;
 }
 
 async function loadArtistVideos() {
@@ -62,16 +169,13 @@ async function loadArtistVideos() {
             
             showLoading();
             
-            const response = await fetch(`${API_BASE}/artists/${encodeURIComponent(artistName)}/videos`);
-            if (!response.ok) throw new Error('Failed to load videos');
-            
-            allVideos = await response.json();
-            renderVideos(allVideos);
-            
-            // Auto-check for missing titles and update
-            await autoUpdateMissingTitles(artistName, true); // true = scrape real titles!
+            await reloadVideos();
             
             hideLoading();
+            
+            // Auto-check for missing titles and update - runs as a background job,
+            // the grid is reloaded once it finishes
+            autoUpdateMissingTitles(artistName, true); // true = scrape real titles!
         } else {
             artistNameHeader.textContent = 'Invalid URL';
         }
@@ -83,6 +187,29 @@ async function loadArtistVideos() {
     }
 }
 
+const JOB_POLL_INTERVAL = 2000;
+
+// Poll a scrape job until it finishes, returns the final job (null if it disappeared)
+async function waitForJob(jobId) {
+    let lastDone = -1;
+    while (true) {
+        const response = await fetch(`${API_BASE}/jobs/${encodeURIComponent(jobId)}`);
+        if (!response.ok) return null;
+        const job = await response.json();
+        if (['completed', 'failed', 'cancelled'].includes(job.status)) {
+            if (job.status !== 'completed') {
+                console.warn(`Title scrape job ${job.status}${job.error ? ': ' + job.error : ''}`);
+            }
+            return job;
+        }
+        if (job.progress.total !== null && job.progress.done !== lastDone) {
+            lastDone = job.progress.done;
+            console.log(`Scraping titles: ${job.progress.done}/${job.progress.total}`);
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+    }
+}
+
 async function autoUpdateMissingTitles(artistName, scrapeReal = false) {
     try {
         // Check for missing titles
@@ -112,22 +239,24 @@ async function autoUpdateMissingTitles(artistName, scrapeReal = false) {
             });
             
             if (updateResponse.ok) {
-                const updateData = await updateResponse.json();
+                let updateData = await updateResponse.json();
+                if (updateResponse.status === 202) {
+                    // Scraping runs as a background job - wait for it without holding a request open
+                    const job = await waitForJob(updateData.job_id);
+                    if (!job || job.status !== 'completed') return;
+                    updateData = job.result;
+                }
                 if (scrapeReal && updateData.scraped > 0) {
                     console.log(`Successfully scraped ${updateData.scraped} real titles (JavSP-style)`);
                     if (updateData.placeholder_added > 0) {
                         console.log(`Added ${updateData.placeholder_added} placeholders for failed scrapes`);
                     }
                 } else {
-                    console.log(`Auto-updated ${updateData.updated || updateData.total_updated} missing titles`);
+                    console.log(`Auto-updated ${updateData.updated || updateData.total_updated || updateData.placeholder_added} missing titles`);
                 }
                 
                 // Reload videos to show updated titles
-                const videosResponse = await fetch(`${API_BASE}/artists/${encodeURIComponent(artistName)}/videos`);
-                if (videosResponse.ok) {
-                    allVideos = await videosResponse.json();
-                    renderVideos(allVideos);
-                }
+                await reloadVideos();
             }
         }
     } catch (error) {
@@ -139,7 +268,10 @@ async function autoUpdateMissingTitles(artistName, scrapeReal = false) {
 function renderVideos(videos) {
     // Clear grid
     videosGrid.innerHTML = '';
-    
+    appendVideos(videos);
+}
+
+function appendVideos(videos) {
     videos.forEach(video => {
         const primaryMedia = video.media[0];
         const poster = video.poster || video.fanart;
@@ -158,7 +290,8 @@ function renderVideos(videos) {
         if (poster) {
             const img = document.createElement('img');
             img.className = 'video-poster';
-            img.src = poster;
+            img.src = thumbnailUrl(poster);
+            img.loading = 'lazy';
             img.alt = displayTitle;
             img.addEventListener('error', function() {
                 this.style.display = 'none';
@@ -29,6 +29,10 @@ const PIXELS_PER_MINUTE = 300;
 const PIXELS_PER_VOLUME = 400; // Pixels needed to change volume from 0 to 100%
 const SEEK_UPDATE_INTERVAL = 100;
 
+// hls.js is only loaded for remuxed (HLS) media on browsers without native HLS
+const HLS_JS_URL = 'https://cdn.jsdelivr.net/npm/hls.js@1/dist/hls.min.js';
+let hlsJsPromise = null;
+
 // Keep reference to current preview element
 let currentPreviewElement = null;
 let previewUpdateTimeout = null;
@@ -74,20 +78,21 @@ function loadPlayerData() {
                 return;
             }
             
-            // Load video data
-            const apiUrl = `${API_BASE}/artists/${encodeURIComponent(artistName)}/videos`;
+            // Load only this video's data
+            const apiUrl = `${API_BASE}/artists/${encodeURIComponent(artistName)}/videos/${encodeURIComponent(videoCode)}`;
             console.log('Fetching:', apiUrl);
             
             fetch(apiUrl)
                 .then(response => {
+                    if (response.status === 404) {
+                        return null;
+                    }
                     if (!response.ok) {
                         throw new Error(`HTTP error! status: ${response.status}`);
                     }
                     return response.json();
                 })
-                .then(videos => {
-                    console.log('Videos loaded:', videos.length);
-                    const video = videos.find(v => v.code === videoCode);
+                .then(video => {
                     if (video) {
                         console.log('Video found:', video);
                         // Find primary media file
@@ -110,8 +115,13 @@ function loadPlayerData() {
                             if (primaryMedia.type === 'video') {
                                 videoPlayerPage.style.display = 'block';
                                 audioPlayerPage.style.display = 'none';
-                                videoPlayerPage.src = streamUrl;
-                                videoPlayerPage.load();
+                                if (primaryMedia.hls) {
+                                    console.log('HLS URL:', primaryMedia.hls);
+                                    playHls(videoPlayerPage, primaryMedia.hls, streamUrl);
+                                } else {
+                                    videoPlayerPage.src = streamUrl;
+                                    videoPlayerPage.load();
+                                }
                                 
                                 videoPlayerPage.addEventListener('error', (e) => {
                                     console.error('Video load error:', e);
@@ -133,8 +143,7 @@ function loadPlayerData() {
                             playerInfoHeader.textContent = 'No media file found';
                         }
                     } else {
-                        console.error('Video not found in list. Looking for:', videoCode);
-                        console.log('Available videos:', videos.map(v => v.code));
+                        console.error('Video not found:', videoCode);
                         playerInfoHeader.textContent = 'Video not found';
                     }
                 })
@@ -154,6 +163,55 @@ function loadPlayerData() {
     }
 }
 
+function loadHlsJs() {
+    if (!hlsJsPromise) {
+        hlsJsPromise = new Promise((resolve, reject) => {
+            const script = document.createElement('script');
+            script.src = HLS_JS_URL;
+            script.onload = () => window.Hls ? resolve(window.Hls) : reject(new Error('hls.js not loaded'));
+            script.onerror = () => reject(new Error('hls.js not loaded'));
+            document.head.appendChild(script);
+        });
+    }
+    return hlsJsPromise;
+}
+
+function playHls(player, playlistUrl, fallbackUrl) {
+    // Safari (and iOS) play HLS natively
+    if (player.canPlayType('application/vnd.apple.mpegurl')) {
+        player.src = playlistUrl;
+        player.load();
+        return;
+    }
+    
+    const playDirect = () => {
+        player.src = fallbackUrl;
+        player.load();
+    };
+    
+    loadHlsJs()
+        .then(Hls => {
+            if (!Hls.isSupported()) {
+                playDirect();
+                return;
+            }
+            const hls = new Hls();
+            hls.on(Hls.Events.ERROR, (event, data) => {
+                if (data.fatal) {
+                    console.error('HLS error:', data);
+                    hls.destroy();
+                    playDirect();
+                }
+            });
+            hls.loadSource(playlistUrl);
+            hls.attachMedia(player);
+        })
+        .catch(error => {
+            console.error('Error loading hls.js:', error);
+            playDirect();
+        });
+}
+
 function setupSwipeGestures() {
     const playerContainer = document.querySelector('.player-wrapper');
     
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Thumbnail Prewarm - Renders poster thumbnails for new or changed video folders
+in the background, so the first visitor of an artist page doesn't pay the resize
+cost. Resizing is CPU-bound, so it runs on a process pool; pending work is picked
+from the most viewed artist first.
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+from thumbnails import ThumbnailService, OUTPUT_FORMATS, PILLOW_AVAILABLE, render_thumbnail
+
+# Completions older than this are dropped from the throughput figure
+THROUGHPUT_WINDOW = 60.0
+# Seconds between saves of the view counters
+POPULARITY_SAVE_INTERVAL = 60.0
+
+# (source_path, width, height, format, cache key) - the key is taken from the stat at
+# scheduling time, so a render is never stored under a newer version of the file
+Job = Tuple[str, Optional[int], Optional[int], str, str]
+
+
+def _pool_context():
+    """
+    forkserver (spawn where it's missing) - the pool is started from a process whose other
+    threads may hold locks, which a plain fork would copy into the children still held
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Import Pillow once in the server instead of in every worker
+        context.set_forkserver_preload(['thumbnails'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class ThumbnailPrewarmer:
+    """
+    variants: list of (width, height, format) to render for every poster
+    workers: size of the process pool (0 disables prewarming)
+    """
+
+    def __init__(self, thumbnails: ThumbnailService, variants: List[Tuple[Optional[int], Optional[int], str]],
+                 workers: int = 2, popularity_file: Optional[str] = None):
+        self.thumbnails = thumbnails
+        self.variants = variants
+        self.workers = workers
+        self.popularity_file = Path(popularity_file) if popularity_file else None
+
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+
+        self._cond = threading.Condition()
+        # artist -> pending jobs
+        self._pending: Dict[str, Deque[Job]] = {}
+        # Cache keys of pending and in-flight jobs
+        self._queued = set()
+        self._in_flight = 0
+        self._finished_at: Deque[float] = deque()
+        self._popularity: Dict[str, int] = self._load_popularity()
+        self._popularity_dirty = False
+        self._popularity_saved = time.time()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0 and PILLOW_AVAILABLE
+
+    # ------------------------------------------------------------------
+    # Popularity
+    # ------------------------------------------------------------------
+
+    def _load_popularity(self) -> Dict[str, int]:
+        if self.popularity_file is None or not self.popularity_file.exists():
+            return {}
+        try:
+            with open(self.popularity_file, 'r', encoding='utf-8') as f:
+                return {str(k): int(v) for k, v in json.load(f).items()}
+        except (json.JSONDecodeError, IOError, ValueError, AttributeError):
+            return {}
+
+    def _save_popularity(self):
+        with self._cond:
+            if not self._popularity_dirty or self.popularity_file is None:
+                return
+            snapshot = dict(self._popularity)
+            self._popularity_dirty = False
+            self._popularity_saved = time.time()
+        try:
+            self.popularity_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.popularity_file.with_name(self.popularity_file.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.popularity_file)
+        except IOError as e:
+            print(f"Error saving artist popularity: {e}")
+
+    def record_view(self, artist_name: str):
+        """Count a page view - the most viewed artists are prewarmed first"""
+        with self._cond:
+            self._popularity[artist_name] = self._popularity.get(artist_name, 0) + 1
+            self._popularity_dirty = True
+            save = time.time() - self._popularity_saved >= POPULARITY_SAVE_INTERVAL
+        if save:
+            self._save_popularity()
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+
+    def schedule(self, artist_name: str, source_path: str):
+        """Queue every variant of one poster (no-op for variants already cached)"""
+        if not self.enabled:
+            return
+
+        try:
+            st = os.stat(source_path)
+        except OSError:
+            return
+
+        with self._cond:
+            for width, height, fmt in self.variants:
+                key = self.thumbnails.cache_key(source_path, st, width, height, fmt)
+                if key in self._queued:
+                    continue
+                if self.thumbnails.cache.contains(key, OUTPUT_FORMATS[fmt][2]):
+                    self.skipped += 1
+                    continue
+                self._queued.add(key)
+                self._pending.setdefault(artist_name, deque()).append((source_path, width, height, fmt, key))
+            self._cond.notify()
+
+        self._ensure_started()
+
+    def on_folder_indexed(self, artist_name: str, code: str, folder: Dict[str, any]):
+        """LibraryCatalog folder listener - prewarm the poster of a new or changed folder"""
+        if folder['has_poster']:
+            poster = 'poster.jpg'
+        elif folder['fallback_image']:
+            poster = folder['fallback_image']
+        else:
+            return
+        source_path = os.path.join(folder['path'], poster)
+        self.schedule(artist_name, source_path)
+
+    def _ensure_started(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+            self._thread = threading.Thread(target=self._dispatch, name='thumbnail-prewarm', daemon=True)
+            self._thread.start()
+
+    def _next_job(self) -> Optional[Job]:
+        """Pop a job from the most popular artist with pending work (caller holds the lock)"""
+        if not self._pending:
+            return None
+        artist_name = max(self._pending, key=lambda name: self._popularity.get(name, 0))
+        queue = self._pending[artist_name]
+        job = queue.popleft()
+        if not queue:
+            del self._pending[artist_name]
+        return job
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                # Keep at most two jobs per worker in the pool so priorities stay fresh
+                while not self._pending or self._in_flight >= self.workers * 2:
+                    self._cond.wait()
+                job = self._next_job()
+                self._in_flight += 1
+
+            try:
+                future = self._pool.submit(render_thumbnail, *job[:4])
+            except RuntimeError:
+                # Pool shut down (interpreter exiting)
+                return
+            future.add_done_callback(lambda f, job=job: self._on_done(job, f))
+
+    def _on_done(self, job: Job, future):
+        source_path, width, height, fmt, key = job
+        try:
+            data = future.result()
+            self.thumbnails.cache.put(key, data, OUTPUT_FORMATS[fmt][2])
+            succeeded = True
+        except Exception as e:
+            print(f"Error prewarming thumbnail for {source_path}: {e}")
+            succeeded = False
+
+        with self._cond:
+            self._in_flight -= 1
+            self._queued.discard(key)
+            if succeeded:
+                self.completed += 1
+                self._finished_at.append(time.time())
+            else:
+                self.failed += 1
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, any]:
+        with self._cond:
+            now = time.time()
+            while self._finished_at and now - self._finished_at[0] > THROUGHPUT_WINDOW:
+                self._finished_at.popleft()
+            return {
+                'enabled': self.enabled,
+                'workers': self.workers,
+                'queue_depth': sum(len(q) for q in self._pending.values()),
+                'in_flight': self._in_flight,
+                'completed': self.completed,
+                'failed': self.failed,
+                'skipped_cached': self.skipped,
+                'throughput_per_min': len(self._finished_at) * 60.0 / THROUGHPUT_WINDOW
+            }
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Thumbnails - Resized poster/fanart variants generated with Pillow
+Variants are stored in a DerivativeCache, so each size is only rendered once
+per source file version.
+"""
+import io
+import os
+from typing import Optional, Tuple
+
+from derivative_cache import DerivativeCache
+
+try:
+    from PIL import Image, ImageOps
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+    print("Warning: Pillow not installed. Image resizing is disabled.")
+
+MAX_DIMENSION = 2048
+
+# format -> (Pillow format name, mimetype, file suffix)
+OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg'),
+    'webp': ('WEBP', 'image/webp', '.webp'),
+    'png': ('PNG', 'image/png', '.png'),
+}
+
+
+def default_format(source_path: str) -> str:
+    """Keep PNG sources as PNG (transparency), everything else becomes JPEG"""
+    return 'png' if source_path.lower().endswith('.png') else 'jpeg'
+
+
+def render_thumbnail(source_path: str, width: Optional[int], height: Optional[int], fmt: str) -> bytes:
+    """
+    Resize an image to fit within width x height, keeping the aspect ratio
+    Images are never upscaled. Module-level so it can run in a worker process.
+    """
+    pil_format = OUTPUT_FORMATS[fmt][0]
+    with Image.open(source_path) as img:
+        # Respect camera rotation before resizing
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((width or MAX_DIMENSION, height or MAX_DIMENSION), Image.LANCZOS)
+
+        if pil_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        elif pil_format in ('WEBP', 'PNG') and img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+
+        out = io.BytesIO()
+        if pil_format == 'JPEG':
+            img.save(out, 'JPEG', quality=82, optimize=True, progressive=True)
+        elif pil_format == 'WEBP':
+            img.save(out, 'WEBP', quality=80, method=4)
+        else:
+            img.save(out, 'PNG', optimize=True)
+        return out.getvalue()
+
+
+class ThumbnailService:
+    def __init__(self, cache: DerivativeCache):
+        self.cache = cache
+
+    def cache_key(self, source_path: str, st: os.stat_result,
+                  width: Optional[int], height: Optional[int], fmt: str) -> str:
+        return DerivativeCache.make_key(source_path, st, 'thumb', width or 0, height or 0, fmt)
+
+    def get_variant(self, source_path: str, width: Optional[int], height: Optional[int],
+                    fmt: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """
+        Returns (path of the resized file, mimetype), rendering it on a cache miss
+        Returns None if Pillow is unavailable or the source can't be decoded
+        """
+        if not PILLOW_AVAILABLE:
+            return None
+
+        fmt = fmt or default_format(source_path)
+        _, mimetype, suffix = OUTPUT_FORMATS[fmt]
+        try:
+            st = os.stat(source_path)
+        except OSError:
+            return None
+
+        key = self.cache_key(source_path, st, width, height, fmt)
+        cached = self.cache.get(key, suffix)
+        if cached is not None:
+            return str(cached), mimetype
+
+        try:
+            data = render_thumbnail(source_path, width, height, fmt)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            print(f"Error resizing {source_path}: {e}")
+            return None
+
+        return str(self.cache.put(key, data, suffix)), mimetype
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Title Index - Compiled, memory-mapped sidecar of a large title.json
+title.json stays the editable source of truth; the sidecar (in the state dir) is a
+sorted table of codes pointing at compact JSON records, stamped with the mtime and
+size of the title.json it was compiled from and rebuilt when they no longer match.
+Looking up one code is a binary search over the mapped file - nothing else is parsed.
+
+Layout (little endian):
+    header   MAGIC, source mtime_ns (int64), source size (int64), entry count (uint32)
+    table    count x (record offset, record length) (uint32 each), sorted by code
+    records  code (UTF-8) + NUL + normalized entry as compact JSON
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+MAGIC = b'TIDX\x00\x00\x00\x01'
+HEADER = struct.Struct('<8sqqI')
+SLOT = struct.Struct('<II')
+
+# Mapped index files kept open
+MAX_OPEN_INDEXES = 64
+
+
+class _IndexFile:
+    """Read-only view of one compiled index"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.mtime_ns, self.size, self.count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or len(self.mm) < HEADER.size + self.count * SLOT.size:
+            raise ValueError(f'{path} is not a title index')
+
+    def _record(self, i: int) -> Tuple[int, int, int]:
+        """(record start, end of the code, record end) of entry i"""
+        offset, length = SLOT.unpack_from(self.mm, HEADER.size + i * SLOT.size)
+        return offset, self.mm.find(b'\x00', offset, offset + length), offset + length
+
+    def code(self, i: int) -> bytes:
+        start, code_end, _ = self._record(i)
+        return self.mm[start:code_end]
+
+    def find(self, code: str) -> Optional[Dict[str, any]]:
+        key = code.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.code(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.count:
+            return None
+        start, code_end, end = self._record(lo)
+        if self.mm[start:code_end] != key:
+            return None
+        return json.loads(self.mm[code_end + 1:end])
+
+    def codes(self) -> Iterator[str]:
+        for i in range(self.count):
+            yield self.code(i).decode('utf-8')
+
+
+class TitleIndex:
+    """
+    Sidecar indexes of title.json files, stored under root
+
+    min_bytes: only files at least this large get an index - small ones are cheaper
+               to parse whole (see TitleMappingCache)
+    """
+
+    def __init__(self, root: Optional[str] = None, min_bytes: int = 256 * 1024):
+        self.root = Path(root) if root else None
+        self.min_bytes = min_bytes
+        self.compiled = 0
+        self.lookups = 0
+
+        self._lock = threading.Lock()
+        # index path -> _IndexFile, least recently used first
+        self._open: 'OrderedDict[str, _IndexFile]' = OrderedDict()
+
+    def configure(self, root: Optional[str] = None, min_bytes: Optional[int] = None):
+        with self._lock:
+            if root is not None:
+                self.root = Path(root)
+                self._open.clear()
+            if min_bytes is not None:
+                self.min_bytes = min_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.root is not None
+
+    def wants(self, st: os.stat_result) -> bool:
+        """Whether a title.json with this stat should be looked up through an index"""
+        return self.enabled and st.st_size >= self.min_bytes
+
+    def _index_path(self, title_file: str) -> Path:
+        digest = hashlib.sha1(os.path.abspath(title_file).encode('utf-8')).hexdigest()[:20]
+        return self.root / f'{digest}.tidx'
+
+    def compile(self, title_file: str, st: os.stat_result, mapping: Mapping[str, Dict[str, any]]) -> bool:
+        """Write the index of title_file (mapping is its parsed content as of st)"""
+        if not self.enabled:
+            return False
+        codes = sorted(mapping, key=lambda c: c.encode('utf-8'))
+        records: List[bytes] = [
+            code.encode('utf-8') + b'\x00' +
+            json.dumps(mapping[code], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            for code in codes
+        ]
+        table = bytearray()
+        offset = HEADER.size + len(records) * SLOT.size
+        for record in records:
+            table += SLOT.pack(offset, len(record))
+            offset += len(record)
+
+        path = self._index_path(title_file)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, st.st_mtime_ns, st.st_size, len(records)))
+                f.write(table)
+                f.writelines(records)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing title index for {title_file}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        with self._lock:
+            # Readers still holding the old mapping keep it until they drop it
+            self._open.pop(str(path), None)
+            self.compiled += 1
+        return True
+
+    def _get(self, title_file: str, st: os.stat_result) -> Optional[_IndexFile]:
+        """The index of title_file if one matches st"""
+        path = str(self._index_path(title_file))
+        with self._lock:
+            index = self._open.get(path)
+            if index is not None:
+                self._open.move_to_end(path)
+        if index is None:
+            try:
+                index = _IndexFile(path)
+            except (OSError, ValueError, struct.error):
+                return None
+            with self._lock:
+                self._open[path] = index
+                while len(self._open) > MAX_OPEN_INDEXES:
+                    self._open.popitem(last=False)
+        if (index.mtime_ns, index.size) != (st.st_mtime_ns, st.st_size):
+            return None
+        return index
+
+    def lookup(self, title_file: str, st: os.stat_result, code: str) -> Tuple[bool, Optional[Dict[str, any]]]:
+        """(index is current, entry of code or None) - compile it first when not current"""
+        index = self._get(title_file, st)
+        if index is None:
+            return False, None
+        with self._lock:
+            self.lookups += 1
+        return True, index.find(code)
+
+    def codes(self, title_file: str, st: os.stat_result) -> Optional[List[str]]:
+        """All codes of title_file (only the table and keys are read), None if the index isn't current"""
+        index = self._get(title_file, st)
+        return list(index.codes()) if index is not None else None
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'open': len(self._open),
+                'compiled': self.compiled,
+                'lookups': self.lookups,
+                'min_bytes': self.min_bytes
+            }
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Title Metadata - Shared title.json loading, normalization and writing
+Parsed mappings are kept in a process-wide LRU cache keyed by path and validated
+against the file's mtime and size, so title.json is only re-read when it changes.
+Updates go through a write-behind writer: they are coalesced per file in memory and
+written in one atomic replace, while reads already see them.
+Large files also get a compiled sidecar index (title_index.py), so looking up one
+code or listing the titled codes doesn't parse the whole file.
+"""
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional, Set, Tuple
+
+from title_index import TitleIndex
+
+try:
+    import fcntl
+except ImportError:
+    # Windows - writes are only serialized within this process
+    fcntl = None
+
+
+def normalize_entry(code: str, value: any) -> Dict[str, any]:
+    """
+    Convert one title.json entry to the new format:
+    {'title': str, 'year': int, 'month': int, 'day': int, 'date': dict}
+    Supports both old format (code -> title string) and new format (code -> dict)
+    """
+    if isinstance(value, str):
+        # Old format: just title string
+        return {'title': value, 'year': None, 'month': None, 'day': None, 'date': None}
+    if isinstance(value, dict):
+        # New format: dict with title and date info
+        date_info = value.get('date', {})
+        return {
+            'title': value.get('title', code),
+            'year': value.get('year') or (date_info.get('year') if date_info else None),
+            'month': value.get('month') or (date_info.get('month') if date_info else None),
+            'day': value.get('day') or (date_info.get('day') if date_info else None),
+            'date': value.get('date') or date_info
+        }
+    return {'title': str(value), 'year': None, 'month': None, 'day': None, 'date': None}
+
+
+def parse_title_file(title_file: Path, artist_name: str) -> Dict[str, Dict[str, any]]:
+    """Read and normalize a title.json file (uncached)"""
+    with open(title_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    raw_mapping = data[artist_name] if artist_name in data else data
+    return {code: normalize_entry(code, value) for code, value in raw_mapping.items()}
+
+
+class TitleMappingCache:
+    """
+    LRU cache of parsed title.json mappings
+    Entries are keyed by path and only reused while (mtime, size) match the file.
+    Bounded by entry count and by bytes (the size of the source files).
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # path -> ((mtime_ns, size), mapping)
+        self._entries: 'OrderedDict[str, Tuple[Tuple[int, int], Mapping]]' = OrderedDict()
+        self._bytes = 0
+
+    def configure(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._evict()
+
+    def load(self, title_file: Path, artist_name: str) -> Mapping[str, Dict[str, any]]:
+        """
+        Returns the normalized mapping code -> metadata (read-only, shared between callers)
+        Returns an empty mapping if the file is missing or invalid
+        """
+        key = str(title_file)
+        try:
+            st = os.stat(key)
+        except OSError:
+            self.invalidate(title_file)
+            return MappingProxyType({})
+        signature = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        try:
+            mapping = MappingProxyType(parse_title_file(title_file, artist_name))
+        except (json.JSONDecodeError, KeyError, IOError, AttributeError) as e:
+            print(f"Error loading title.json for {artist_name}: {e}")
+            return MappingProxyType({})
+        if title_index.wants(st):
+            title_index.compile(key, st, mapping)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[0][1]
+            self._entries[key] = (signature, mapping)
+            self._bytes += signature[1]
+            self._evict()
+        return mapping
+
+    def invalidate(self, title_file: Path):
+        """Forget a file (called after writing it - mtime granularity can hide quick rewrites)"""
+        with self._lock:
+            old = self._entries.pop(str(title_file), None)
+            if old is not None:
+                self._bytes -= old[0][1]
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (signature, _) = self._entries.popitem(last=False)
+            self._bytes -= signature[1]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes
+            }
+
+
+class TitleWriter:
+    """
+    Write-behind title.json updates
+
+    update() merges entries into a per-file pending batch; a batch is written once no
+    update arrived for flush_interval seconds (at the latest max_delay seconds after its
+    first update), or right away once it holds batch_size entries. A write re-reads the
+    file, merges the batch and replaces the file atomically (tmp file + os.replace)
+    under a per-file lock - a thread lock plus an flock on a lock file in lock_dir (keyed
+    by a hash of the path, so nothing extra lands on the media share), which other
+    processes (gunicorn workers, the CLI) take too - so concurrent writers never lose
+    each other's entries. The tmp file is a dot-file next to title.json; ones left behind
+    by a crashed writer are removed by the next write holding the lock.
+    Until start() is called (scripts, the CLI) every update is written immediately.
+    close() writes everything still pending - registered with atexit by start().
+    """
+
+    def __init__(self, flush_interval: float = 2.0, max_delay: float = 10.0, batch_size: int = 100,
+                 lock_dir: Optional[str] = None):
+        self.flush_interval = flush_interval
+        self.max_delay = max_delay
+        self.batch_size = batch_size
+        self.lock_dir = Path(lock_dir) if lock_dir else Path(tempfile.gettempdir()) / 'title_locks'
+        self.flushes = 0
+        self.failed = 0
+
+        self._cond = threading.Condition()
+        # title file -> {'artist', 'entries', 'first', 'last'}
+        self._pending: Dict[str, Dict[str, any]] = {}
+        self._file_locks: Dict[str, threading.Lock] = {}
+        # Files whose folder was already checked for tmp files of crashed writers
+        self._swept: Set[str] = set()
+        self._listeners: List[Callable[[str], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def configure(self, flush_interval: Optional[float] = None, max_delay: Optional[float] = None,
+                  batch_size: Optional[int] = None, lock_dir: Optional[str] = None):
+        """lock_dir: shared by every process writing the same files (the state dir)"""
+        with self._cond:
+            if lock_dir is not None:
+                self.lock_dir = Path(lock_dir)
+            if flush_interval is not None:
+                self.flush_interval = flush_interval
+            if max_delay is not None:
+                self.max_delay = max_delay
+            if batch_size is not None:
+                self.batch_size = batch_size
+            self._cond.notify_all()
+
+    def add_listener(self, callback: Callable[[str], None]):
+        """Register a callback fired with the artist name after its title.json was written"""
+        self._listeners.append(callback)
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name='title-writer', daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def close(self):
+        """Stop the background thread and write everything pending"""
+        with self._cond:
+            self._closed = True
+            thread, self._thread = self._thread, None
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout=5)
+        self.flush()
+
+    def update(self, title_file: Path, artist_name: str, updates: Dict[str, any], flush: bool = False) -> bool:
+        """
+        Queue entries (code -> title string or metadata dict) for artist_name's title.json
+        flush: write them before returning
+        Returns False only if a write was attempted and failed
+        """
+        key = str(title_file)
+        entries = {code: normalize_entry(code, value) for code, value in updates.items()}
+        with self._cond:
+            batch = self._pending.get(key)
+            now = time.monotonic()
+            if batch is None:
+                batch = self._pending[key] = {'artist': artist_name, 'entries': {}, 'first': now, 'last': now}
+            batch['entries'].update(entries)
+            batch['last'] = now
+            background = self._thread is not None and not flush
+            if background:
+                self._cond.notify_all()
+        return True if background else self.flush(key)
+
+    def pending(self, title_file: Path) -> Dict[str, Dict[str, any]]:
+        """Entries queued for title_file that aren't written yet"""
+        with self._cond:
+            batch = self._pending.get(str(title_file))
+            return dict(batch['entries']) if batch is not None else {}
+
+    def _due(self, now: float) -> Tuple[List[str], Optional[float]]:
+        """(files to write now, seconds until the next one is due)"""
+        due, wait = [], None
+        for key, batch in self._pending.items():
+            deadline = min(batch['last'] + self.flush_interval, batch['first'] + self.max_delay)
+            if self._closed or len(batch['entries']) >= self.batch_size or deadline <= now:
+                due.append(key)
+            else:
+                wait = deadline - now if wait is None else min(wait, deadline - now)
+        return due, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                due, wait = self._due(time.monotonic())
+                if not due:
+                    self._cond.wait(wait)
+                    continue
+            for key in due:
+                self.flush(key)
+
+    def _file_lock(self, key: str) -> threading.Lock:
+        with self._cond:
+            return self._file_locks.setdefault(key, threading.Lock())
+
+    def flush(self, title_file: Optional[str] = None) -> bool:
+        """Write the pending entries of one file (all files when None) - False if a write failed"""
+        with self._cond:
+            keys = [str(title_file)] if title_file is not None else list(self._pending)
+        ok = True
+        for key in keys:
+            with self._file_lock(key):
+                with self._cond:
+                    batch = self._pending.pop(key, None)
+                if batch is None:
+                    continue
+                if self._write(key, batch['artist'], batch['entries']):
+                    for callback in self._listeners:
+                        try:
+                            callback(batch['artist'])
+                        except Exception as e:
+                            print(f"Title writer listener failed for {batch['artist']}: {e}")
+                    continue
+                ok = False
+                with self._cond:
+                    # Keep the entries for the next attempt, behind anything newer
+                    retry = self._pending.setdefault(key, {**batch, 'entries': {}})
+                    retry['entries'] = {**batch['entries'], **retry['entries']}
+                    retry['last'] = time.monotonic()
+        return ok
+
+    @contextmanager
+    def _process_lock(self, key: str):
+        """Exclusive flock on the file's lock in lock_dir, held across read, merge and replace"""
+        if fcntl is None:
+            yield
+            return
+        digest = hashlib.sha1(os.path.abspath(key).encode('utf-8')).hexdigest()[:20]
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_dir / f'{digest}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                if key not in self._swept:
+                    self._sweep_tmp_files(key)
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _sweep_tmp_files(self, key: str):
+        """Remove tmp files of key - with the lock held, any of them is left over from a crashed writer"""
+        folder, name = os.path.split(key)
+        prefix = f'.{name}.'
+        try:
+            with os.scandir(folder or '.') as entries:
+                for entry in entries:
+                    if entry.name.startswith(prefix) and entry.name.endswith('.tmp'):
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+        except OSError:
+            return
+        self._swept.add(key)
+
+    def _write(self, key: str, artist_name: str, entries: Dict[str, Dict[str, any]]) -> bool:
+        try:
+            with self._process_lock(key):
+                return self._merge_and_replace(key, artist_name, entries)
+        except OSError as e:
+            print(f"Error locking title.json: {e}")
+            self.failed += 1
+            return False
+
+    def _merge_and_replace(self, key: str, artist_name: str, entries: Dict[str, Dict[str, any]]) -> bool:
+        try:
+            with open(key, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            data = {}
+
+        # Ensure nested structure: {"ArtistName": {"CODE": {"title": "...", "year": ...}}}
+        if artist_name not in data:
+            data[artist_name] = {}
+        data[artist_name].update(entries)
+
+        folder, name = os.path.split(key)
+        tmp_path = os.path.join(folder, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, key)
+            st = os.stat(key)
+        except OSError as e:
+            print(f"Error writing title.json: {e}")
+            self.failed += 1
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        title_cache.invalidate(key)
+        if title_index.wants(st):
+            # Already parsed - compile now rather than re-reading on the next lookup
+            title_index.compile(key, st, {code: normalize_entry(code, value) for code, value in data[artist_name].items()})
+        self.flushes += 1
+        return True
+
+    def stats(self) -> Dict[str, any]:
+        with self._cond:
+            return {
+                'running': self._thread is not None,
+                'pending_files': len(self._pending),
+                'pending_entries': sum(len(b['entries']) for b in self._pending.values()),
+                'flushes': self.flushes,
+                'failed': self.failed,
+                'flush_interval': self.flush_interval,
+                'batch_size': self.batch_size
+            }
+
+
+# Process-wide cache shared by app.py, TitleUpdater and the library catalog
+title_cache = TitleMappingCache()
+# Process-wide writer - every title.json update goes through it
+title_writer = TitleWriter()
+# Sidecar indexes of large files - disabled until app.py configures a directory
+title_index = TitleIndex()
+
+
+def load_title_mapping(title_file: Path, artist_name: str) -> Mapping[str, Dict[str, any]]:
+    """Load title.json through the shared cache, with updates not written yet applied"""
+    mapping = title_cache.load(title_file, artist_name)
+    pending = title_writer.pending(title_file)
+    if pending:
+        return MappingProxyType({**mapping, **pending})
+    return mapping
+
+
+
+def load_title_entry(title_file: Path, artist_name: str, code: str) -> Optional[Dict[str, any]]:
+    """One code's normalized entry (None if it has none) - large files are read through their index"""
+    pending = title_writer.pending(title_file)
+    if code in pending:
+        return pending[code]
+    try:
+        st = os.stat(title_file)
+    except OSError:
+        return None
+    if title_index.wants(st):
+        current, entry = title_index.lookup(str(title_file), st, code)
+        if current:
+            return entry
+    # Parsing the file compiles its index for the next lookup
+    return title_cache.load(title_file, artist_name).get(code)
+
+
+def load_title_codes(title_file: Path, artist_name: str) -> Set[str]:
+    """Codes that have an entry in the file (not counting pending updates) - large files only have their index keys read"""
+    codes = None
+    try:
+        st = os.stat(title_file)
+        if title_index.wants(st):
+            codes = title_index.codes(str(title_file), st)
+    except OSError:
+        pass
+    if codes is None:
+        codes = title_cache.load(title_file, artist_name).keys()
+    return set(codes)
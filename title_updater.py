@@ -3,134 +3,222 @@
 Auto Title Updater - Detects missing titles and updates title.json
 Similar to JavSP's metadata detection, but simpler and integrated
 Now includes real title scraping like JavSP
+
+Missing titles are a diff of the code folders holding media against the codes in
+title.json. Without a catalog, the last scan of every artist (folder mtimes, which
+folders hold media, the titled codes) is kept in TitleScanState, so a check only
+re-lists folders whose mtime changed and only re-reads a title.json that changed.
+With a catalog, an artist whose folder mtime and title.json signature are unchanged
+is answered from the index without a stat per code folder.
 """
 import json
 import os
+import threading
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from jav_scraper import JavMetadataScraper
+import title_metadata
+from library_scanner import folder_scanner, has_media
+
+
+class TitleScanState:
+    """
+    Per-artist result of the last folder scan, persisted as JSON in state_dir
+    (kept in memory only when state_dir is None)
+
+    {artist: {'mtime_ns': artist folder mtime,
+              'folders': {code: [folder mtime, holds media]},
+              'title': [title.json mtime, size] or None,
+              'titled': [codes in title.json]}}
+    """
+
+    def __init__(self, state_dir: Optional[str] = None):
+        self.path = Path(state_dir) / 'title_scan.json' if state_dir else None
+        self.folder_scans = 0
+        self.title_loads = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._artists: Dict[str, Dict] = {}
+        if self.path is not None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._artists = json.load(f)
+            except (OSError, ValueError):
+                self._artists = {}
+
+    def scan(self, artist_path: Path, title_loader) -> Tuple[List[str], set]:
+        """
+        Returns (codes of folders holding media, codes titled in title.json) for one artist
+        title_loader() is only called when title.json changed since the last scan
+        """
+        artist_name = artist_path.name
+        with self._lock:
+            try:
+                artist_mtime_ns = os.stat(artist_path).st_mtime_ns
+            except OSError:
+                if self._artists.pop(artist_name, None) is not None:
+                    self._dirty = True
+                return [], set()
+
+            state = self._artists.get(artist_name)
+            if state is None:
+                state = {'mtime_ns': None, 'folders': {}, 'title': None, 'titled': []}
+            known = state['folders']
+            current: Dict[str, int] = {}
+
+            if artist_mtime_ns != state['mtime_ns']:
+                # Folders were added/removed - list the artist folder
+                with os.scandir(artist_path) as entries:
+                    for entry in entries:
+                        if entry.is_dir() and entry.name != '__pycache__':
+                            current[entry.name] = entry.stat().st_mtime_ns
+            else:
+                # Same set of folders - only their contents may have changed
+                for code, mtime_ns, error in folder_scanner.folder_mtimes(
+                        (code, str(artist_path / code)) for code in known):
+                    if error is None:
+                        current[code] = mtime_ns
+
+            folders = {}
+            changed = artist_mtime_ns != state['mtime_ns'] or len(current) != len(known)
+            stale = []
+            for code, mtime_ns in current.items():
+                previous = known.get(code)
+                if previous is not None and previous[0] == mtime_ns:
+                    folders[code] = previous
+                else:
+                    stale.append(((code, mtime_ns), str(artist_path / code)))
+            for (code, mtime_ns), holds_media, _ in folder_scanner.map(has_media, stale):
+                folders[code] = [mtime_ns, bool(holds_media)]
+                self.folder_scans += 1
+                changed = True
+
+            try:
+                st = os.stat(artist_path / 'title.json')
+                signature = [st.st_mtime_ns, st.st_size]
+            except OSError:
+                signature = None
+            if signature != state['title'] or state['mtime_ns'] is None:
+                state['titled'] = sorted(title_loader()) if signature is not None else []
+                state['title'] = signature
+                self.title_loads += 1
+                changed = True
+
+            if changed:
+                state['mtime_ns'] = artist_mtime_ns
+                state['folders'] = folders
+                self._artists[artist_name] = state
+                self._dirty = True
+            codes = sorted(code for code, (_, has_media) in folders.items() if has_media)
+            return codes, set(state['titled'])
+
+    def forget(self, artist_names):
+        """Drop artists whose folders are gone"""
+        with self._lock:
+            for artist_name in set(self._artists) - set(artist_names):
+                del self._artists[artist_name]
+                self._dirty = True
+
+    def save(self):
+        """Write the state if it changed (atomically - tmp file + rename)"""
+        with self._lock:
+            if self.path is None or not self._dirty:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._artists, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as e:
+                print(f"Error saving title scan state: {e}")
+
 
 class TitleUpdater:
-    def __init__(self, video_server_path: str):
+    def __init__(self, video_server_path: str, catalog=None, state_dir: Optional[str] = None):
+        """
+        catalog: optional LibraryCatalog - when given, folder scans are answered
+        from the catalog index instead of walking the artist folders
+        state_dir: where the scan state is persisted when there is no catalog
+        (None keeps it for the lifetime of this updater only)
+        """
         self.video_server_path = Path(video_server_path)
         self.artists_path = self.video_server_path / 'static' / 'artists'
+        self.catalog = catalog
+        self.scan_state = TitleScanState(state_dir) if catalog is None else None
     
     def load_title_mapping(self, artist_name: str) -> Dict[str, any]:
         """
-        Load existing title mapping from title.json
+        Load existing title mapping from title.json (cached until the file changes)
         Returns dict mapping code -> {'title': str, 'year': int, 'month': int, 'day': int, 'date': dict}
-        Supports both old format (code -> title string) and new format (code -> dict)
         """
         title_file = self.artists_path / artist_name / 'title.json'
-        
-        if not title_file.exists():
-            return {}
-        
-        try:
-            with open(title_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                raw_mapping = data[artist_name] if artist_name in data else data
-                
-                # Convert to new format (code -> dict with title and date info)
-                result = {}
-                for code, value in raw_mapping.items():
-                    if isinstance(value, str):
-                        # Old format: just title string
-                        result[code] = {'title': value, 'year': None, 'month': None, 'day': None, 'date': None}
-                    elif isinstance(value, dict):
-                        # New format: dict with title and date info
-                        date_info = value.get('date', {})
-                        result[code] = {
-                            'title': value.get('title', code),
-                            'year': value.get('year') or (date_info.get('year') if date_info else None),
-                            'month': value.get('month') or (date_info.get('month') if date_info else None),
-                            'day': value.get('day') or (date_info.get('day') if date_info else None),
-                            'date': value.get('date') or date_info
-                        }
-                    else:
-                        result[code] = {'title': str(value), 'year': None, 'month': None, 'day': None, 'date': None}
-                
-                return result
-        except (json.JSONDecodeError, KeyError, IOError):
-            return {}
+        return title_metadata.load_title_mapping(title_file, artist_name)
     
     def scan_videos(self, artist_name: str) -> List[str]:
         """Scan artist folder and return list of video codes"""
-        artist_path = self.artists_path / artist_name
-        if not artist_path.exists():
-            return []
+        if self.catalog is not None:
+            self.catalog.refresh_artist(artist_name)
+            return self.catalog.video_codes(artist_name)
         
-        video_codes = []
-        media_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wav', '.mp3', '.flac', '.m4a', '.webm']
+        codes, _ = self._scan(artist_name)
+        self.scan_state.save()
+        return codes
+    
+    def _scan(self, artist_name: str) -> Tuple[List[str], set]:
+        """(video codes, titled codes) from the scan state - only changed folders are listed"""
+        title_file = self.artists_path / artist_name / 'title.json'
+        codes, titled = self.scan_state.scan(
+            self.artists_path / artist_name,
+            lambda: title_metadata.load_title_codes(title_file, artist_name)
+        )
+        # Updates not written yet don't show in the file's signature - never persist them
+        return codes, titled | set(title_metadata.title_writer.pending(title_file))
+    
+    def _missing_titles(self, artist_name: str) -> Tuple[List[str], int, int]:
+        """Returns (codes without a title, number of video codes, number of titled codes)"""
+        if self.catalog is not None:
+            self.catalog.refresh_artist(artist_name, shallow=True)
+            return self.catalog.missing_titles(artist_name)
         
-        for item in artist_path.iterdir():
-            if item.is_dir() and item.name != '__pycache__':
-                # Check if folder contains media files
-                has_media = any(
-                    file.suffix.lower() in media_extensions
-                    for file in item.iterdir()
-                    if file.is_file()
-                )
-                if has_media:
-                    video_codes.append(item.name)
+        codes, titled = self._scan(artist_name)
+        return [code for code in codes if code not in titled], len(codes), len(titled)
+    
+    def list_artists(self) -> List[str]:
+        """Return names of all artist folders"""
+        if self.catalog is not None:
+            self.catalog.refresh_artists()
+            return self.catalog.artist_names()
         
-        return video_codes
+        if not self.artists_path.exists():
+            return []
+        
+        with os.scandir(self.artists_path) as entries:
+            return [entry.name for entry in entries if entry.is_dir()]
     
     def find_missing_titles(self, artist_name: str) -> List[str]:
         """Find video codes that don't have titles in title.json"""
-        existing_titles = self.load_title_mapping(artist_name)
-        all_videos = self.scan_videos(artist_name)
-        
-        missing = [code for code in all_videos if code not in existing_titles]
+        missing, _, _ = self._missing_titles(artist_name)
+        if self.scan_state is not None:
+            self.scan_state.save()
         return missing
     
-    def update_title_json(self, artist_name: str, updates: Dict[str, any], create_if_missing: bool = True) -> bool:
+    def update_title_json(self, artist_name: str, updates: Dict[str, any], create_if_missing: bool = True,
+                          flush: bool = False) -> bool:
         """
         Update title.json with new entries
         updates: Dict mapping video_code -> title (str) or {'title': str, 'year': int}
+        Entries are queued in the shared title writer (readers see them right away) and
+        written in batches; flush=True writes them before returning.
+        Returns False if the file could not be written
         """
         title_file = self.artists_path / artist_name / 'title.json'
-        
-        # Load existing data
-        if title_file.exists():
-            try:
-                with open(title_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-            except (json.JSONDecodeError, IOError):
-                data = {}
-        else:
-            data = {}
-        
-        # Ensure nested structure: {"ArtistName": {"CODE": {"title": "...", "year": ...}}}
-        if artist_name not in data:
-            data[artist_name] = {}
-        
-        # Convert updates to new format and merge
-        for code, value in updates.items():
-            if isinstance(value, str):
-                # String format: just title
-                data[artist_name][code] = {'title': value, 'year': None, 'month': None, 'day': None, 'date': None}
-            elif isinstance(value, dict):
-                # Dict format: already has title and date info
-                date_info = value.get('date', {})
-                data[artist_name][code] = {
-                    'title': value.get('title', code),
-                    'year': value.get('year') or (date_info.get('year') if date_info else None),
-                    'month': value.get('month') or (date_info.get('month') if date_info else None),
-                    'day': value.get('day') or (date_info.get('day') if date_info else None),
-                    'date': value.get('date') or date_info
-                }
-            else:
-                data[artist_name][code] = {'title': str(value), 'year': None, 'month': None, 'day': None, 'date': None}
-        
-        # Save back to file
-        try:
-            with open(title_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-            return True
-        except IOError as e:
-            print(f"Error writing title.json: {e}")
-            return False
+        ok = title_metadata.title_writer.update(title_file, artist_name, updates, flush=flush)
+        if self.catalog is not None:
+            # Pick up the new titles right away instead of waiting for the watcher
+            self.catalog.reload_titles(artist_name)
+        return ok
     
     def auto_update_all_artists(self, placeholder_title: str = None, scrape_real_titles: bool = False) -> Dict[str, List[str]]:
         """
@@ -142,35 +230,30 @@ class TitleUpdater:
         results = {}
         scraper = JavMetadataScraper() if scrape_real_titles else None
         
-        if not self.artists_path.exists():
-            return results
-        
-        for artist_folder in self.artists_path.iterdir():
-            if artist_folder.is_dir():
-                artist_name = artist_folder.name
-                missing = self.find_missing_titles(artist_name)
+        for artist_name in self.list_artists():
+            missing = self.find_missing_titles(artist_name)
+            
+            if missing:
+                results[artist_name] = missing
+                updates = {}
                 
-                if missing:
-                    results[artist_name] = missing
-                    updates = {}
+                if scrape_real_titles and scraper:
+                    # Scrape real titles and years from multiple sources (JavSP-style)
+                    print(f"Scraping metadata for {artist_name} ({len(missing)} videos)...")
+                    scraped_metadata = scraper.batch_scrape(missing)
                     
-                    if scrape_real_titles and scraper:
-                        # Scrape real titles and years from multiple sources (JavSP-style)
-                        print(f"Scraping metadata for {artist_name} ({len(missing)} videos)...")
-                        scraped_metadata = scraper.batch_scrape(missing, delay=1.5)
-                        
-                        for code, metadata in scraped_metadata.items():
-                            if metadata and metadata.get('title'):
-                                updates[code] = metadata  # Already in {'title': ..., 'year': ..., 'month': ..., 'day': ...} format
-                            elif placeholder_title:
-                                updates[code] = {'title': placeholder_title, 'year': None, 'month': None, 'day': None, 'date': None}
-                    elif placeholder_title:
-                        # Use placeholder for all missing
-                        updates = {code: {'title': placeholder_title, 'year': None, 'month': None, 'day': None, 'date': None} for code in missing}
-                    
-                    if updates:
-                        self.update_title_json(artist_name, updates)
-                        print(f"Updated {len(updates)} titles for {artist_name}")
+                    for code, metadata in scraped_metadata.items():
+                        if metadata and metadata.get('title'):
+                            updates[code] = metadata  # Already in {'title': ..., 'year': ..., 'month': ..., 'day': ...} format
+                        elif placeholder_title:
+                            updates[code] = {'title': placeholder_title, 'year': None, 'month': None, 'day': None, 'date': None}
+                elif placeholder_title:
+                    # Use placeholder for all missing
+                    updates = {code: {'title': placeholder_title, 'year': None, 'month': None, 'day': None, 'date': None} for code in missing}
+                
+                if updates:
+                    self.update_title_json(artist_name, updates)
+                    print(f"Updated {len(updates)} titles for {artist_name}")
         
         return results
     
@@ -188,7 +271,7 @@ class TitleUpdater:
         
         scraper = JavMetadataScraper()
         print(f"Scraping metadata for {len(codes)} videos...")
-        scraped_metadata = scraper.batch_scrape(codes, delay=1.5)
+        scraped_metadata = scraper.batch_scrape(codes)
         
         # Filter out None values and ensure dict format
         successful_updates = {}
@@ -205,25 +288,22 @@ class TitleUpdater:
     def get_all_missing_summary(self) -> Dict[str, Dict]:
         """Get summary of all missing titles across all artists"""
         summary = {}
+        artists = self.list_artists()
         
-        if not self.artists_path.exists():
-            return summary
-        
-        for artist_folder in self.artists_path.iterdir():
-            if artist_folder.is_dir():
-                artist_name = artist_folder.name
-                missing = self.find_missing_titles(artist_name)
-                existing_titles = self.load_title_mapping(artist_name)
-                all_videos = self.scan_videos(artist_name)
-                
-                if missing:
-                    summary[artist_name] = {
-                        'missing_count': len(missing),
-                        'missing_codes': missing,
-                        'total_videos': len(all_videos),
-                        'titled_videos': len(existing_titles)
-                    }
+        for artist_name in artists:
+            missing, total_videos, titled_videos = self._missing_titles(artist_name)
+            
+            if missing:
+                summary[artist_name] = {
+                    'missing_count': len(missing),
+                    'missing_codes': missing,
+                    'total_videos': total_videos,
+                    'titled_videos': titled_videos
+                }
         
+        if self.scan_state is not None:
+            self.scan_state.forget(artists)
+            self.scan_state.save()
         return summary
 
 if __name__ == '__main__':
@@ -231,7 +311,10 @@ if __name__ == '__main__':
     import sys
     
     video_path = sys.argv[1] if len(sys.argv) > 1 else '/volume1/Video_Server'
-    updater = TitleUpdater(video_path)
+    if os.getenv('STATE_DIR'):
+        # Same title.json locks as the server
+        title_metadata.title_writer.configure(lock_dir=os.path.join(os.getenv('STATE_DIR'), 'title_locks'))
+    updater = TitleUpdater(video_path, state_dir=os.getenv('STATE_DIR'))
     
     # Find all missing titles
     print("Scanning for missing titles...")